@@ -0,0 +1 @@
+'''Reproducible benchmarks of the poller; each module is runnable with `python -m benchmarks.<name>`.'''
@@ -0,0 +1,240 @@
+'''Local stand-in for a GitLab instance, serving the endpoints polled by the poller.
+
+Responses are delayed by a configurable latency, fail at a configurable rate
+and are padded to a configurable size. Any path prefix is accepted, so that
+many distinct "instances" may be served by one server, e.g.
+`http://127.0.0.1:8080/instance-1` and `http://127.0.0.1:8080/instance-2`.
+
+It may be run on its own, to poll by hand (or with `--port 0`, on any free port):
+
+    $ python -m benchmarks.fake_gitlab --port 8080 --latency 0.05 --error-rate 0.01
+'''
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+
+from gitlab.core.clients import HEALTH_CHECK_PATH, METADATA_PATH, READINESS_CHECK_PATH
+from typing import Dict, List, Tuple
+
+
+VERSION = '16.6.1-ee'
+
+
+class FakeGitLab:
+    '''Minimal HTTP/1.1 server with keep-alive, answering health, readiness and metadata requests.
+
+    The server runs its own event loop on a background thread once started, so
+    that it may serve synchronous and asynchronous callers alike.
+    '''
+    _loop: 'asyncio.AbstractEventLoop | None'
+    _random: 'random.Random'
+    _ready: 'threading.Event'
+    _server: 'asyncio.Server | None'
+    _thread: 'threading.Thread | None'
+    body_size: 'int'
+    connections: 'int'
+    error_rate: 'float'
+    host: 'str'
+    jitter: 'float'
+    latency: 'float'
+    port: 'int'
+    requests: 'int'
+
+    def __init__(
+        self,
+        *,
+        body_size: 'int' = 0,
+        error_rate: 'float' = 0.0,
+        host: 'str' = '127.0.0.1',
+        jitter: 'float' = 0.0,
+        latency: 'float' = 0.0,
+        port: 'int' = 0,
+        seed: 'int' = 0,
+    ) -> 'None':
+        self._loop = None
+        self._random = random.Random(seed)
+        self._ready = threading.Event()
+        self._server = None
+        self._thread = None
+        self.body_size = body_size
+        self.connections = 0
+        self.error_rate = error_rate
+        self.host = host
+        self.jitter = jitter
+        self.latency = latency
+        self.port = port
+        self.requests = 0
+
+    def __enter__(self) -> 'FakeGitLab':
+        self.start()
+        return self
+
+    def __exit__(self, *_exc_info) -> 'None':
+        self.stop()
+
+    @property
+    def url(self) -> 'str':
+        '''Returns the base URL of the server.'''
+        return f'http://{self.host}:{self.port}'
+
+    def join(self) -> 'None':
+        '''Blocks until the server is stopped.'''
+        self._thread.join()
+
+    def start(self) -> 'None':
+        '''Starts serving on a background thread, returning once the server is listening.'''
+        self._thread = threading.Thread(target=self._run, name='fake-gitlab', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> 'None':
+        '''Stops serving, closing every connection.'''
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._thread.join()
+
+    async def serve_forever(self) -> 'None':
+        '''Serves on the current event loop until cancelled.'''
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def _run(self) -> 'None':
+        '''Runs the server on an event loop of its own.'''
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self.serve_forever())
+            # drop the connections still held open by clients
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        finally:
+            self._loop.close()
+
+    async def _handle_connection(self, reader: 'asyncio.StreamReader', writer: 'asyncio.StreamWriter') -> 'None':
+        '''Answers the requests of a connection until the client closes it.'''
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                # GET requests carry no body, but skip any that is sent regardless
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                self.requests += 1
+                _method, path, _version = request_line.decode('latin-1').split(' ', 2)
+                delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+                if delay:
+                    await asyncio.sleep(delay)
+                status, extra_headers, body = self._respond(path.split('?', 1)[0], headers)
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                response_headers = [
+                    *extra_headers,
+                    ('Content-Length', len(body)),
+                    ('Connection', 'keep-alive' if keep_alive else 'close'),
+                ]
+                head = f'HTTP/1.1 {status}\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in response_headers)
+                writer.write((head + '\r\n').encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # the server is stopping; ending quietly spares the stream protocol from logging the cancellation
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, path: 'str', headers: 'Dict[str, str]') -> 'Tuple[str, List[Tuple[str, str]], bytes]':
+        '''Returns the status, headers and body of the response to a path.
+
+        Metadata responses carry an ETag, and conditional requests for them are
+        answered with HTTP 304 as GitLab does.
+        '''
+        failed = self.error_rate > 0 and self._random.random() < self.error_rate
+        text, json_type = [('Content-Type', 'text/plain')], [('Content-Type', 'application/json')]
+        if path.endswith(HEALTH_CHECK_PATH):
+            if failed:
+                return '503 Service Unavailable', text, b'GitLab is not responding'
+            return '200 OK', text, b'GitLab OK' + b' ' * max(0, self.body_size - 9)
+        if path.endswith(READINESS_CHECK_PATH):
+            # as GitLab reports it, with a result per component; failures are put down to Gitaly
+            gitaly = {'status': 'failed', 'message': '14:connections to all backends failing'} if failed else {'status': 'ok'}
+            document = {
+                'status': 'failed' if failed else 'ok',
+                'master_check': [{'status': 'ok'}],
+                'db_check': [{'status': 'ok'}],
+                'redis_check': [{'status': 'ok'}],
+                'gitaly_check': [{**gitaly, 'labels': {'shard': 'default'}}],
+            }
+            return ('503 Service Unavailable' if failed else '200 OK'), json_type, self._pad(document)
+        if path.endswith(METADATA_PATH):
+            if failed:
+                return '500 Internal Server Error', json_type, b'{"message":"500 Internal Server Error"}'
+            document = {'version': VERSION, 'revision': '3b1c4a5d6e7', 'enterprise': True, 'kas': {'enabled': False}}
+            body = self._pad(document)
+            etag = f'W/"{hashlib.md5(body).hexdigest()}"'
+            if headers.get('if-none-match') == etag:
+                return '304 Not Modified', [('ETag', etag)], b''
+            return '200 OK', [*json_type, ('ETag', etag)], body
+        return '404 Not Found', json_type, b'{"error":"404 Not Found"}'
+
+    def _pad(self, document: 'Dict') -> 'bytes':
+        '''Encodes a JSON document, padded out to the configured body size.'''
+        body = json.dumps(document).encode()
+        if len(body) < self.body_size:
+            # keep the document valid by padding it with an extra field
+            padding = self.body_size - len(body) - len(', "padding": ""')
+            body = json.dumps({**document, 'padding': 'x' * max(0, padding)}).encode()
+        return body
+
+
+def main() -> 'None':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', default=8080, type=int, help='port to listen on')
+    parser.add_argument('--latency', default=0.0, type=float, help='seconds every response is delayed by')
+    parser.add_argument('--jitter', default=0.0, type=float, help='further random delay, up to this many seconds')
+    parser.add_argument('--error-rate', default=0.0, type=float, help='fraction of requests failed')
+    parser.add_argument('--body-size', default=0, type=int, help='bytes every successful response is padded to')
+    parser.add_argument('--seed', default=0, type=int, help='seed of the latency jitter and failures')
+    arguments = parser.parse_args()
+
+    server = FakeGitLab(
+        body_size=arguments.body_size,
+        error_rate=arguments.error_rate,
+        host=arguments.host,
+        jitter=arguments.jitter,
+        latency=arguments.latency,
+        port=arguments.port,
+        seed=arguments.seed,
+    )
+    server.start()
+    # announced once listening, for the benefit of scripts launching the server with --port 0
+    print(f'Serving a fake GitLab instance at {server.url}; CTRL+C to stop.', flush=True)
+    try:
+        server.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
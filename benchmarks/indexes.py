@@ -0,0 +1,150 @@
+'''Compares the insert throughput and filtered-export latency of the poll entry indexes.
+
+Two databases are migrated, one to just before the index redesign and one to
+the latest revision, then filled with the same synthetic polls and queried
+the way `export` and `report` query them:
+
+    $ python -m benchmarks.indexes --rows 1000000
+'''
+import alembic.command
+import alembic.config
+import argparse
+import json
+import random
+import statistics
+import sqlalchemy
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+from gitlab.core import PollEntry, create_engine, csv_columns, select_poll_entries, stream_rows
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+
+MIGRATIONS = Path(__file__).resolve().parent.parent / 'gitlab' / 'migrations'
+REVISIONS = {
+    'before': '1422d66372ae', # five single-column indexes
+    'after': 'fcf954018052', # composite and partial indexes
+}
+START = datetime(2024, 1, 1)
+
+
+def migrate(database: 'str', revision: 'str') -> 'None':
+    '''Migrates the database to the given revision.'''
+    config = alembic.config.Config()
+    config.set_main_option('script_location', MIGRATIONS.as_posix())
+    config.cmd_opts = argparse.Namespace(x=[f'database={database}'])
+    alembic.command.upgrade(config, revision)
+
+
+def generate_rows(rows: 'int', instances: 'int', failure_rate: 'float', seed: 'int') -> 'Iterator[Dict[str, Any]]':
+    '''Generates polls of every instance once a minute, failing at the given rate.'''
+    rng = random.Random(seed)
+    for i in range(rows):
+        passed = rng.random() >= failure_rate
+        yield {
+            'base_url': f'https://{i % instances}.example.com',
+            'created_at': START + timedelta(minutes=i // instances),
+            'error_message': '' if passed else 'Failed health check',
+            'health_check_passed': passed,
+            'instance_version': '16.6.1-ee' if passed else '',
+            'readiness_check_passed': passed,
+        }
+
+
+def measure_inserts(engine: 'sqlalchemy.Engine', rows: 'Iterator[Dict[str, Any]]', batch_size: 'int') -> 'float':
+    '''Inserts the rows a batch per transaction, as the poll writer does; returns rows per second.'''
+    stmt = sqlalchemy.insert(PollEntry)
+    count, elapsed, batch = 0, 0.0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            elapsed += _timed_insert(engine, stmt, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        elapsed += _timed_insert(engine, stmt, batch)
+        count += len(batch)
+    return count / elapsed
+
+
+def measure_query(engine: 'sqlalchemy.Engine', stmt_for: 'Callable[[int], sqlalchemy.Select]', repeats: 'int') -> 'float':
+    '''Streams the result of each statement in full; returns the median latency in milliseconds.'''
+    latencies = []
+    with engine.connect() as connection:
+        for i in range(repeats):
+            started_at = time.perf_counter()
+            for _rows in stream_rows(connection, stmt_for(i)):
+                pass
+            latencies.append((time.perf_counter() - started_at) * 1000)
+    return statistics.median(latencies)
+
+
+def run(arguments: 'argparse.Namespace') -> 'Dict[str, Dict[str, float]]':
+    '''Runs the benchmark against each revision.'''
+    span = timedelta(minutes=arguments.rows // arguments.instances)
+    columns = tuple(csv_columns().values())
+    failed = sqlalchemy.not_(sqlalchemy.and_(PollEntry.health_check_passed, PollEntry.readiness_check_passed))
+
+    def instance(i: 'int') -> 'str':
+        return f'https://{(i * 7) % arguments.instances}.example.com'
+
+    def day_of_instance(i: 'int') -> 'sqlalchemy.Select':
+        since = START + span * ((i * 0.37) % 1)
+        return select_poll_entries(columns, base_url=instance(i), since=since, until=since + timedelta(days=1))
+
+    def whole_instance(i: 'int') -> 'sqlalchemy.Select':
+        return select_poll_entries(columns, base_url=instance(i))
+
+    def failures_of_instance(i: 'int') -> 'sqlalchemy.Select':
+        return select_poll_entries((PollEntry.created_at, PollEntry.error_message), base_url=instance(i)).where(failed)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for label, revision in REVISIONS.items():
+            database = f'sqlite:///{(Path(directory) / f"{label}.db").as_posix()}'
+            migrate(database, revision)
+            engine = create_engine(database)
+            rows = generate_rows(arguments.rows, arguments.instances, arguments.failure_rate, arguments.seed)
+            results[label] = {
+                'insert_rows_per_second': measure_inserts(engine, rows, arguments.batch_size),
+                'export_instance_day_ms': measure_query(engine, day_of_instance, arguments.repeats),
+                'export_instance_ms': measure_query(engine, whole_instance, arguments.repeats),
+                'instance_failures_ms': measure_query(engine, failures_of_instance, arguments.repeats),
+            }
+            engine.dispose()
+    return results
+
+
+def _timed_insert(engine: 'sqlalchemy.Engine', stmt: 'sqlalchemy.Insert', batch: 'List[Dict[str, Any]]') -> 'float':
+    '''Commits a batch of rows, returning the time taken.'''
+    started_at = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(stmt, batch)
+    return time.perf_counter() - started_at
+
+
+def main() -> 'None':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default=200000, type=int, help='number of polls inserted')
+    parser.add_argument('--instances', default=50, type=int, help='number of distinct instances polled')
+    parser.add_argument('--failure-rate', default=0.02, type=float, help='fraction of failed polls')
+    parser.add_argument('--batch-size', default=500, type=int, help='rows committed per transaction')
+    parser.add_argument('--repeats', default=20, type=int, help='repetitions of each query')
+    parser.add_argument('--seed', default=0, type=int, help='seed of the generated polls')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    arguments = parser.parse_args()
+
+    results = run(arguments)
+    if arguments.json:
+        print(json.dumps({'parameters': vars(arguments), 'results': results}, indent=2))
+        return
+    print(f'{"metric":<28}{"before":>14}{"after":>14}{"change":>10}')
+    for metric in results['before']:
+        before, after = results['before'][metric], results['after'][metric]
+        print(f'{metric:<28}{before:>14.1f}{after:>14.1f}{(after - before) / before:>+10.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,26 @@
 import click
 
-from gitlab.cli import migrations, polls
+from gitlab.cli._lazy import LazyGroup
 
 
-@click.group()
+# commands are only imported once invoked, so that each command pays for
+# importing only its own dependencies; add commands here, with their short help
+@click.group(cls=LazyGroup, lazy_commands={
+    'check_migrations': ('gitlab.cli.migrations:check', 'Executes database migration checks.'),
+    'export': ('gitlab.cli.exports:export', 'Export poll records from the specified GitLab instance.'),
+    'fleet': ('gitlab.cli.polls:fleet', 'Continuously polls a fleet of GitLab instances.'),
+    'import': ('gitlab.cli.imports:import_polls', 'Import the polls of exports or other poll databases, such as those of other nodes.'),
+    'incidents': ('gitlab.cli.reports:incidents', 'List the outages and version changes of the polled GitLab instances.'),
+    'migrate': ('gitlab.cli.migrations:run', 'Executes database migrations.'),
+    'poll': ('gitlab.cli.polls:poll', 'Polls the specified GitLab instance.'),
+    'prune': ('gitlab.cli.maintenance:prune', 'Prune (or archive) polls that have outlived their retention, and reclaim their space.'),
+    'report': ('gitlab.cli.reports:report', 'Report the availability, outages, versions and errors of the polled GitLab instances.'),
+    'rollup': ('gitlab.cli.maintenance:rollup', 'Folds recorded polls into the hourly and daily rollups.'),
+    'status': ('gitlab.cli.reports:status', 'Show the current state of each polled GitLab instance, as of its latest poll.'),
+})
 def cli() -> 'None':
     pass
 
 
-# add commands here
-cli.add_command(migrations.run, 'migrate')
-cli.add_command(migrations.check, 'check_migrations')
-cli.add_command(polls.poll, 'poll')
-cli.add_command(polls.export, 'export')
-
-
 if __name__ == '__main__':
     cli(max_content_width=120)
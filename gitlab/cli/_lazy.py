@@ -0,0 +1,48 @@
+import click
+import importlib
+
+from typing import Dict, List, Tuple
+
+
+class LazyGroup(click.Group):
+    '''A `click` group whose commands are only imported once they are invoked.
+
+    Commands are registered by name as `(import_path, short_help)` pairs,
+    where the import path is a `module:attribute` reference. The short help
+    is listed by `--help` in place of the help of the command itself, so
+    that listing the commands imports none of them.
+    '''
+    lazy_commands: 'Dict[str, Tuple[str, str]]'
+
+    def __init__(self, *args, lazy_commands: 'Dict[str, Tuple[str, str]] | None' = None, **kwargs) -> 'None':
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx: 'click.Context') -> 'List[str]':
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx: 'click.Context', cmd_name: 'str') -> 'click.Command | None':
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            import_path, _short_help = self.lazy_commands[cmd_name]
+            module, _separator, attribute = import_path.partition(':')
+            self.add_command(getattr(importlib.import_module(module), attribute), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx: 'click.Context', formatter: 'click.HelpFormatter') -> 'None':
+        names = self.list_commands(ctx)
+        if not names:
+            return
+
+        limit = formatter.width - 6 - max(map(len, names))
+        rows = []
+        for name in names:
+            if name in self.lazy_commands and name not in self.commands:
+                short_help = click.utils.make_default_short_help(self.lazy_commands[name][1], limit)
+            else:
+                command = self.get_command(ctx, name)
+                if command is None or command.hidden:
+                    continue
+                short_help = command.get_short_help_str(limit)
+            rows.append((name, short_help))
+        with formatter.section('Commands'):
+            formatter.write_dl(rows)
@@ -0,0 +1,131 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator
+
+
+LOG_FORMATS = ('text', 'json')
+# records awaiting the background handler; beyond this, records are dropped rather than block the caller
+QUEUE_SIZE = 10_000
+# the logger of the package, under which every module logs
+_ROOT_LOGGER = 'gitlab'
+
+
+@dataclass(frozen=True)
+class LoggingOptions:
+    '''Options of the logging of a command; see `configure_logging`.'''
+    level: 'int' = logging.INFO
+    log_format: 'str' = 'text'
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    '''Hands records to a background listener, dropping (and counting) those that do not fit in its queue.'''
+    dropped: 'int'
+
+    def __init__(self, records: 'queue.Queue') -> 'None':
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: 'logging.LogRecord') -> 'logging.LogRecord':
+        '''Merges the arguments into the message, as they may change once queued, leaving the rest to the listener.
+
+        Unlike the default, which formats the whole record here, the exception
+        is kept as such, for the formatter of the listener to report (e.g. as a
+        field of its own in JSON logs).
+        '''
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        return record
+
+    def enqueue(self, record: 'logging.LogRecord') -> 'None':
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _JsonFormatter(logging.Formatter):
+    '''Formats records as JSON objects, one per line, including the fields of the record.'''
+
+    def format(self, record: 'logging.LogRecord') -> 'str':
+        document = {
+            'time': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+            **getattr(record, 'fields', {}),
+        }
+        if record.exc_info:
+            document['exception'] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    '''Formats records as lines of text, prefixed with their time and level.'''
+
+    def format(self, record: 'logging.LogRecord') -> 'str':
+        line = f'[ {datetime.fromtimestamp(record.created).isoformat()} ] {record.levelname} {record.getMessage()}'
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class JsonPayload:
+    '''Wraps a payload logged as an argument, so that it is only encoded as JSON if the record is emitted.'''
+    __slots__ = ('payload',)
+
+    def __init__(self, payload: 'Any') -> 'None':
+        self.payload = payload
+
+    def __str__(self) -> 'str':
+        return json.dumps(self.payload)
+
+
+def log_fields(**fields: 'Any') -> 'Dict[str, Any]':
+    '''Returns the `extra` of a record carrying structured fields, which JSON logs include as such.'''
+    return {'fields': fields}
+
+
+@contextmanager
+def configure_logging(options: 'LoggingOptions') -> 'Iterator[None]':
+    '''Provides a context within which the package logs to stderr, from a background thread.
+
+    Logging only queues records, so that a slow consumer of stderr (e.g. a pipe
+    or journald) never holds up the caller; should the queue fill up, further
+    records are dropped until it drains, and the number dropped is reported
+    once the context exits. Records still queued are written out then.
+    '''
+    records = queue.Queue(QUEUE_SIZE)
+    handler = _DroppingQueueHandler(records)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(_JsonFormatter() if options.log_format == 'json' else _TextFormatter())
+    listener = logging.handlers.QueueListener(records, stream_handler)
+
+    logger = logging.getLogger(_ROOT_LOGGER)
+    previous_level, previous_propagate = logger.level, logger.propagate
+    logger.addHandler(handler)
+    logger.setLevel(options.level)
+    logger.propagate = False
+    listener.start()
+    try:
+        yield
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(previous_level)
+        logger.propagate = previous_propagate
+        listener.stop()
+        if handler.dropped:
+            stream_handler.handle(logging.makeLogRecord({
+                'levelname': 'WARNING',
+                'levelno': logging.WARNING,
+                'msg': f'Dropped {handler.dropped} log records; stderr could not keep up.',
+                'name': _ROOT_LOGGER,
+            }))
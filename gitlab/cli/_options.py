@@ -1,4 +1,6 @@
 import click
+import functools
+import logging
 
 from pathlib import Path
 from typing import Callable, TYPE_CHECKING
@@ -7,6 +9,54 @@ if TYPE_CHECKING:
     from click.decorators import FC
 
 
+def adaptive_options(name: 'str' = 'adaptive_policy') -> 'Callable[[FC], FC]':
+    '''Generate a `click` decorator for the options of adaptive polling.
+
+    The individual options are collected into a single `AdaptivePolicy`
+    keyworded argument, `name`, which is `None` unless adaptive polling is
+    requested.
+    '''
+    # imported on demand, so that commands without these options do not pay for importing them
+    from gitlab.core import AdaptivePolicy
+
+    defaults = AdaptivePolicy()
+    options = (
+        click.option(
+            '--adaptive', 'adaptive',
+            help='Poll degraded or recovering instances faster, and skip the polls of instances that are down.',
+            is_flag=True,
+        ),
+        click.option(
+            '--failure-threshold', 'failure_threshold',
+            default=defaults.failure_threshold,
+            help='Consecutive failed health checks after which the polls of an instance are skipped; with --adaptive.',
+            show_default=True,
+            type=click.IntRange(min=1),
+        ),
+        click.option(
+            '--max-backoff', 'max_backoff',
+            default=defaults.max_backoff,
+            help='Maximum number of intervals between probes of an instance that is down; with --adaptive.',
+            show_default=True,
+            type=click.FloatRange(min=1),
+        ),
+    )
+
+    def decorator(f: 'FC') -> 'FC':
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            adaptive = kwargs.pop('adaptive')
+            policy = AdaptivePolicy(failure_threshold=kwargs.pop('failure_threshold'), max_backoff=kwargs.pop('max_backoff'))
+            kwargs[name] = policy if adaptive else None
+            return f(*args, **kwargs)
+
+        for option in reversed(options):
+            wrapper = option(wrapper)
+        return wrapper
+
+    return decorator
+
+
 def database_option(
     name: 'str' = 'database',
     *,
@@ -31,3 +81,194 @@ def database_option(
             writable=True,
         ),
     )
+
+
+def lease_options(name: 'str' = 'lease') -> 'Callable[[FC], FC]':
+    '''Generate a `click` decorator for the options of sharing a fleet between poller nodes.
+
+    The individual options are collected into a single `LeaseOptions`
+    keyworded argument, `name`, which is `None` unless sharing is requested.
+    '''
+    from gitlab.core import LeaseOptions
+
+    defaults = LeaseOptions(node_id='')
+    options = (
+        click.option(
+            '--partition', 'partition',
+            help='Share the instances with the other pollers using the same database, each polling only the instances it holds a lease on.',
+            is_flag=True,
+        ),
+        click.option(
+            '--node-id', 'node_id',
+            help='Name of this poller among those sharing the database (by default, the host name and process id); with --partition.',
+        ),
+        click.option(
+            '--lease-duration', 'lease_duration',
+            default=defaults.duration,
+            help='Time (seconds) after which the instances of a poller that stopped renewing its leases are taken over; with --partition.',
+            show_default=True,
+            type=click.FloatRange(min=1),
+        ),
+    )
+
+    def decorator(f: 'FC') -> 'FC':
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            partition, node_id, duration = kwargs.pop('partition'), kwargs.pop('node_id'), kwargs.pop('lease_duration')
+            lease = None
+            if partition:
+                lease = LeaseOptions(duration=duration) if node_id is None else LeaseOptions(node_id=node_id, duration=duration)
+            kwargs[name] = lease
+            return f(*args, **kwargs)
+
+        for option in reversed(options):
+            wrapper = option(wrapper)
+        return wrapper
+
+    return decorator
+
+
+def logging_options(name: 'str' = 'logging_options') -> 'Callable[[FC], FC]':
+    '''Generate a `click` decorator for the verbosity and format of the logs.
+
+    The individual options are collected into a single `LoggingOptions`
+    keyworded argument, `name`; each `-v` lowers the level by one step, and
+    each `-q` raises it.
+    '''
+    from gitlab.cli._logging import LOG_FORMATS, LoggingOptions
+
+    options = (
+        click.option(
+            '-v', '--verbose', 'verbose',
+            count=True,
+            help='Log more; once for the checks and payloads of every poll.',
+        ),
+        click.option(
+            '-q', '--quiet', 'quiet',
+            count=True,
+            help='Log less; once for only failed polls and warnings, twice for only errors.',
+        ),
+        click.option(
+            '--log-format', 'log_format',
+            default='text',
+            help='Format of the logs written to stderr; json logs carry the fields of each poll.',
+            show_default=True,
+            type=click.Choice(LOG_FORMATS),
+        ),
+    )
+
+    def decorator(f: 'FC') -> 'FC':
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            steps = kwargs.pop('quiet') - kwargs.pop('verbose')
+            level = min(max(logging.INFO + 10 * steps, logging.DEBUG), logging.CRITICAL)
+            kwargs[name] = LoggingOptions(level=level, log_format=kwargs.pop('log_format'))
+            return f(*args, **kwargs)
+
+        for option in reversed(options):
+            wrapper = option(wrapper)
+        return wrapper
+
+    return decorator
+
+
+def metrics_options(name: 'str' = 'metrics_address') -> 'Callable[[FC], FC]':
+    '''Generate a `click` decorator for the options of the metrics endpoint.
+
+    The individual options are collected into a single `(host, port)` keyworded
+    argument, `name`, which is `None` unless a port is given.
+    '''
+    options = (
+        click.option(
+            '--metrics-port', 'metrics_port',
+            help='Serve Prometheus metrics of the polling over HTTP at /metrics on this port.',
+            type=click.IntRange(min=0, max=65535),
+        ),
+        click.option(
+            '--metrics-host', 'metrics_host',
+            default='127.0.0.1',
+            help='Interface on which to serve the metrics.',
+            show_default=True,
+        ),
+    )
+
+    def decorator(f: 'FC') -> 'FC':
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            host, port = kwargs.pop('metrics_host'), kwargs.pop('metrics_port')
+            kwargs[name] = None if port is None else (host, port)
+            return f(*args, **kwargs)
+
+        for option in reversed(options):
+            wrapper = option(wrapper)
+        return wrapper
+
+    return decorator
+
+
+def transport_options(name: 'str' = 'transport') -> 'Callable[[FC], FC]':
+    '''Generate a `click` decorator for the HTTP transport options.
+
+    The individual options are collected into a single `TransportOptions`
+    keyworded argument, `name`.
+    '''
+    from gitlab.core import TransportOptions
+
+    defaults = TransportOptions()
+    options = (
+        click.option(
+            '--connect-timeout', 'connect_timeout',
+            default=defaults.connect_timeout,
+            help='Timeout (seconds) to establish a connection.',
+            show_default=True,
+            type=click.FloatRange(min=0, min_open=True),
+        ),
+        click.option(
+            '--read-timeout', 'read_timeout',
+            default=defaults.read_timeout,
+            help='Timeout (seconds) between bytes received from, or sent to, an instance.',
+            show_default=True,
+            type=click.FloatRange(min=0, min_open=True),
+        ),
+        click.option(
+            '--max-connections', 'max_connections',
+            default=defaults.max_connections,
+            help='Maximum number of connections per instance.',
+            show_default=True,
+            type=click.IntRange(min=1),
+        ),
+        click.option(
+            '--max-keepalive-connections', 'max_keepalive_connections',
+            default=defaults.max_keepalive_connections,
+            help='Maximum number of idle connections kept alive per instance.',
+            show_default=True,
+            type=click.IntRange(min=0),
+        ),
+        click.option(
+            '--keepalive-expiry', 'keepalive_expiry',
+            default=defaults.keepalive_expiry,
+            help='Time (seconds) an idle connection is kept alive for.',
+            show_default=True,
+            type=click.FloatRange(min=0),
+        ),
+        click.option(
+            '--http2', 'http2',
+            help='Negotiate HTTP/2 with instances that support it; requires the h2 package.',
+            is_flag=True,
+        ),
+    )
+
+    def decorator(f: 'FC') -> 'FC':
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            kwargs[name] = TransportOptions(**{
+                field: kwargs.pop(field)
+                for field in TransportOptions.__dataclass_fields__
+            })
+            return f(*args, **kwargs)
+
+        for option in reversed(options):
+            wrapper = option(wrapper)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,302 @@
+import click
+import contextlib
+import csv
+import importlib.util
+import json
+import sys
+import time
+
+from . import _options
+from datetime import datetime
+from gitlab.core import (
+    COLUMNAR_FORMATS,
+    COMPRESSIONS,
+    ColumnarWriter,
+    PollEntry,
+    arrow_columns,
+    create_engine,
+    csv_columns,
+    flush_export,
+    infer_compression,
+    latency_percentiles,
+    open_export,
+    read_checkpoint,
+    resolve_response_bodies,
+    select_poll_entries,
+    stream_rows,
+    write_checkpoint,
+)
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, TextIO
+
+
+# path of the output for writing the export to standard output
+STDOUT = Path('-')
+
+
+def _export_latency_percentiles(
+    output: 'Path',
+    compression: 'str | None',
+    database: 'str',
+    base_url: 'str | None',
+    since: 'datetime | None',
+    until: 'datetime | None',
+) -> 'None':
+    '''Exports the latency percentiles of each check of every instance polled within the filters.'''
+    click.echo('Computing latency percentiles...', err=True)
+    engine = create_engine(database)
+    with engine.connect() as connection:
+        percentiles = latency_percentiles(connection, base_url=base_url, since=since, until=until)
+    with open_export(output, compression or infer_compression(output)) as fp:
+        writer = csv.writer(fp, quoting=csv.QUOTE_ALL)
+        writer.writerow(('base_url', 'check', 'sample_count', 'p50_ms', 'p95_ms', 'p99_ms'))
+        writer.writerows(
+            (row.base_url, row.check, row.sample_count, f'{row.p50:.3f}', f'{row.p95:.3f}', f'{row.p99:.3f}')
+            for row in percentiles
+        )
+    click.echo(f'Completed export of {len(percentiles)} rows', err=True)
+
+
+def _export_columnar(
+    output: 'Path',
+    output_format: 'str',
+    compression: 'str | None',
+    partition_by_date: 'bool',
+    database: 'str',
+    column_options: 'Dict[str, bool]',
+    filters: 'Dict[str, Any]',
+) -> 'None':
+    '''Exports the polls within the filters to an Arrow or Parquet file, a record batch at a time.'''
+    columns = arrow_columns(**column_options)
+    positions = [i for i, column in enumerate(columns) if column.endswith('_response')]
+    stmt = select_poll_entries(tuple(columns.values()), **filters)
+
+    click.echo('Beginning export...', err=True)
+    count = 0
+    engine = create_engine(database)
+    writer = ColumnarWriter(output, output_format, list(columns), compression=compression, partition_by_date=partition_by_date)
+    with writer, engine.connect() as connection:
+        batches = stream_rows(connection, stmt)
+        if positions:
+            batches = resolve_response_bodies(connection, batches, positions)
+        for rows in batches:
+            writer.write(rows)
+            count += len(rows)
+    click.echo(f'Completed export of {count} rows', err=True)
+
+
+def _row_writer(fp: 'TextIO', output_format: 'str', headers: 'List[str]') -> 'Callable[[Sequence[Sequence[Any]]], None]':
+    '''Returns a function writing batches of exported rows to `fp` in the output format.'''
+    if output_format == 'jsonl':
+        def write_rows(rows: 'Sequence[Sequence[Any]]') -> 'None':
+            fp.writelines(json.dumps(dict(zip(headers, row))) + '\n' for row in rows)
+        return write_rows
+    return csv.writer(fp, quoting=csv.QUOTE_ALL).writerows
+
+
+@click.command()
+@click.option(
+    '-o', '--output', 'output',
+    help='Export path; - for standard output.',
+    required=True,
+    type=click.Path(
+        allow_dash=True,
+        dir_okay=False,
+        path_type=Path,
+        readable=True,
+        writable=True,
+    ),
+)
+@_options.database_option(ensure_exists=True)
+@click.option(
+    '-u', '--url', 'filter_instance',
+    help='GitLab instance URL to filter.',
+)
+@click.option(
+    '-f', '--from', 'filter_from',
+    help='Filter from timestamp (inclusive).',
+    type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+)
+@click.option(
+    '-t', '--to', 'filter_to',
+    help='Filter to timestamp (exclusive).',
+    type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+)
+@click.option(
+    '--include-responses', 'include_responses',
+    help='Include response information in the export.',
+    is_flag=True,
+)
+@click.option(
+    '--include-latencies', 'include_latencies',
+    help='Include the duration (milliseconds) and HTTP status code of each check in the export.',
+    is_flag=True,
+)
+@click.option(
+    '--include-readiness-components', 'include_readiness_components',
+    help='Include the names of the readiness check components that failed in the export.',
+    is_flag=True,
+)
+@click.option(
+    '--latency-percentiles', 'latency_percentiles_only',
+    help='Export the p50, p95 and p99 durations of each check of each instance, rather than the polls.',
+    is_flag=True,
+)
+@click.option(
+    '-z', '--compression', 'compression',
+    help='Compress the export; inferred from the extension of the export path (.gz, .zst) by default. '
+         'Arrow and Parquet files are compressed internally, by snappy for Parquet by default.',
+    type=click.Choice(COMPRESSIONS),
+)
+@click.option(
+    '--format', 'output_format',
+    default='csv',
+    help='Format of the exported polls; CSV, JSON Lines (one JSON object per poll), or columnar Arrow or Parquet files.',
+    show_default=True,
+    type=click.Choice(('csv', 'jsonl', *COLUMNAR_FORMATS)),
+)
+@click.option(
+    '--partition-by-date', 'partition_by_date',
+    help='Start a new Parquet row group with each date polled, so that readers filtering by date skip the others.',
+    is_flag=True,
+)
+@click.option(
+    '--checkpoint', 'checkpoint',
+    help='Export only the polls recorded since the export that last updated this checkpoint file, appending to the export path.',
+    type=click.Path(
+        dir_okay=False,
+        path_type=Path,
+        writable=True,
+    ),
+)
+@click.option(
+    '--follow', 'follow',
+    help='Keep exporting polls as they are recorded, until interrupted.',
+    is_flag=True,
+)
+@click.option(
+    '--follow-interval', 'follow_interval',
+    default=1.0,
+    help='Time (seconds) between checks for new polls; with --follow.',
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+)
+def export(
+    output: 'Path',
+    database: 'str',
+    include_responses: 'bool',
+    include_latencies: 'bool',
+    include_readiness_components: 'bool',
+    latency_percentiles_only: 'bool',
+    compression: 'str | None',
+    output_format: 'str',
+    partition_by_date: 'bool',
+    checkpoint: 'Path | None',
+    follow: 'bool',
+    follow_interval: 'float',
+    filter_instance: 'str | None',
+    filter_from: 'datetime | None',
+    filter_to: 'datetime | None',
+) -> 'None':
+    '''Export poll records from the specified GitLab instance.'''
+    to_stdout = output == STDOUT
+    # prevent overwriting files; though incremental exports append to them
+    if not to_stdout and checkpoint is None and output.exists():
+        raise click.ClickException(f'File already exists: {output.as_posix()}')
+    columnar = output_format in COLUMNAR_FORMATS
+    if columnar:
+        if importlib.util.find_spec('pyarrow') is None:
+            raise click.UsageError(f'{output_format} exports require the pyarrow package; install it with `pip install pyarrow`.')
+        if to_stdout or checkpoint is not None or follow:
+            raise click.UsageError(f'{output_format} exports are only written to a file, in full.')
+        if output_format == 'arrow' and compression not in (None, 'none', 'zstd'):
+            raise click.UsageError('Arrow exports may only be compressed with zstd.')
+    elif partition_by_date:
+        raise click.UsageError('--partition-by-date only applies to parquet exports.')
+    else:
+        compression = 'none' if to_stdout else compression or infer_compression(output)
+        if compression == 'zstd' and importlib.util.find_spec('zstandard') is None:
+            raise click.UsageError('zstd compression requires the zstandard package; install it with `pip install zstandard`.')
+
+    if any((filter_instance, filter_from, filter_to)):
+        click.echo(f'Applying filters to exported queryset...', err=True)
+        click.echo(f'  instance url:   {filter_instance}', err=True)
+        click.echo(f'  from timestamp: {"<none>" if filter_from is None else filter_from.isoformat()}', err=True)
+        click.echo(f'  to timestamp:   {"<none>" if filter_to is None else filter_to.isoformat()}', err=True)
+    else:
+        click.echo('No filters specified. Entire database will be exported...', err=True)
+
+    if latency_percentiles_only:
+        if include_responses or include_latencies or include_readiness_components:
+            raise click.UsageError('--latency-percentiles cannot be combined with the --include options.')
+        if checkpoint is not None or follow or output_format != 'csv' or to_stdout:
+            raise click.UsageError('--latency-percentiles is only exported to a CSV file, in full.')
+        _export_latency_percentiles(output, compression, database, filter_instance, filter_from, filter_to)
+        return
+    column_options = {
+        'include_latencies': include_latencies,
+        'include_readiness_components': include_readiness_components,
+        'include_responses': include_responses,
+    }
+    if columnar:
+        filters = {'base_url': filter_instance, 'since': filter_from, 'until': filter_to}
+        _export_columnar(output, output_format, compression, partition_by_date, database, column_options, filters)
+        return
+
+    columns = csv_columns(**column_options)
+    headers = list(columns)
+    positions = [i for i, column in enumerate(headers) if column.endswith('_response')]
+    # incremental exports follow the ids of the polls, selected as an additional, last column
+    incremental = checkpoint is not None or follow
+    after_id = None
+    if incremental:
+        after_id = 0 if checkpoint is None else read_checkpoint(checkpoint)
+        click.echo(f'Exporting polls recorded after #{after_id}...', err=True)
+    selected = (*columns.values(), PollEntry.id) if incremental else tuple(columns.values())
+    new_output = to_stdout or not output.exists() or output.stat().st_size == 0
+
+    # execute the query for export, streaming the rows through in batches
+    click.echo('Beginning export...', err=True)
+    count = 0
+    engine = create_engine(database)
+    with contextlib.ExitStack() as stack:
+        fp = sys.stdout if to_stdout else stack.enter_context(open_export(output, compression, append=not new_output))
+        write_rows = _row_writer(fp, output_format, headers)
+        if output_format == 'csv' and new_output:
+            csv.writer(fp, quoting=csv.QUOTE_ALL).writerow(headers)
+        try:
+            while True:
+                stmt = select_poll_entries(
+                    selected,
+                    after_id=after_id,
+                    base_url=filter_instance,
+                    since=filter_from,
+                    until=filter_to,
+                )
+                exported = 0
+                # a connection per pass, so that every pass reads the latest polls
+                with engine.connect() as connection:
+                    batches = stream_rows(connection, stmt)
+                    if include_responses:
+                        batches = resolve_response_bodies(connection, batches, positions)
+                    for rows in batches:
+                        if incremental:
+                            after_id = rows[-1][-1]
+                            rows = [row[:-1] for row in rows]
+                        write_rows(rows)
+                        exported += len(rows)
+                        if checkpoint is not None:
+                            # the rows are written out before they are checkpointed, so none are ever skipped
+                            flush_export(fp)
+                            write_checkpoint(checkpoint, after_id)
+                count += exported
+                if not follow:
+                    break
+                flush_export(fp)
+                if exported:
+                    click.echo(f'Exported {exported} polls, up to #{after_id}', err=True)
+                else:
+                    time.sleep(follow_interval)
+        except KeyboardInterrupt:
+            click.echo('Interrupt received. Stopping...', err=True)
+    click.echo(f'Completed export of {count} rows', err=True)
@@ -0,0 +1,114 @@
+import click
+import importlib.util
+
+from . import _options
+from gitlab.core import (
+    COMPRESSIONS,
+    IMPORT_FORMATS,
+    ConfigurationException,
+    create_engine,
+    import_database,
+    import_poll_records,
+    infer_compression,
+    infer_import_format,
+    open_import,
+    read_export,
+)
+from pathlib import Path
+from typing import Tuple
+
+
+def _default_source(path: 'Path') -> 'str':
+    '''Returns the name of an import, as its source: its file name, without extensions (e.g. `site-a` for `site-a.csv.gz`).'''
+    if infer_compression(path) != 'none':
+        path = path.with_suffix('')
+    return path.stem
+
+
+@click.command('import')
+@_options.database_option(ensure_exists=True)
+@click.argument(
+    'paths',
+    nargs=-1,
+    required=True,
+    type=click.Path(
+        dir_okay=False,
+        exists=True,
+        path_type=Path,
+        readable=True,
+        resolve_path=True,
+    ),
+)
+@click.option(
+    '--format', 'input_format',
+    help='Format of the imported files; CSV or JSON Lines exports, or poll databases. '
+         'Inferred from their contents or extension by default.',
+    type=click.Choice(IMPORT_FORMATS),
+)
+@click.option(
+    '-z', '--compression', 'compression',
+    help='Compression of the imported exports; inferred from their extension (.gz, .zst) by default.',
+    type=click.Choice(COMPRESSIONS),
+)
+@click.option(
+    '--source', 'source',
+    help='Name of the node the polls came from; polls already imported from it are skipped. '
+         'The name of each file, without extensions, by default.',
+)
+@click.option(
+    '--batch-size', 'batch_size',
+    default=100000,
+    help='Maximum number of polls imported per transaction.',
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+def import_polls(
+    database: 'str',
+    paths: 'Tuple[Path, ...]',
+    input_format: 'str | None',
+    compression: 'str | None',
+    source: 'str | None',
+    batch_size: 'int',
+) -> 'None':
+    '''Import the polls of exports or other poll databases, such as those of other nodes.
+
+    Polls are attributed to their source, and those already imported from it
+    are skipped, so that importing the same polls again imports nothing.
+    '''
+    formats = {}
+    for path in paths:
+        formats[path] = input_format or infer_import_format(path)
+        if formats[path] is None:
+            raise click.UsageError(f'Cannot tell the format of {path.as_posix()}; specify it with --format.')
+        if formats[path] != 'database' and (compression or infer_compression(path)) == 'zstd' \
+                and importlib.util.find_spec('zstandard') is None:
+            raise click.UsageError('zstd compression requires the zstandard package; install it with `pip install zstandard`.')
+
+    engine = create_engine(database)
+    total = 0
+    for path in paths:
+        path_source = source or _default_source(path)
+        click.echo(f'Importing {formats[path]} {path.as_posix()} as {path_source}...', err=True)
+        kwargs = {
+            'batch_size': batch_size,
+            'on_batch': lambda imported: click.echo(f'  {imported} polls imported', err=True),
+        }
+        try:
+            if formats[path] == 'database':
+                imported = import_database(engine, path, path_source, **kwargs)
+            else:
+                with open_import(path, compression or infer_compression(path)) as fp:
+                    imported = import_poll_records(engine, read_export(fp, formats[path]), path_source, **kwargs)
+        except ConfigurationException as e:
+            raise click.ClickException(str(e))
+        total += imported
+        click.echo(f'Imported {imported} new polls from {path.as_posix()}', err=True)
+
+    click.echo(f'Completed import of {total} polls', err=True)
+    if total:
+        # folding in millions of polls takes far longer than importing them, so it is left to the commands reading them
+        click.echo(
+            'The latest states and transitions catch up on the imported polls as they are next shown, '
+            'and the rollups as polling resumes; run `rollup` to bring the rollups up to date now.',
+            err=True,
+        )
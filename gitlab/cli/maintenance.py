@@ -0,0 +1,195 @@
+import click
+
+from . import _options, migrations
+from datetime import datetime, timezone
+from gitlab.core import (
+    RetentionRule,
+    create_engine,
+    enable_incremental_vacuum,
+    fold_rollups,
+    prune_poll_entries,
+    reclaim_space,
+    record_transitions,
+    remove_orphaned_response_bodies,
+    rollup_backlog,
+    state_backlog,
+    transition_backlog,
+    update_latest_states,
+)
+from pathlib import Path
+from typing import List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import sqlalchemy
+
+
+def fold_rollup_backlog(engine: 'sqlalchemy.Engine', batch_size: 'int') -> 'int':
+    '''Folds every poll not yet in the rollups into them, reporting progress; returns the number folded.'''
+    with engine.connect() as connection:
+        backlog = rollup_backlog(connection)
+    if not backlog:
+        return 0
+
+    click.echo(f'Folding up to {backlog} polls into the rollups...', err=True)
+    total = 0
+    while backlog:
+        with engine.begin() as connection:
+            total += fold_rollups(connection, limit=batch_size)
+            backlog = rollup_backlog(connection)
+        click.echo(f'  {total} polls folded; {backlog} remaining', err=True)
+    return total
+
+
+def record_transition_backlog(engine: 'sqlalchemy.Engine', batch_size: 'int') -> 'int':
+    '''Records the state transitions of every poll not yet compared, reporting progress; returns the number recorded.'''
+    with engine.connect() as connection:
+        backlog = transition_backlog(connection)
+    if not backlog:
+        return 0
+
+    click.echo(f'Recording the state transitions of up to {backlog} polls...', err=True)
+    total = 0
+    while backlog:
+        with engine.begin() as connection:
+            total += record_transitions(connection, limit=batch_size)
+            backlog = transition_backlog(connection)
+        click.echo(f'  {total} transitions recorded; {backlog} polls remaining', err=True)
+    return total
+
+
+def update_state_backlog(engine: 'sqlalchemy.Engine', batch_size: 'int') -> 'int':
+    '''Folds every poll not yet in the latest states into them, reporting progress; returns the number of updates.'''
+    with engine.connect() as connection:
+        backlog = state_backlog(connection)
+    if not backlog:
+        return 0
+
+    click.echo(f'Updating the latest states with up to {backlog} polls...', err=True)
+    total = 0
+    while backlog:
+        with engine.begin() as connection:
+            total += update_latest_states(connection, limit=batch_size)
+            backlog = state_backlog(connection)
+        click.echo(f'  {total} states updated; {backlog} polls remaining', err=True)
+    return total
+
+
+def _parse_retention_overrides(_ctx, _parameter, values: 'Tuple[str, ...]') -> 'List[RetentionRule]':
+    '''Parses `URL=DAYS` retention overrides.'''
+    rules = []
+    for value in values:
+        base_url, separator, keep_days = value.rpartition('=')
+        try:
+            if not (separator and base_url):
+                raise ValueError
+            rules.append(RetentionRule(keep_days=float(keep_days), base_url=base_url.rstrip('/')))
+        except ValueError:
+            raise click.BadParameter(f'Expected URL=DAYS, got: {value}')
+    return rules
+
+
+@click.command()
+@_options.database_option(ensure_exists=True)
+@click.option(
+    '--batch-size', 'batch_size',
+    default=100000,
+    help='Maximum number of polls folded per transaction.',
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+def rollup(database: 'str', batch_size: 'int') -> 'None':
+    '''Folds recorded polls into the hourly and daily rollups.
+
+    Resumes from where the rollups were last brought up to date, whether by
+    this command or by polling.
+    '''
+    total = fold_rollup_backlog(create_engine(database), batch_size)
+    if total:
+        click.echo(f'Completed rollup of {total} polls', err=True)
+    else:
+        click.echo('Rollups are up to date.', err=True)
+
+
+@click.command()
+@_options.database_option(ensure_exists=True)
+@click.option(
+    '--keep-days', 'keep_days',
+    default=30.0,
+    help='Days for which polls are kept in full; after, `report` counts them from the rollups alone, and `incidents` still lists their outages.',
+    show_default=True,
+    type=click.FloatRange(min=0),
+)
+@click.option(
+    '--keep', 'overrides',
+    callback=_parse_retention_overrides,
+    help='Days for which the polls of a specific instance are kept, as URL=DAYS; may be repeated.',
+    multiple=True,
+)
+@click.option(
+    '--archive-dir', 'archive_directory',
+    help='Move pruned polls into monthly archive databases in this directory, rather than deleting them outright.',
+    type=click.Path(
+        file_okay=False,
+        path_type=Path,
+        resolve_path=True,
+        writable=True,
+    ),
+)
+@click.option(
+    '--batch-size', 'batch_size',
+    default=10000,
+    help='Maximum number of polls deleted per transaction.',
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    '--enable-incremental-vacuum', 'enable_vacuum',
+    help='Switch a database created before incremental vacuuming to it; rewrites the whole database once.',
+    is_flag=True,
+)
+def prune(
+    database: 'str',
+    keep_days: 'float',
+    overrides: 'List[RetentionRule]',
+    archive_directory: 'Path | None',
+    batch_size: 'int',
+    enable_vacuum: 'bool',
+) -> 'None':
+    '''Prune (or archive) polls that have outlived their retention, and reclaim their space.'''
+    engine = create_engine(database)
+    # polls are only ever pruned once they are summarised in the rollups and latest states, and their transitions recorded
+    fold_rollup_backlog(engine, 100000)
+    record_transition_backlog(engine, 100000)
+    update_state_backlog(engine, 100000)
+
+    rules = [RetentionRule(keep_days=keep_days), *overrides]
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for rule in rules:
+        click.echo(f'Keeping {rule.base_url or "every other instance"} from {rule.cutoff(now):%Y-%m-%d %H:%M:%S}', err=True)
+    if archive_directory is not None:
+        archive_directory.mkdir(parents=True, exist_ok=True)
+
+    deleted = prune_poll_entries(
+        engine,
+        rules,
+        now,
+        archive_directory=archive_directory,
+        batch_size=batch_size,
+        initialise_archive=migrations.initialise,
+        on_batch=lambda deleted: click.echo(f'  {deleted} polls {"archived" if archive_directory else "pruned"}', err=True),
+    )
+    bodies = remove_orphaned_response_bodies(engine) if deleted else 0
+    click.echo(f'Completed pruning of {deleted} polls and {bodies} response bodies', err=True)
+
+    if enable_vacuum:
+        click.echo('Switching to incremental vacuuming; this may take a while...', err=True)
+        enable_incremental_vacuum(engine)
+    released = reclaim_space(engine)
+    if released is None:
+        click.echo(
+            'Freed space is kept for reuse by the database, as it is not incrementally vacuumed; '
+            'switch it over once with --enable-incremental-vacuum.',
+            err=True,
+        )
+    else:
+        click.echo(f'Released {released} free pages', err=True)
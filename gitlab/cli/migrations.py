@@ -1,32 +1,47 @@
-import alembic.config
 import click
 import os
 
 from . import _options
+from gitlab.core import create_engine, has_schema, initialise_schema
 from pathlib import Path
 
 
-def _set_working_directory() -> 'None':
-    '''Sets the working directory for Alembic to the project root.'''
+def _run_alembic(*arguments: 'str') -> 'None':
+    '''Runs an Alembic command against the project migrations.'''
+    # imported on demand, as Alembic takes longer to import than most commands take to run
+    import alembic.config
+
     # slightly frail; may break if the directory structure is changed
     os.chdir(Path(__file__).resolve().parent.parent)
+    alembic.config.main(argv=arguments)
+
+
+def initialise(database: 'str') -> 'None':
+    '''Creates the latest schema in a new database, and stamps it as fully migrated.'''
+    engine = create_engine(database)
+    initialise_schema(engine)
+    engine.dispose()
 
 
 @click.command()
 @_options.database_option()
 def run(database: 'str') -> 'None':
     '''Executes database migrations.'''
-    _set_working_directory()
+    engine = create_engine(database)
+    with engine.connect() as connection:
+        migrated = has_schema(connection)
+    engine.dispose()
+    if not migrated:
+        # nothing to migrate from; create the latest schema outright
+        click.echo('Creating the schema of a new database...', err=True)
+        initialise(database)
+        return
 
-    arguments = ('--raiseerr', '-x', f'database={database}', 'upgrade', 'head')
-    alembic.config.main(argv=arguments)
+    _run_alembic('--raiseerr', '-x', f'database={database}', 'upgrade', 'head')
 
 
 @click.command()
 @_options.database_option(ensure_exists=True)
 def check(database: 'str') -> 'None':
     '''Executes database migration checks.'''
-    _set_working_directory()
-
-    arguments = ('-x', f'database={database}', 'check')
-    alembic.config.main(argv=arguments)
+    _run_alembic('-x', f'database={database}', 'check')
@@ -1,63 +1,757 @@
+import asyncio
 import click
-import csv
+import functools
 import json
+import logging
+import multiprocessing
+import signal
 import sqlalchemy
-import sqlalchemy.orm
+import threading
 import time
 import traceback
 
 from . import _options
-from contextlib import contextmanager
-from datetime import datetime
-from gitlab.core import GitLabClient, HttpRequestException, PollEntry
+from ._logging import JsonPayload, LoggingOptions, configure_logging, log_fields
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from gitlab.core import (
+    AdaptivePolicy,
+    AsyncGitLabClient,
+    CircuitBreaker,
+    ConfigurationException,
+    FixedRateScheduler,
+    FleetInstance,
+    HttpRequestException,
+    JobStatistics,
+    LeaseOptions,
+    PollEntry,
+    PollMetrics,
+    PollWriter,
+    ReadinessComponent,
+    ReadinessResult,
+    ResponseBody,
+    TransportOptions,
+    WriterStatistics,
+    assign_shards,
+    create_engine,
+    fold_rollups_on_write,
+    load_fleet,
+    readiness_components,
+    reassign_instances,
+    record_transitions_on_write,
+    release_leases,
+    renew_leases,
+    serve_metrics,
+    update_latest_states_on_write,
+)
+from http import HTTPStatus
 from pathlib import Path
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Tuple, TypeVar
+
+
+T = TypeVar('T')
+
+logger = logging.getLogger(__name__)
+
+# derived data maintained alongside every batch of polls written
+WRITE_PROCESSORS = (fold_rollups_on_write, record_transitions_on_write, update_latest_states_on_write)
+
+
+@dataclass(frozen=True)
+class _ShardSummary:
+    '''Sent by a worker process once terminated, with the statistics of the jobs of its shard.'''
+    shard: 'int'
+    job_statistics: 'Dict[str, JobStatistics]'
+
+
+def _poll_once(
+    database: 'str',
+    access_token: 'str',
+    instance: 'str',
+    save_responses: 'bool',
+    *,
+    poll_timeout: 'float | None' = None,
+    transport: 'TransportOptions | None' = None,
+) -> 'None':
+    '''Polls the specified GitLab instance once, failing if the poll could not be recorded.'''
+    async def poll() -> 'PollEntry':
+        async with AsyncGitLabClient(access_token, instance, transport=transport) as client:
+            return await _poll_instance(client, save_responses, poll_timeout=poll_timeout)
+
+    poll_entry = asyncio.run(poll())
+    with PollWriter(create_engine(database), on_error=_report_write_error, processors=WRITE_PROCESSORS) as writer:
+        writer.submit(poll_entry)
+    # the writer only reports failed writes, so that the poller keeps going; a single poll must fail loudly
+    if writer.statistics.rows_dropped:
+        raise click.ClickException(f'Failed to record the poll of {instance}.')
+
+
+async def _poll_continuously(
+    database: 'str',
+    instances: 'List[FleetInstance]',
+    concurrency: 'int',
+    save_responses: 'bool',
+    *,
+    adaptive_policy: 'AdaptivePolicy | None' = None,
+    batch_size: 'int' = 500,
+    flush_interval: 'float' = 1.0,
+    lease: 'LeaseOptions | None' = None,
+    logging_options: 'LoggingOptions | None' = None,
+    metadata_ttl: 'float | None' = None,
+    metrics_address: 'Tuple[str, int] | None' = None,
+    poll_timeout: 'float | None' = None,
+    report_interval: 'float' = 60.0,
+    transport: 'TransportOptions | None' = None,
+    workers: 'int' = 1,
+) -> 'None':
+    '''Polls the specified GitLab instances on a fixed-rate schedule until cancelled.
 
+    Each instance keeps a single client for the lifetime of the polling, so its
+    connections are reused from one poll to the next, and its metadata is
+    cached for `metadata_ttl` seconds (if given). If a `metrics_address`
+    is given, Prometheus metrics of the polling are served there, from memory.
+
+    Given an `adaptive_policy`, each instance is polled faster while degraded
+    or recovering, and its polls are skipped while it is down (see
+    `CircuitBreaker`).
+
+    Given more than one `workers`, the instances are split across as many
+    worker processes (see `_poll_shards`), which share out the `concurrency`;
+    this process then only writes their polls to the database. The workers log
+    as given by `logging_options`, if given.
+
+    Given a `lease`, only the instances this node holds leases on are polled,
+    so that the fleet is shared with the other nodes using the database (see
+    `_poll_leased`); a single worker is supported.
+    '''
+    _cancel_on_termination()
+
+    async def report_progress() -> 'None':
+        while True:
+            await asyncio.sleep(report_interval)
+            missed_ticks = sum(statistics.missed_ticks for statistics in job_statistics.values())
+            logger.info('Progress: %s; %d missed ticks', _describe_writer_statistics(writer.statistics), missed_ticks)
 
-def _poll_once(database: 'str', access_token: 'str', instance: 'str', save_responses: 'bool') -> 'None':
-    '''Polls the specified GitLab instance once.'''
-    client = GitLabClient(access_token, instance)
+    def record(poll_entry: 'PollEntry') -> 'None':
+        metrics.observe(poll_entry)
+        writer.submit(poll_entry)
+
+    engine = create_engine(database)
+    writer = PollWriter(
+        engine,
+        batch_size=batch_size,
+        max_delay=flush_interval,
+        on_error=_report_write_error,
+        processors=WRITE_PROCESSORS,
+    )
+    metrics = PollMetrics(writer_statistics=lambda: writer.statistics)
+    metrics_server = None
+    if metrics_address is not None:
+        metrics_server = await serve_metrics(metrics, *metrics_address)
+        host, port = metrics_server.sockets[0].getsockname()[:2]
+        logger.info('Serving metrics at http://%s:%d/metrics', host, port)
+
+    polling_options = {
+        'adaptive_policy': adaptive_policy,
+        'metadata_ttl': metadata_ttl,
+        'poll_timeout': poll_timeout,
+        'transport': transport,
+    }
+    clients = []
+    job_statistics = {}
+    if workers > 1:
+        polling = _poll_shards(
+            instances, workers, concurrency, save_responses, record, job_statistics, polling_options, logging_options,
+        )
+    else:
+        scheduler = FixedRateScheduler(concurrency, on_error=_report_job_error, on_missed_ticks=_report_missed_ticks)
+        job_statistics = scheduler.statistics
+        if lease is None:
+            _schedule_polls(scheduler, instances, save_responses, record, clients, **polling_options)
+            polling = scheduler.run()
+        else:
+            polling = _poll_leased(scheduler, engine, lease, instances, save_responses, record, clients, polling_options)
+
+    async def shut_down() -> 'None':
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+        # flushing blocks until the pending entries are committed, so do so off the event loop
+        await asyncio.to_thread(writer.close)
+        for base_url, statistics in job_statistics.items():
+            logger.info(
+                'Polling summary of %s: %d polls, %d missed ticks', base_url, statistics.ticks, statistics.missed_ticks,
+                extra=log_fields(base_url=base_url, polls=statistics.ticks, missed_ticks=statistics.missed_ticks),
+            )
+        logger.info('Polling summary: %s', _describe_writer_statistics(writer.statistics))
+
+    reporter = asyncio.create_task(report_progress())
+    try:
+        await polling
+    finally:
+        reporter.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+        await _run_to_completion(shut_down())
+
+
+async def _poll_leased(
+    scheduler: 'FixedRateScheduler',
+    engine: 'sqlalchemy.Engine',
+    lease: 'LeaseOptions',
+    instances: 'List[FleetInstance]',
+    save_responses: 'bool',
+    on_poll: 'Callable[[PollEntry], Any]',
+    clients: 'List[AsyncGitLabClient]',
+    polling_options: 'Dict[str, Any]',
+) -> 'None':
+    '''Polls only the instances this node holds leases on, renewing the leases until cancelled.
+
+    The leases are renewed (off the event loop) every `lease.renew_interval`
+    seconds, see `renew_leases`; instances are scheduled as their leases are
+    acquired, and cancelled as they are released. Should renewals keep failing
+    until the leases lapse, no instance is polled until they are renewed, as
+    other nodes may have taken them over by then. Once cancelled, the leases
+    are released, for the other nodes to take up at once.
+    '''
+    by_url = {instance.base_url: instance for instance in instances}
+    held = {} # clients of the instances held, by URL
+    valid_until = 0.0 # on the monotonic clock, from the start of the latest renewal
+
+    def holds_leases() -> 'bool':
+        return time.monotonic() < valid_until
+
+    def renew(now: 'datetime') -> 'List[str]':
+        with engine.begin() as connection:
+            return renew_leases(connection, lease.node_id, list(by_url), now, duration=lease.duration)
+
+    def release() -> 'None':
+        with engine.begin() as connection:
+            release_leases(connection, lease.node_id)
+
+    async def stop() -> 'None':
+        await scheduler.stop()
+        try:
+            await asyncio.to_thread(release)
+        except sqlalchemy.exc.SQLAlchemyError as exception:
+            logger.error('Failed to release the leases of node %s: %s', lease.node_id, exception)
+
+    logger.info('Sharing %d instances with the other nodes as node %s', len(by_url), lease.node_id)
+    try:
+        while True:
+            renewed_at = time.monotonic()
+            try:
+                leased = set(await asyncio.to_thread(renew, datetime.now(timezone.utc).replace(tzinfo=None)))
+            except sqlalchemy.exc.SQLAlchemyError as exception:
+                logger.error('Failed to renew the leases of node %s: %s', lease.node_id, exception)
+            else:
+                valid_until = renewed_at + lease.duration
+                acquired, released = sorted(leased - held.keys()), sorted(held.keys() - leased)
+                for base_url in released:
+                    scheduler.cancel(base_url)
+                    client = held.pop(base_url)
+                    clients.remove(client)
+                    await client.aclose()
+                scheduled = []
+                _schedule_polls(
+                    scheduler, [by_url[base_url] for base_url in acquired], save_responses, on_poll, scheduled,
+                    holds_lease=holds_leases, **polling_options,
+                )
+                held.update(zip(acquired, scheduled))
+                clients.extend(scheduled)
+                if acquired or released:
+                    logger.info('Holding leases on %d of %d instances (%d acquired, %d released)',
+                                len(held), len(by_url), len(acquired), len(released))
+            await asyncio.sleep(lease.renew_interval)
+    finally:
+        await _run_to_completion(stop())
+
+
+async def _poll_shards(
+    instances: 'List[FleetInstance]',
+    workers: 'int',
+    concurrency: 'int',
+    save_responses: 'bool',
+    on_poll: 'Callable[[PollEntry], Any]',
+    job_statistics: 'Dict[str, JobStatistics]',
+    polling_options: 'Dict[str, Any]',
+    logging_options: 'LoggingOptions | None' = None,
+) -> 'None':
+    '''Polls the instances from worker processes until cancelled, handing every poll to `on_poll`.
+
+    The instances are split into shards of about equal load, each polled by a
+    worker process of its own; the polls are sent back to this process, so
+    that the database keeps a single writer. Should a worker die, its
+    instances are reassigned to the remaining workers. Once cancelled, the
+    workers are terminated, and the statistics of their jobs gathered into
+    `job_statistics`.
+    '''
+    context = multiprocessing.get_context('spawn')
+    loop = asyncio.get_running_loop()
+    results = context.Queue()
+    shards = assign_shards(instances, min(workers, len(instances)))
+    shard_concurrency = -(-concurrency // len(shards)) # rounded up, so that every worker polls at least one
+    processes = {}
+    for shard, shard_instances in enumerate(shards):
+        commands = context.Queue()
+        process = context.Process(
+            target=_run_shard,
+            args=(shard, shard_instances, commands, results, shard_concurrency, save_responses, polling_options, logging_options),
+            daemon=True,
+            name=f'gitlab-poller-{shard}',
+        )
+        process.start()
+        processes[shard] = (process, commands)
+    logger.info('Started %d worker processes, each polling up to %d instances at once', len(processes), shard_concurrency)
+
+    def receive(message: 'PollEntry | _ShardSummary') -> 'None':
+        if isinstance(message, _ShardSummary):
+            job_statistics.update(message.job_statistics)
+        else:
+            on_poll(message)
+
+    def drain() -> 'None':
+        # results are read off the event loop, as reading blocks; but handled on it
+        while (message := results.get()) is not None:
+            loop.call_soon_threadsafe(receive, message)
+
+    drainer = threading.Thread(target=drain, daemon=True, name='gitlab-poller-results')
+    drainer.start()
+    try:
+        while True:
+            await asyncio.sleep(1.0)
+            for shard, (process, _commands) in list(processes.items()):
+                if process.is_alive():
+                    continue
+                del processes[shard]
+                orphans, shards[shard] = shards[shard], []
+                logger.warning('Worker process %d exited with code %s; reassigning its %d instances',
+                               shard, process.exitcode, len(orphans))
+                if not processes:
+                    raise click.ClickException('Every worker process has exited.')
+                loads = {shard: sum(instance.load for instance in shards[shard]) for shard in processes}
+                for survivor, reassigned in reassign_instances(orphans, loads).items():
+                    if reassigned:
+                        shards[survivor].extend(reassigned)
+                        processes[survivor][1].put(reassigned)
+    finally:
+        def stop_workers() -> 'None':
+            for process, _commands in processes.values():
+                process.terminate()
+            for process, _commands in processes.values():
+                process.join()
+            # every worker has flushed its results by now, so this is the last message read
+            results.put(None)
+            drainer.join()
+
+        await _run_to_completion(asyncio.to_thread(stop_workers))
+
+
+def _run_shard(
+    shard: 'int',
+    instances: 'List[FleetInstance]',
+    commands: 'multiprocessing.Queue',
+    results: 'multiprocessing.Queue',
+    concurrency: 'int',
+    save_responses: 'bool',
+    polling_options: 'Dict[str, Any]',
+    logging_options: 'LoggingOptions | None' = None,
+) -> 'None':
+    '''Runs in a worker process, polling a shard of the instances until terminated.
+
+    Every poll is sent to `results`, followed by a `_ShardSummary` once the
+    worker is terminated. Further instances may be assigned to the worker by
+    sending lists of them to `commands`. Spawned workers start without any
+    logging configured, so they log to stderr themselves, as given by
+    `logging_options`.
+    '''
+    # interrupts reach every process in the foreground; leave it to the parent to wind the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def poll_shard() -> 'None':
+        _cancel_on_termination()
+        loop = asyncio.get_running_loop()
+        clients = []
+        scheduler = FixedRateScheduler(concurrency, on_error=_report_job_error, on_missed_ticks=_report_missed_ticks)
+        _schedule_polls(scheduler, instances, save_responses, results.put, clients, **polling_options)
+
+        def receive_instances() -> 'None':
+            while (assigned := commands.get()) is not None:
+                loop.call_soon_threadsafe(functools.partial(
+                    _schedule_polls, scheduler, assigned, save_responses, results.put, clients, **polling_options,
+                ))
+
+        threading.Thread(target=receive_instances, daemon=True).start()
+        try:
+            await scheduler.run()
+        finally:
+            await _run_to_completion(asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True))
+            results.put(_ShardSummary(shard, dict(scheduler.statistics)))
+
+    with nullcontext() if logging_options is None else configure_logging(logging_options):
+        try:
+            asyncio.run(poll_shard())
+        except asyncio.CancelledError:
+            pass
+
+
+def _schedule_polls(
+    scheduler: 'FixedRateScheduler',
+    instances: 'List[FleetInstance]',
+    save_responses: 'bool',
+    on_poll: 'Callable[[PollEntry], Any]',
+    clients: 'List[AsyncGitLabClient]',
+    *,
+    adaptive_policy: 'AdaptivePolicy | None' = None,
+    holds_lease: 'Callable[[], bool] | None' = None,
+    metadata_ttl: 'float | None' = None,
+    poll_timeout: 'float | None' = None,
+    transport: 'TransportOptions | None' = None,
+) -> 'None':
+    '''Schedules the polls of every instance, handing each poll to `on_poll`.
+
+    The client of every instance is added to `clients`, to be closed once the
+    polling stops. Given `holds_lease`, polls are only made while it holds.
+    '''
+    loop = asyncio.get_running_loop()
+
+    def poll_job(fleet_instance: 'FleetInstance') -> 'Callable[[], Awaitable[float | None]]':
+        client = AsyncGitLabClient(
+            fleet_instance.access_token,
+            fleet_instance.base_url,
+            metadata_ttl=metadata_ttl,
+            transport=transport,
+        )
+        clients.append(client)
+        # a hung instance must not hold on to a worker beyond its own interval
+        budget = min(fleet_instance.interval, poll_timeout or fleet_instance.interval)
+        breaker = None if adaptive_policy is None else CircuitBreaker(fleet_instance.interval, adaptive_policy)
+
+        async def job() -> 'float | None':
+            if holds_lease is not None and not holds_lease():
+                return None
+            if breaker is None:
+                poll_entry = await _poll_instance(client, save_responses, poll_timeout=budget)
+            elif not breaker.allow(loop.time()):
+                poll_entry = _skipped_poll_entry(client.base_url, breaker.consecutive_failures)
+            else:
+                poll_entry = await _poll_instance(client, save_responses, poll_timeout=budget)
+                breaker.record(
+                    loop.time(),
+                    available=poll_entry.health_check_passed and poll_entry.readiness_check_passed,
+                    healthy=poll_entry.health_check_passed,
+                )
+            on_poll(poll_entry)
+            return None if breaker is None else breaker.next_interval
+        return job
+
+    for i, fleet_instance in enumerate(instances):
+        # stagger the first polls across the interval, rather than polling every instance at once
+        offset = fleet_instance.interval * i / len(instances)
+        scheduler.schedule(fleet_instance.base_url, fleet_instance.interval, poll_job(fleet_instance), offset=offset)
+
+
+def _skipped_poll_entry(base_url: 'str', consecutive_failures: 'int') -> 'PollEntry':
+    '''Records a poll skipped because the circuit of the instance is open.'''
+    logger.warning(
+        'Skipped poll of %s; circuit open after %d failed health checks', base_url, consecutive_failures,
+        extra=log_fields(base_url=base_url, skipped=True, consecutive_failures=consecutive_failures),
+    )
+    return PollEntry(
+        base_url=base_url,
+        created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        health_check_passed=False,
+        instance_version='',
+        readiness_check_passed=False,
+        skipped=True,
+    )
+
+
+async def _poll_instance(
+    client: 'AsyncGitLabClient',
+    save_responses: 'bool',
+    *,
+    poll_timeout: 'float | None' = None,
+) -> 'PollEntry':
+    '''Polls the specified GitLab instance, issuing all of its checks concurrently.
+
+    Checks still outstanding after `poll_timeout` seconds are abandoned, and fail critically.
+    Metadata is only fetched if the client has none cached that is still fresh,
+    or once the health of the instance changes.
+
+    The poll is logged as a single summary line; the outcome and payload of
+    each check only at debug level.
+    '''
+    started_at = time.perf_counter()
     poll_entry = PollEntry(
-        base_url=instance,
+        base_url=client.base_url,
+        # entries are written behind, so the timestamp cannot be left to the database
+        created_at=datetime.now(timezone.utc).replace(tzinfo=None),
         health_check_passed=False,
         instance_version='',
         readiness_check_passed=False,
     )
+    failures = []
+    durations = {}
+
+    logger.debug('Polling GitLab instance at %s...', client.domain)
+    cache = client.metadata_cache
+    metadata_cached = cache is not None and cache.fresh
+    checks = [
+        _timed(client.health_check(), durations, 'health_check'),
+        _timed(client.readiness_check(), durations, 'readiness_check'),
+    ]
+    if not metadata_cached:
+        checks.append(_timed(client.fetch_metadata(), durations, 'metadata'))
+    # the checks are independent of one another; a poll only costs as much as the slowest
+    health_check, readiness_check, *fetched = await _gather_within_budget(poll_timeout, *checks)
+    health_changed = cache is not None and cache.observe_health(not isinstance(health_check, BaseException))
+    if metadata_cached and health_changed:
+        # the instance went down or came back, perhaps from an upgrade; so refresh its version now
+        remaining = None if poll_timeout is None else max(0.0, poll_timeout - (time.perf_counter() - started_at))
+        fetched = await _gather_within_budget(remaining, _timed(client.fetch_metadata(), durations, 'metadata'))
+        metadata_cached = False
+    metadata = cache.metadata if metadata_cached else fetched[0]
+
+    poll_entry.health_check_duration_ms = durations.get('health_check')
+    poll_entry.health_check_status_code = _status_code(health_check)
+    poll_entry.readiness_check_duration_ms = durations.get('readiness_check')
+    poll_entry.readiness_check_status_code = _status_code(readiness_check)
+    poll_entry.readiness_results = _readiness_results(readiness_check)
+    if not metadata_cached:
+        poll_entry.metadata_duration_ms = durations.get('metadata')
+        poll_entry.metadata_status_code = _status_code(metadata)
+
+    with _critical_failure_context(failures), _possible_http_exception_context(f'Health check of {client.domain} failed: {{body}}'):
+        health_check_output = _unwrap_result(health_check)
+        poll_entry.health_check_passed = True
+        if save_responses:
+            poll_entry.health_check_response = ResponseBody.from_text(health_check_output)
+        logger.debug('Health check of %s passed: %r', client.domain, health_check_output)
 
-    click.echo(f'[ {datetime.now().isoformat()} ] Polling GitLab instance at {client.domain}...', err=True)
+    with _critical_failure_context(failures), _possible_http_exception_context(f'Readiness check of {client.domain} failed: {{body}}'):
+        readiness_check_output = _unwrap_result(readiness_check)
+        poll_entry.readiness_check_passed = True
+        if save_responses:
+            poll_entry.readiness_check_response = ResponseBody.from_text(json.dumps(readiness_check_output))
+        logger.debug('Readiness check of %s passed: %s', client.domain, JsonPayload(readiness_check_output))
+
+    with _critical_failure_context(failures), _possible_http_exception_context(f'Metadata fetch of {client.domain} failed: {{body}}'):
+        metadata_output = _unwrap_result(metadata)
+        poll_entry.instance_version = metadata_output['version']
+        if save_responses:
+            poll_entry.metadata_response = ResponseBody.from_text(json.dumps(metadata_output))
+        logger.debug('Metadata of %s%s: %s', client.domain, ' (cached)' if metadata_cached else '', JsonPayload(metadata_output))
+
+    if failures:
+        poll_entry.error_message = '\n\n'.join(failures)
+    _log_poll(poll_entry, time.perf_counter() - started_at, health_check, readiness_check, metadata, metadata_cached)
+    return poll_entry
+
+
+def _cancel_on_termination() -> 'None':
+    '''Cancels the current task on SIGTERM, so that it may wind down as it would on an interrupt.'''
     try:
-        click.echo(f'  Performing health check...', err=True)
-        with _possible_http_exception_context(f'    Failed: {{body}}'):
-            health_check_output = client.health_check()
-            poll_entry.health_check_passed = True
-            if save_responses:
-                poll_entry.health_check_response = health_check_output
-            click.echo(f'    Passed: {repr(health_check_output)}', err=True)
-
-        click.echo(f'  Performing readiness check...', err=True)
-        with _possible_http_exception_context(f'    Failed: {{body}}'):
-            readiness_check_output = client.readiness_check()
-            readiness_check_output_encoded = json.dumps(readiness_check_output)
-            poll_entry.readiness_check_passed = True
-            if save_responses:
-                poll_entry.readiness_check_response = readiness_check_output_encoded
-            click.echo(f'    Passed: {readiness_check_output_encoded}', err=True)
-
-        click.echo(f'  Fetching metadata...', err=True)
-        with _possible_http_exception_context(f'    Failed: {{body}}'):
-            metadata = client.fetch_metadata()
-            metadata_encoded = json.dumps(metadata)
-            poll_entry.instance_version = metadata['version']
-            if save_responses:
-                poll_entry.metadata_response = json.dumps(metadata)
-            click.echo(f'    Passed: {metadata_encoded}', err=True)
-    except Exception as exception:
-        poll_entry.error_message = ''.join(traceback.format_exception(exception)).strip()
-        click.echo(f'  Critical failure: {str(exception)}', err=True)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError: # signal handlers are unavailable on Windows event loops
+        pass
+
+
+async def _gather_within_budget(budget: 'float | None', *coroutines: 'Awaitable[Any]') -> 'List[Any]':
+    '''Awaits the coroutines concurrently, returning their results or the exceptions they raised.
+
+    Coroutines still outstanding after `budget` seconds are cancelled, and result in a `TimeoutError`.
+    '''
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        _done, pending = await asyncio.wait(tasks, timeout=budget)
+    finally:
+        for task in tasks:
+            task.cancel() # no-op on completed tasks
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    return [
+        TimeoutError(f'Exceeded the poll budget of {budget:.2f}s') if task in pending
+        else task.exception() or task.result()
+        for task in tasks
+    ]
+
+
+def _describe_check(passed: 'bool', result: 'Any') -> 'str':
+    '''Describes the outcome of a check, from whether it passed and its gathered result.'''
+    if passed:
+        return 'passed'
+    if isinstance(result, HttpRequestException):
+        return f'failed (HTTP {result.response.status_code})'
+    if isinstance(result, BaseException):
+        return f'failed ({str(result) or type(result).__name__})'
+    return 'failed'
+
+
+def _describe_writer_statistics(statistics: 'WriterStatistics') -> 'str':
+    '''Summarises the throughput of a poll writer.'''
+    description = (f'{statistics.rows_written} rows written in {statistics.batches_written} batches '
+                   f'({statistics.rows_per_second:.2f} rows/s), queue depth {statistics.queue_depth}')
+    if statistics.rows_dropped:
+        description += f', {statistics.rows_dropped} rows dropped'
+    return description
+
+
+def _log_poll(
+    poll_entry: 'PollEntry',
+    duration: 'float',
+    health_check: 'Any',
+    readiness_check: 'Any',
+    metadata: 'Any',
+    metadata_cached: 'bool',
+) -> 'None':
+    '''Logs the summary line of a poll; at warning level if either check failed, otherwise at info level.
+
+    The line is only put together if it is to be logged at all.
+    '''
+    level = logging.INFO if poll_entry.health_check_passed and poll_entry.readiness_check_passed else logging.WARNING
+    if not logger.isEnabledFor(level):
+        return
+    failed_components = [result.component.name for result in poll_entry.readiness_results if not result.passed]
+    readiness = _describe_check(poll_entry.readiness_check_passed, readiness_check)
+    if failed_components:
+        readiness += f' [{", ".join(failed_components)}]'
+    if poll_entry.instance_version:
+        version = f'version {poll_entry.instance_version}{" (cached)" if metadata_cached else ""}'
+    else:
+        version = f'metadata {_describe_check(False, metadata)}'
+    logger.log(
+        level,
+        'Polled %s in %.0f ms: health %s, readiness %s, %s',
+        poll_entry.base_url,
+        duration * 1000,
+        _describe_check(poll_entry.health_check_passed, health_check),
+        readiness,
+        version,
+        extra=log_fields(
+            base_url=poll_entry.base_url,
+            duration_ms=round(duration * 1000, 3),
+            health_check_passed=poll_entry.health_check_passed,
+            health_check_status_code=poll_entry.health_check_status_code,
+            readiness_check_passed=poll_entry.readiness_check_passed,
+            readiness_check_status_code=poll_entry.readiness_check_status_code,
+            failed_readiness_components=failed_components,
+            instance_version=poll_entry.instance_version,
+            metadata_cached=metadata_cached,
+        ),
+    )
+
+
+def _report_job_error(instance: 'str', exception: 'Exception') -> 'None':
+    '''Reports a poll of an instance that failed unexpectedly; the instance is polled again on its next tick.'''
+    logger.error('Failed to poll %s: %s', instance, exception, exc_info=exception)
+
+
+def _report_missed_ticks(instance: 'str', missed: 'int') -> 'None':
+    '''Reports ticks of an instance that could not be serviced in time.'''
+    logger.warning('Missed %d tick(s) for %s; polling is over capacity.', missed, instance)
+
+
+def _report_write_error(exception: 'Exception', batch: 'List[PollEntry]') -> 'None':
+    '''Reports a batch of poll entries that could not be written.'''
+    logger.error('Failed to record %d polls: %s', len(batch), exception)
+
+
+def _run_until_interrupted(coroutine: 'Coroutine[Any, Any, None]') -> 'None':
+    '''Runs the coroutine until it completes, or is interrupted or terminated.'''
+    try:
+        asyncio.run(coroutine)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info('Interrupt received. Stopping...')
+
+
+async def _run_to_completion(coroutine: 'Awaitable[T]') -> 'T':
+    '''Awaits the coroutine in a task of its own, which cancelling the caller does not interrupt.
+
+    Closing the clients of a cancelled task may deliver its cancellation again,
+    so winding down is shielded for as long as it takes, rather than just once.
+    '''
+    task = asyncio.ensure_future(coroutine)
+    while not task.done():
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            pass # the caller is already winding down
+    return task.result()
+
+
+def _readiness_results(readiness_check: 'Dict[str, Any] | BaseException') -> 'List[ReadinessResult]':
+    '''Records the result of each component of a readiness check.
+
+    Failed readiness checks still report their components (e.g. with HTTP
+    503), which are the ones worth knowing about; only checks that received
+    no (JSON) response have none.
+    '''
+    response_data = readiness_check
+    if isinstance(readiness_check, HttpRequestException):
+        try:
+            response_data = readiness_check.response.json()
+        except ValueError:
+            return []
+    if not isinstance(response_data, dict):
+        return []
+    return [
+        ReadinessResult(component=ReadinessComponent(name=name), passed=passed)
+        for name, passed in readiness_components(response_data).items()
+    ]
+
+
+def _status_code(result: 'Any') -> 'int | None':
+    '''Returns the HTTP status code of the response behind a gathered check result, if one was received.'''
+    if isinstance(result, HttpRequestException):
+        return result.response.status_code
+    if isinstance(result, BaseException):
+        return None
+    # the checks only succeed on this status code
+    return HTTPStatus.OK.value
+
+
+async def _timed(coroutine: 'Awaitable[T]', durations: 'Dict[str, float]', name: 'str') -> 'T':
+    '''Awaits the coroutine, recording the time it took (in milliseconds) as `durations[name]`.
+
+    The time is recorded however the coroutine ends, including when it is
+    cancelled for exceeding the poll budget.
+    '''
+    started_at = time.perf_counter()
+    try:
+        return await coroutine
     finally:
-        engine = sqlalchemy.create_engine(database)
-        with sqlalchemy.orm.Session(engine) as session:
-            session.add(poll_entry)
-            session.commit()
+        durations[name] = (time.perf_counter() - started_at) * 1000
+
+
+def _unwrap_result(result: 'T | BaseException') -> 'T':
+    '''Returns a result gathered with `return_exceptions`, re-raising it if it is an exception.'''
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+@contextmanager
+def _critical_failure_context(failures: 'List[str]') -> 'None':
+    '''Provides a context that records and suppresses unexpected exceptions.
+
+    The formatted traceback of the exception is appended to `failures`.
+    '''
+    try:
+        yield
+    except Exception as exception:
+        failures.append(''.join(traceback.format_exception(exception)).strip())
+        logger.debug('Critical failure: %s', str(exception) or type(exception).__name__)
+
+
+@contextmanager
+def _missing_http2_support_context() -> 'None':
+    '''Provides a context that reports HTTP/2 being requested without the h2 package installed.'''
+    try:
+        yield
+    except ImportError as exception:
+        if exception.name != 'h2' and 'h2' not in str(exception):
+            raise
+        raise click.UsageError('HTTP/2 support requires the h2 package; install it with `pip install h2`.')
 
 
 @contextmanager
@@ -65,13 +759,13 @@ def _possible_http_exception_context(error_template: 'str') -> 'None':
     '''Provides a context that handles and suppreses `HttpRequestException`.
 
     `error_template` will be interpolated with the keyworded argument "body"
-    using the response body.
+    using the response body, and logged at debug level.
     '''
     try:
         yield
     except HttpRequestException as exception:
-        message = error_template.format(body=exception.response.text)
-        click.echo(message, err=True)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(error_template.format(body=exception.response.text))
 
 
 def _validate_access_token(_ctx, _param, value: 'str') -> 'str':
@@ -117,11 +811,30 @@ def _validate_access_token(_ctx, _param, value: 'str') -> 'str':
     is_flag=True,
 )
 @click.option(
-    '-t', '--interval', 'poll_interval',
+    '-i', '--interval', 'poll_interval',
     default=300.0,
     help='Polling interval (seconds); only applies with the --continuous flag.',
     show_default=True,
-    type=float,
+    type=click.FloatRange(min=0, min_open=True),
+)
+@click.option(
+    '--poll-timeout', 'poll_timeout',
+    default=30.0,
+    help='Overall time budget (seconds) for a poll; capped at the polling interval with the --continuous flag.',
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+)
+@_options.transport_options()
+@_options.adaptive_options()
+@_options.metrics_options()
+@_options.lease_options()
+@_options.logging_options()
+@click.option(
+    '--metadata-ttl', 'metadata_ttl',
+    default=3600.0,
+    help='Time (seconds) for which the metadata of an instance is cached between polls with the --continuous flag; 0 to fetch it every poll.',
+    show_default=True,
+    type=click.FloatRange(min=0),
 )
 @click.option(
     '--save-responses', 'save_responses',
@@ -134,109 +847,169 @@ def poll(
     instance: 'str',
     run_continuously: 'bool',
     poll_interval: 'float',
+    poll_timeout: 'float',
+    transport: 'TransportOptions',
+    adaptive_policy: 'AdaptivePolicy | None',
+    metrics_address: 'Tuple[str, int] | None',
+    lease: 'LeaseOptions | None',
+    logging_options: 'LoggingOptions',
+    metadata_ttl: 'float',
     save_responses: 'bool',
 ) -> 'None':
     '''Polls the specified GitLab instance.'''
-    if run_continuously:
-        click.echo(f'Polling continuously with an interval of {poll_interval:.2f}s...', err=True)
+    if metrics_address is not None and not run_continuously:
+        raise click.UsageError('--metrics-port only applies with the --continuous flag.')
+    if adaptive_policy is not None and not run_continuously:
+        raise click.UsageError('--adaptive only applies with the --continuous flag.')
+    if lease is not None and not run_continuously:
+        raise click.UsageError('--partition only applies with the --continuous flag.')
 
-        while True:
-            try:
-                click.echo(err=True)
-                _poll_once(database, access_token, instance, save_responses)
-                time.sleep(poll_interval)
-            except KeyboardInterrupt:
-                click.echo('Interrupt received. Stopping...', err=True)
-                break
-    else:
-        _poll_once(database, access_token, instance, save_responses)
+    with configure_logging(logging_options), _missing_http2_support_context():
+        if run_continuously:
+            logger.info('Polling continuously with an interval of %.2fs...', poll_interval)
+            instances = [FleetInstance(instance, access_token, poll_interval)]
+            _run_until_interrupted(_poll_continuously(
+                database,
+                instances,
+                1,
+                save_responses,
+                adaptive_policy=adaptive_policy,
+                lease=lease,
+                metadata_ttl=metadata_ttl,
+                metrics_address=metrics_address,
+                poll_timeout=poll_timeout,
+                transport=transport,
+            ))
+        else:
+            _poll_once(
+                database,
+                access_token,
+                instance,
+                save_responses,
+                poll_timeout=poll_timeout,
+                transport=transport,
+            )
 
 
 @click.command()
 @click.option(
-    '-o', '--output', 'output',
-    help='Export path.',
+    '-f', '--file', 'fleet_file',
+    help='Path to the TOML file describing the fleet of GitLab instances.',
     required=True,
     type=click.Path(
         dir_okay=False,
+        exists=True,
         path_type=Path,
         readable=True,
-        writable=True,
     ),
 )
+@click.option(
+    '-t', '--token', 'access_token',
+    envvar='GITLAB_ACCESS_TOKEN',
+    help='Default GitLab access token, for instances that do not specify their own.',
+    show_envvar=True,
+)
 @_options.database_option(ensure_exists=True)
 @click.option(
-    '-u', '--url', 'filter_instance',
-    help='GitLab instance URL to filter.',
+    '-i', '--interval', 'poll_interval',
+    default=300.0,
+    help='Default polling interval (seconds), for instances that do not specify their own.',
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
 )
 @click.option(
-    '-f', '--from', 'filter_from',
-    help='Filter from timestamp (inclusive).',
-    type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+    '-j', '--concurrency', 'concurrency',
+    default=16,
+    help='Maximum number of instances polled at once.',
+    show_default=True,
+    type=click.IntRange(min=1),
 )
 @click.option(
-    '-t', '--to', 'filter_to',
-    help='Filter to timestamp (exclusive).',
-    type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+    '-w', '--workers', 'workers',
+    default=1,
+    help='Number of worker processes polling the instances, which share out the concurrency.',
+    show_default=True,
+    type=click.IntRange(min=1),
 )
 @click.option(
-    '--include-responses', 'include_responses',
-    help='Include response information in the export.',
+    '--poll-timeout', 'poll_timeout',
+    default=30.0,
+    help='Overall time budget (seconds) for a poll; capped at the polling interval of each instance.',
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+)
+@_options.transport_options()
+@_options.adaptive_options()
+@_options.metrics_options()
+@_options.lease_options()
+@_options.logging_options()
+@click.option(
+    '--metadata-ttl', 'metadata_ttl',
+    default=3600.0,
+    help='Time (seconds) for which the metadata of an instance is cached between polls; 0 to fetch it every poll.',
+    show_default=True,
+    type=click.FloatRange(min=0),
+)
+@click.option(
+    '--batch-size', 'batch_size',
+    default=500,
+    help='Maximum number of polls committed to the database at once.',
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    '--flush-interval', 'flush_interval',
+    default=1.0,
+    help='Maximum time (seconds) a poll may wait before it is committed to the database.',
+    show_default=True,
+    type=click.FloatRange(min=0),
+)
+@click.option(
+    '--save-responses', 'save_responses',
+    help='Persist response information to database.',
     is_flag=True,
 )
-def export(
-    output: 'Path',
+def fleet(
+    fleet_file: 'Path',
+    access_token: 'str | None',
     database: 'str',
-    include_responses: 'bool',
-    filter_instance: 'str | None',
-    filter_from: 'datetime | None',
-    filter_to: 'datetime | None',
+    poll_interval: 'float',
+    concurrency: 'int',
+    workers: 'int',
+    poll_timeout: 'float',
+    transport: 'TransportOptions',
+    adaptive_policy: 'AdaptivePolicy | None',
+    metrics_address: 'Tuple[str, int] | None',
+    lease: 'LeaseOptions | None',
+    logging_options: 'LoggingOptions',
+    metadata_ttl: 'float',
+    batch_size: 'int',
+    flush_interval: 'float',
+    save_responses: 'bool',
 ) -> 'None':
-    '''Export poll records from the specified GitLab instance.'''
-    if output.exists(): # prevent overwriting files
-        raise click.ClickException(f'File already exists: {output.as_posix()}')
-
-    if any((filter_instance, filter_from, filter_to)):
-        click.echo(f'Applying filters to exported queryset...', err=True)
-        click.echo(f'  instance url:   {filter_instance}', err=True)
-        click.echo(f'  from timestamp: {"<none>" if filter_from is None else filter_from.isoformat()}', err=True)
-        click.echo(f'  to timestamp:   {"<none>" if filter_to is None else filter_to.isoformat()}', err=True)
-    else:
-        click.echo('No filters specified. Entire database will be exported...', err=True)
-
-    engine = sqlalchemy.create_engine(database)
-    stmt = sqlalchemy.select(PollEntry).order_by(PollEntry.created_at)
-
-    # apply filters if they have been provided
-    if filter_instance is not None:
-        stmt = stmt.where(PollEntry.base_url == filter_instance)
-    if filter_from is not None:
-        stmt = stmt.where(PollEntry.created_at >= filter_from)
-    if filter_to is not None:
-        stmt = stmt.where(PollEntry.created_at < filter_to)
-
-    # create a mapping of fields to their transformers
-    return_self = lambda x: x
-    fields = {
-        'base_url': return_self,
-        'instance_version': return_self,
-        'health_check_passed': lambda x: 'yes' if x else 'no',
-        'readiness_check_passed': lambda x: 'yes' if x else 'no',
-        'created_at': lambda x: x.strftime('%Y-%m-%d %H:%M:%S'),
-    }
-    if include_responses:
-        fields.update({
-            'health_check_response': return_self,
-            'readiness_check_response': return_self,
-            'metadata_response': return_self,
-        })
-
-    # execute the query for export
-    click.echo('Beginning export...', err=True)
-    with output.open('w', encoding='utf-8') as fp:
-        writer = csv.writer(fp, quoting=csv.QUOTE_ALL)
-        writer.writerow(fields)
-        with sqlalchemy.orm.Session(engine) as session:
-            for i, entry in enumerate(session.execute(stmt).scalars(), 1):
-                writer.writerow([getattr(entry, field) for field in fields])
-            click.echo(f'Completed export of {i} rows', err=True)
+    '''Continuously polls a fleet of GitLab instances.'''
+    if lease is not None and workers > 1:
+        raise click.UsageError('--partition only applies with a single worker process.')
+    try:
+        instances = load_fleet(fleet_file, default_access_token=access_token, default_interval=poll_interval)
+    except ConfigurationException as exception:
+        raise click.ClickException(str(exception))
+
+    with configure_logging(logging_options), _missing_http2_support_context():
+        logger.info('Polling %d instances continuously with a concurrency of %d...', len(instances), concurrency)
+        _run_until_interrupted(_poll_continuously(
+            database,
+            instances,
+            concurrency,
+            save_responses,
+            adaptive_policy=adaptive_policy,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            lease=lease,
+            logging_options=logging_options,
+            metadata_ttl=metadata_ttl,
+            metrics_address=metrics_address,
+            poll_timeout=poll_timeout,
+            transport=transport,
+            workers=workers,
+        ))
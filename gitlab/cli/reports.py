@@ -0,0 +1,249 @@
+import click
+import dataclasses
+import json
+
+from . import _options
+from .maintenance import record_transition_backlog, update_state_backlog
+from datetime import datetime
+from gitlab.core import (
+    Incident,
+    InstanceReport,
+    InstanceState,
+    build_reports,
+    create_engine,
+    find_incidents,
+    latest_states,
+)
+from typing import Any, List
+
+
+def _format_states(states: 'List[InstanceState]') -> 'str':
+    '''Formats the current state of every instance for the terminal, as a table of a row per instance.'''
+    def timestamp(value: 'datetime | None') -> 'str':
+        return '-' if value is None else f'{value:%Y-%m-%d %H:%M:%S}'
+
+    rows = [('INSTANCE', 'STATE', 'HEALTH', 'READINESS', 'VERSION', 'POLLED', 'LAST SUCCESS', 'LAST FAILURE', 'FAILURES')]
+    for state in states:
+        rows.append((
+            state.base_url,
+            'up' if state.available else 'down',
+            'passed' if state.health_check_passed else 'failed',
+            'passed' if state.readiness_check_passed else 'failed',
+            state.instance_version or '-',
+            timestamp(state.polled_at),
+            timestamp(state.last_success_at),
+            timestamp(state.last_failure_at),
+            str(state.consecutive_failures),
+        ))
+    widths = [max(map(len, column)) for column in zip(*rows)]
+    return '\n'.join('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def _format_report(report: 'InstanceReport') -> 'str':
+    '''Formats the uptime statistics of an instance for the terminal.'''
+    lines = [
+        report.base_url,
+        f'  polled:         {report.poll_count} times, {report.first_polled_at:%Y-%m-%d %H:%M:%S} to {report.last_polled_at:%Y-%m-%d %H:%M:%S}',
+        f'  availability:   {report.availability:.3%} ({report.available_count}/{report.poll_count} polls)',
+        f'  failures:       {report.health_check_failed_count} health, {report.readiness_check_failed_count} readiness',
+        f'  errors:         {report.error_count}',
+        f'  skipped:        {report.skipped_count}',
+    ]
+    if report.pruned:
+        kept_since = '<none>' if report.kept_since is None else f'{report.kept_since:%Y-%m-%d %H:%M:%S}'
+        lines.append(f'  kept since:     {kept_since} (earlier polls are counted, but pruned from what follows)')
+    outage = report.longest_outage
+    if outage is None:
+        lines.append('  longest outage: <none>')
+    else:
+        lines.append(
+            f'  longest outage: {outage.duration} from {outage.started_at:%Y-%m-%d %H:%M:%S} '
+            f'({outage.poll_count} polls{"" if outage.recovered else ", ongoing"})'
+        )
+    lines.append('  readiness:' + ('' if report.readiness_components else '      <none>'))
+    for failures in report.readiness_components:
+        lines.append(
+            f'    {failures.component}: {failures.failed_count}/{failures.check_count} checks failed '
+            f'({failures.failure_rate:.3%})'
+        )
+    lines.append('  versions:' + ('' if report.versions else '       <none>'))
+    for span in report.versions:
+        lines.append(
+            f'    {span.version}: {span.first_seen:%Y-%m-%d %H:%M:%S} to {span.last_seen:%Y-%m-%d %H:%M:%S} '
+            f'({span.poll_count} polls)'
+        )
+    return '\n'.join(lines)
+
+
+def _encode(value: 'Any') -> 'Any':
+    '''Encodes the values JSON has no type for.'''
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _format_incidents(base_url: 'str', incidents: 'List[Incident]') -> 'str':
+    '''Formats the incident timeline of an instance for the terminal.'''
+    lines = [base_url]
+    for incident in incidents:
+        if incident.kind == 'outage':
+            duration = 'ongoing' if incident.ongoing else str(incident.ended_at - incident.started_at)
+            lines.append(f'  {incident.started_at:%Y-%m-%d %H:%M:%S}  outage          {duration:>14}  {incident.detail}')
+        else:
+            lines.append(f'  {incident.started_at:%Y-%m-%d %H:%M:%S}  version change  {"":>14}  {incident.detail}')
+    return '\n'.join(lines)
+
+
+@click.command()
+@_options.database_option(ensure_exists=True)
+@click.option(
+    '-u', '--url', 'filter_instance',
+    help='GitLab instance URL to filter.',
+)
+@click.option(
+    '-f', '--from', 'filter_from',
+    help='Filter from timestamp (inclusive).',
+    type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+)
+@click.option(
+    '-t', '--to', 'filter_to',
+    help='Filter to timestamp (exclusive).',
+    type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+)
+@click.option(
+    '--format', 'output_format',
+    default='table',
+    help='Output format.',
+    show_default=True,
+    type=click.Choice(('json', 'table')),
+)
+def report(
+    database: 'str',
+    filter_instance: 'str | None',
+    filter_from: 'datetime | None',
+    filter_to: 'datetime | None',
+    output_format: 'str',
+) -> 'None':
+    '''Report the availability, outages, versions and errors of the polled GitLab instances.'''
+    engine = create_engine(database)
+    with engine.connect() as connection:
+        reports = build_reports(connection, base_url=filter_instance, since=filter_from, until=filter_to)
+    if not reports:
+        click.echo('No polls match the filters.', err=True)
+        return
+    pruned = [instance_report.base_url for instance_report in reports if instance_report.pruned]
+    if pruned:
+        click.echo(
+            f'Polls of {", ".join(pruned)} within the period have been pruned; they are counted from the rollups, '
+            'but their outages, readiness components and versions are missing: see `incidents` for their outages '
+            'and version changes.',
+            err=True,
+        )
+
+    if output_format == 'json':
+        documents = []
+        for instance_report in reports:
+            document = dataclasses.asdict(instance_report)
+            document['availability'] = instance_report.availability
+            document['pruned'] = instance_report.pruned
+            for component, failures in zip(document['readiness_components'], instance_report.readiness_components):
+                component['failure_rate'] = failures.failure_rate
+            if instance_report.longest_outage is not None:
+                document['longest_outage']['duration'] = instance_report.longest_outage.duration.total_seconds()
+            documents.append(document)
+        click.echo(json.dumps(documents, default=_encode, indent=2))
+    else:
+        click.echo('\n\n'.join(map(_format_report, reports)))
+
+
+@click.command()
+@_options.database_option(ensure_exists=True)
+@click.option(
+    '-u', '--url', 'filter_instance',
+    help='GitLab instance URL to filter.',
+)
+@click.option(
+    '-f', '--from', 'filter_from',
+    help='Filter from timestamp (inclusive).',
+    type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+)
+@click.option(
+    '-t', '--to', 'filter_to',
+    help='Filter to timestamp (exclusive).',
+    type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']),
+)
+@click.option(
+    '--format', 'output_format',
+    default='table',
+    help='Output format.',
+    show_default=True,
+    type=click.Choice(('json', 'table')),
+)
+def incidents(
+    database: 'str',
+    filter_instance: 'str | None',
+    filter_from: 'datetime | None',
+    filter_to: 'datetime | None',
+    output_format: 'str',
+) -> 'None':
+    '''List the outages and version changes of the polled GitLab instances.
+
+    Incidents are read from the state transitions recorded as polls are
+    written; polls recorded before transitions were (e.g. before upgrading)
+    are first caught up on.
+    '''
+    engine = create_engine(database)
+    record_transition_backlog(engine, 100000)
+    with engine.connect() as connection:
+        found = find_incidents(connection, base_url=filter_instance, since=filter_from, until=filter_to)
+    if not found:
+        click.echo('No incidents match the filters.', err=True)
+        return
+
+    if output_format == 'json':
+        documents = [
+            {**dataclasses.asdict(incident), 'ongoing': incident.ongoing}
+            for incident in found
+        ]
+        click.echo(json.dumps(documents, default=_encode, indent=2))
+    else:
+        by_instance = {}
+        for incident in found:
+            by_instance.setdefault(incident.base_url, []).append(incident)
+        click.echo('\n\n'.join(_format_incidents(*item) for item in by_instance.items()))
+
+
+@click.command()
+@_options.database_option(ensure_exists=True)
+@click.option(
+    '-u', '--url', 'filter_instance',
+    help='GitLab instance URL to filter.',
+)
+@click.option(
+    '--format', 'output_format',
+    default='table',
+    help='Output format.',
+    show_default=True,
+    type=click.Choice(('json', 'table')),
+)
+def status(database: 'str', filter_instance: 'str | None', output_format: 'str') -> 'None':
+    '''Show the current state of each polled GitLab instance, as of its latest poll.
+
+    States are read from the latest state of each instance, kept up to date as
+    polls are written; polls recorded before the states were (e.g. before
+    upgrading) are first caught up on.
+    '''
+    engine = create_engine(database)
+    update_state_backlog(engine, 100000)
+    with engine.connect() as connection:
+        states = latest_states(connection, base_url=filter_instance)
+    if not states:
+        click.echo('No polls match the filters.', err=True)
+        return
+
+    if output_format == 'json':
+        documents = [
+            {**dataclasses.asdict(state), 'available': state.available}
+            for state in states
+        ]
+        click.echo(json.dumps(documents, default=_encode, indent=2))
+    else:
+        click.echo(_format_states(states))
@@ -1,11 +1,182 @@
-from .clients import GitLabClient
-from .exceptions import HttpRequestException
-from .models import Base, PollEntry
+import importlib
 
+from typing import List, TYPE_CHECKING
 
-__all__ = (
-    'Base',
-    'GitLabClient',
-    'HttpRequestException',
-    'PollEntry',
-)
+if TYPE_CHECKING:
+    from .breakers import AdaptivePolicy, CircuitBreaker
+    from .clients import AsyncGitLabClient, GitLabClient, MetadataCache, TransportOptions, readiness_components
+    from .columnar import COLUMNAR_FORMATS, ColumnarWriter, arrow_columns, arrow_schema
+    from .exceptions import ConfigurationException, HttpRequestException
+    from .exports import (
+        COMPRESSIONS,
+        csv_columns,
+        filter_poll_entries,
+        flush_export,
+        infer_compression,
+        open_export,
+        read_checkpoint,
+        resolve_response_bodies,
+        select_poll_entries,
+        stream_rows,
+        write_checkpoint,
+    )
+    from .fleet import FleetInstance, assign_shards, load_fleet, reassign_instances
+    from .imports import (
+        IMPORT_FORMATS,
+        import_database,
+        import_poll_records,
+        infer_import_format,
+        open_import,
+        read_export,
+    )
+    from .leases import LeaseOptions, default_node_id, release_leases, renew_leases
+    from .metrics import PollMetrics, serve_metrics
+    from .models import (
+        CHECKS,
+        Base,
+        InstanceLease,
+        LatestState,
+        PollEntry,
+        PollRollup,
+        PollerNode,
+        ReadinessComponent,
+        ReadinessResult,
+        ResponseBody,
+        StateTransition,
+        Watermark,
+    )
+    from .persistence import BatchProcessor, PollWriter, WriterStatistics, create_engine
+    from .reports import (
+        ComponentFailures,
+        InstanceReport,
+        LatencyPercentiles,
+        Outage,
+        VersionSpan,
+        build_reports,
+        latency_percentiles,
+        readiness_component_failures,
+    )
+    from .retention import (
+        RetentionRule,
+        archive_path,
+        enable_incremental_vacuum,
+        prune_poll_entries,
+        reclaim_space,
+        remove_orphaned_response_bodies,
+    )
+    from .rollups import fold_rollups, fold_rollups_on_write, rollup_backlog
+    from .scheduling import FixedRateScheduler, JobStatistics
+    from .schema import HEAD, has_schema, initialise_schema
+    from .states import InstanceState, latest_states, state_backlog, update_latest_states, update_latest_states_on_write
+    from .transitions import Incident, find_incidents, record_transitions, record_transitions_on_write, transition_backlog
+
+
+# submodule exporting each name; submodules are only imported once one of their names is first used,
+# so that e.g. commands working on the database alone do not pay for importing the HTTP clients
+_EXPORTS = {
+    'AdaptivePolicy': 'breakers',
+    'AsyncGitLabClient': 'clients',
+    'Base': 'models',
+    'BatchProcessor': 'persistence',
+    'CHECKS': 'models',
+    'COLUMNAR_FORMATS': 'columnar',
+    'COMPRESSIONS': 'exports',
+    'CircuitBreaker': 'breakers',
+    'ColumnarWriter': 'columnar',
+    'ComponentFailures': 'reports',
+    'ConfigurationException': 'exceptions',
+    'FixedRateScheduler': 'scheduling',
+    'FleetInstance': 'fleet',
+    'GitLabClient': 'clients',
+    'HEAD': 'schema',
+    'HttpRequestException': 'exceptions',
+    'IMPORT_FORMATS': 'imports',
+    'Incident': 'transitions',
+    'InstanceLease': 'models',
+    'InstanceReport': 'reports',
+    'InstanceState': 'states',
+    'JobStatistics': 'scheduling',
+    'LatencyPercentiles': 'reports',
+    'LatestState': 'models',
+    'LeaseOptions': 'leases',
+    'MetadataCache': 'clients',
+    'Outage': 'reports',
+    'PollEntry': 'models',
+    'PollMetrics': 'metrics',
+    'PollRollup': 'models',
+    'PollWriter': 'persistence',
+    'PollerNode': 'models',
+    'ReadinessComponent': 'models',
+    'ReadinessResult': 'models',
+    'ResponseBody': 'models',
+    'RetentionRule': 'retention',
+    'StateTransition': 'models',
+    'TransportOptions': 'clients',
+    'VersionSpan': 'reports',
+    'Watermark': 'models',
+    'WriterStatistics': 'persistence',
+    'archive_path': 'retention',
+    'arrow_columns': 'columnar',
+    'arrow_schema': 'columnar',
+    'assign_shards': 'fleet',
+    'build_reports': 'reports',
+    'create_engine': 'persistence',
+    'csv_columns': 'exports',
+    'default_node_id': 'leases',
+    'enable_incremental_vacuum': 'retention',
+    'filter_poll_entries': 'exports',
+    'find_incidents': 'transitions',
+    'flush_export': 'exports',
+    'fold_rollups': 'rollups',
+    'fold_rollups_on_write': 'rollups',
+    'has_schema': 'schema',
+    'import_database': 'imports',
+    'import_poll_records': 'imports',
+    'infer_compression': 'exports',
+    'infer_import_format': 'imports',
+    'initialise_schema': 'schema',
+    'latency_percentiles': 'reports',
+    'latest_states': 'states',
+    'load_fleet': 'fleet',
+    'open_export': 'exports',
+    'open_import': 'imports',
+    'prune_poll_entries': 'retention',
+    'read_checkpoint': 'exports',
+    'read_export': 'imports',
+    'readiness_component_failures': 'reports',
+    'readiness_components': 'clients',
+    'reassign_instances': 'fleet',
+    'reclaim_space': 'retention',
+    'record_transitions': 'transitions',
+    'record_transitions_on_write': 'transitions',
+    'release_leases': 'leases',
+    'remove_orphaned_response_bodies': 'retention',
+    'renew_leases': 'leases',
+    'resolve_response_bodies': 'exports',
+    'rollup_backlog': 'rollups',
+    'select_poll_entries': 'exports',
+    'serve_metrics': 'metrics',
+    'state_backlog': 'states',
+    'stream_rows': 'exports',
+    'transition_backlog': 'transitions',
+    'update_latest_states': 'states',
+    'update_latest_states_on_write': 'states',
+    'write_checkpoint': 'exports',
+}
+
+
+__all__ = tuple(_EXPORTS)
+
+
+def __getattr__(name: 'str') -> 'object':
+    '''Imports the exported `name` from its submodule on first use.'''
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+    value = globals()[name] = getattr(importlib.import_module(f'.{module}', __name__), name)
+    return value
+
+
+def __dir__() -> 'List[str]':
+    return sorted((*globals(), *__all__))
@@ -0,0 +1,95 @@
+import random
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class AdaptivePolicy:
+    '''How the polling of an instance adapts to its state.
+
+    An instance is polled `fast_factor` times its interval while degraded
+    (its latest poll found it unavailable) or recovering (within
+    `recovery_polls` polls of its circuit closing again). Its circuit opens
+    after `failure_threshold` consecutive failed health checks, after which
+    it is only probed every 2, 4, 8... intervals (at most `max_backoff`),
+    give or take a `jitter` fraction.
+    '''
+    failure_threshold: 'int' = 3
+    fast_factor: 'float' = 0.25
+    jitter: 'float' = 0.2
+    max_backoff: 'float' = 16.0
+    recovery_polls: 'int' = 3
+
+
+class CircuitBreaker:
+    '''Tracks the state of an instance from one poll to the next, to decide when and whether to poll it.
+
+    The circuit is closed while the instance answers its health checks; every
+    tick is then polled. Once open, ticks are skipped (rather than waiting on
+    connection timeouts) until a probe is due; a probe that passes its health
+    check closes the circuit, and one that fails backs off further.
+    '''
+    _backoff: 'int'
+    _probe_at: 'float'
+    _random: 'random.Random'
+    consecutive_failures: 'int'
+    degraded: 'bool'
+    interval: 'float'
+    is_open: 'bool'
+    policy: 'AdaptivePolicy'
+    recovering: 'int'
+
+    def __init__(
+        self,
+        interval: 'float',
+        policy: 'AdaptivePolicy | None' = None,
+        *,
+        rng: 'random.Random | None' = None,
+    ) -> 'None':
+        self._backoff = 0
+        self._probe_at = 0.0
+        self._random = rng or random.Random()
+        self.consecutive_failures = 0
+        self.degraded = False
+        self.interval = interval
+        self.is_open = False
+        self.policy = policy or AdaptivePolicy()
+        self.recovering = 0
+
+    @property
+    def next_interval(self) -> 'float':
+        '''Returns the time until the instance should next be polled (or skipped).'''
+        if not self.is_open and (self.degraded or self.recovering):
+            return self.interval * self.policy.fast_factor
+        return self.interval
+
+    def allow(self, now: 'float') -> 'bool':
+        '''Returns whether the instance should be polled at `now`, rather than skipped.'''
+        return not self.is_open or now >= self._probe_at
+
+    def record(self, now: 'float', *, healthy: 'bool', available: 'bool') -> 'None':
+        '''Records the outcome of a poll made at `now`.'''
+        if healthy:
+            if self.is_open:
+                self.is_open = False
+                self.recovering = self.policy.recovery_polls
+            self._backoff = 0
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+            if self.is_open:
+                self._backoff += 1
+                self._schedule_probe(now)
+            elif self.consecutive_failures >= self.policy.failure_threshold:
+                self.is_open = True
+                self._schedule_probe(now)
+
+        self.degraded = not available
+        if available and self.recovering:
+            self.recovering -= 1
+
+    def _schedule_probe(self, now: 'float') -> 'None':
+        '''Backs off exponentially, with jitter, before the next probe of the open circuit.'''
+        intervals = min(2.0 ** (self._backoff + 1), self.policy.max_backoff)
+        jitter = self._random.uniform(-self.policy.jitter, self.policy.jitter)
+        self._probe_at = now + self.interval * intervals * (1 + jitter)
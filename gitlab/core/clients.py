@@ -1,6 +1,10 @@
+import functools
 import httpx
+import ssl
+import time
 
 from .exceptions import HttpRequestException
+from dataclasses import dataclass
 from http import HTTPStatus
 from json import JSONDecodeError
 from typing import Any, Dict, Iterable, TYPE_CHECKING
@@ -11,14 +15,100 @@ if TYPE_CHECKING:
     from httpx import Response
 
 
-class GitLabClient:
-    '''GitLab API wrapper with persistent httpx client instance.'''
-    _client: 'httpx.Client'
+HEALTH_CHECK_PATH = '/-/health'
+METADATA_PATH = '/api/v4/metadata'
+READINESS_CHECK_PATH = '/-/readiness'
+
+
+@dataclass(frozen=True)
+class TransportOptions:
+    '''Connection pooling and timeout settings for the HTTP transport of a client.
+
+    Idle connections are kept alive for `keepalive_expiry` seconds, so that a
+    long-lived client polling more often than that reuses its connections
+    instead of paying for a new TCP and TLS handshake every time.
+    '''
+    connect_timeout: 'float' = 5.0
+    http2: 'bool' = False
+    keepalive_expiry: 'float' = 330.0
+    max_connections: 'int' = 10
+    max_keepalive_connections: 'int' = 10
+    read_timeout: 'float' = 10.0
+
+    @property
+    def limits(self) -> 'httpx.Limits':
+        '''Returns the connection pool limits.'''
+        return httpx.Limits(
+            keepalive_expiry=self.keepalive_expiry,
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+        )
+
+    @property
+    def timeout(self) -> 'httpx.Timeout':
+        '''Returns the per-request timeouts.'''
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            pool=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.read_timeout,
+        )
+
+
+@dataclass
+class MetadataCache:
+    '''Metadata of an instance, considered fresh for `ttl` seconds after it was last fetched.
+
+    The version of an instance only changes on upgrades, during which its
+    health changes too; so the cache is invalidated whenever the health of the
+    instance changes, as well as when it expires. Stale metadata is kept, with
+    its ETag, so that it may be revalidated by a conditional request.
+    '''
+    ttl: 'float'
+    etag: 'str | None' = None
+    fetched_at: 'float | None' = None
+    healthy: 'bool | None' = None
+    metadata: 'MetadataDict | None' = None
+
+    @property
+    def fresh(self) -> 'bool':
+        '''Returns whether the cached metadata may be used without asking the instance.'''
+        return self.fetched_at is not None and time.monotonic() - self.fetched_at < self.ttl
+
+    def invalidate(self) -> 'None':
+        '''Marks the cached metadata as stale.'''
+        self.fetched_at = None
+
+    def observe_health(self, healthy: 'bool') -> 'bool':
+        '''Records the outcome of a health check, invalidating the cache if the health changed.
+
+        Returns whether the cache was invalidated.
+        '''
+        changed = self.healthy is not None and healthy != self.healthy
+        self.healthy = healthy
+        if changed:
+            self.invalidate()
+        return changed
+
+    def store(self, metadata: 'MetadataDict', etag: 'str | None') -> 'None':
+        '''Caches freshly fetched (or revalidated) metadata.'''
+        self.etag = etag
+        self.fetched_at = time.monotonic()
+        self.metadata = metadata
+
+
+class _BaseGitLabClient:
+    '''Response handling shared between the synchronous and asynchronous clients.
+
+    If the client has a `metadata_cache`, metadata requests are conditional on
+    the cached ETag, and the cached metadata is returned on HTTP 304.
+    '''
     base_url: 'URL'
+    metadata_cache: 'MetadataCache | None'
 
-    def __init__(self, access_token: 'str', base_url: 'URL') -> 'None':
-        self._client = httpx.Client(headers={ 'PRIVATE-TOKEN': access_token })
+    def __init__(self, base_url: 'URL', metadata_ttl: 'float | None' = None) -> 'None':
         self.base_url = base_url.rstrip('/')
+        self.metadata_cache = None if not metadata_ttl else MetadataCache(metadata_ttl)
 
     @property
     def domain(self) -> 'Domain':
@@ -27,26 +117,35 @@ class GitLabClient:
         # strip the credentials if present
         return netloc.split('@')[-1] if '@' in netloc else netloc
 
-    def fetch_metadata(self) -> 'MetadataDict':
-        '''Fetches the GitLab instance metadata.'''
-        response = self._client.get(f'{self.base_url}/api/v4/metadata')
+    def _handle_health_check(self, response: 'Response') -> 'str':
+        '''Validates a health check response.'''
+        self._ensure_http_status(response, (HTTPStatus.OK,))
+        return response.text
 
+    def _handle_metadata(self, response: 'Response') -> 'MetadataDict':
+        '''Validates and decodes a metadata response, caching it if the client has a cache.'''
+        cache = self.metadata_cache
+        if cache is not None and cache.metadata is not None and response.status_code == HTTPStatus.NOT_MODIFIED:
+            cache.store(cache.metadata, response.headers.get('ETag', cache.etag))
+            return cache.metadata
         self._ensure_http_status(response, (HTTPStatus.OK,))
         try:
-            return response.json()
+            metadata = response.json()
         except JSONDecodeError:
             raise HttpRequestException(response, 'Failed to decode response.')
+        if cache is not None:
+            cache.store(metadata, response.headers.get('ETag'))
+        return metadata
 
-    def health_check(self) -> 'str':
-        '''Checks the health of the GitLab instance.'''
-        response = self._client.get(f'{self.base_url}/-/health')
-        self._ensure_http_status(response, (HTTPStatus.OK,))
-        return response.text
-
-    def readiness_check(self) -> 'Dict[str, Any]':
-        '''Checks the readiness of the GitLab instance.'''
-        response = self._client.get(f'{self.base_url}/-/readiness')
+    def _metadata_headers(self) -> 'Dict[str, str]':
+        '''Returns the headers of a metadata request; conditional if cached metadata may be revalidated.'''
+        cache = self.metadata_cache
+        if cache is None or cache.etag is None or cache.metadata is None:
+            return {}
+        return {'If-None-Match': cache.etag}
 
+    def _handle_readiness_check(self, response: 'Response') -> 'Dict[str, Any]':
+        '''Validates and decodes a readiness check response.'''
         self._ensure_http_status(response, (HTTPStatus.OK,))
         try:
             response_data = response.json()
@@ -68,3 +167,125 @@ class GitLabClient:
             message = (f'Expected one of HTTP {tuple(sorted(allowed_codes))}, '
                        f'got HTTP {response.status_code}')
             raise HttpRequestException(response, message)
+
+
+class GitLabClient(_BaseGitLabClient):
+    '''GitLab API wrapper with persistent httpx client instance.'''
+    _client: 'httpx.Client'
+
+    def __init__(
+        self,
+        access_token: 'str',
+        base_url: 'URL',
+        *,
+        metadata_ttl: 'float | None' = None,
+        transport: 'TransportOptions | None' = None,
+    ) -> 'None':
+        super().__init__(base_url, metadata_ttl)
+        transport = transport or TransportOptions()
+        self._client = httpx.Client(
+            headers={ 'PRIVATE-TOKEN': access_token },
+            http2=transport.http2,
+            limits=transport.limits,
+            timeout=transport.timeout,
+            verify=_default_ssl_context(),
+        )
+
+    def fetch_metadata(self) -> 'MetadataDict':
+        '''Fetches the GitLab instance metadata.'''
+        response = self._client.get(f'{self.base_url}{METADATA_PATH}', headers=self._metadata_headers())
+        return self._handle_metadata(response)
+
+    def health_check(self) -> 'str':
+        '''Checks the health of the GitLab instance.'''
+        response = self._client.get(f'{self.base_url}{HEALTH_CHECK_PATH}')
+        return self._handle_health_check(response)
+
+    def readiness_check(self) -> 'Dict[str, Any]':
+        '''Checks the readiness of the GitLab instance.'''
+        response = self._client.get(f'{self.base_url}{READINESS_CHECK_PATH}')
+        return self._handle_readiness_check(response)
+
+
+class AsyncGitLabClient(_BaseGitLabClient):
+    '''Asynchronous GitLab API wrapper with persistent httpx client instance.
+
+    Behaves identically to `GitLabClient`, but each call is a coroutine so that
+    the checks against an instance may be awaited concurrently.
+    '''
+    _client: 'httpx.AsyncClient'
+
+    def __init__(
+        self,
+        access_token: 'str',
+        base_url: 'URL',
+        *,
+        metadata_ttl: 'float | None' = None,
+        transport: 'TransportOptions | None' = None,
+    ) -> 'None':
+        super().__init__(base_url, metadata_ttl)
+        transport = transport or TransportOptions()
+        self._client = httpx.AsyncClient(
+            headers={ 'PRIVATE-TOKEN': access_token },
+            http2=transport.http2,
+            limits=transport.limits,
+            timeout=transport.timeout,
+            verify=_default_ssl_context(),
+        )
+
+    async def __aenter__(self) -> 'AsyncGitLabClient':
+        return self
+
+    async def __aexit__(self, *_exc_info) -> 'None':
+        await self.aclose()
+
+    async def aclose(self) -> 'None':
+        '''Closes the underlying httpx client and its connections.'''
+        await self._client.aclose()
+
+    async def fetch_metadata(self) -> 'MetadataDict':
+        '''Fetches the GitLab instance metadata.'''
+        response = await self._client.get(f'{self.base_url}{METADATA_PATH}', headers=self._metadata_headers())
+        return self._handle_metadata(response)
+
+    async def health_check(self) -> 'str':
+        '''Checks the health of the GitLab instance.'''
+        response = await self._client.get(f'{self.base_url}{HEALTH_CHECK_PATH}')
+        return self._handle_health_check(response)
+
+    async def readiness_check(self) -> 'Dict[str, Any]':
+        '''Checks the readiness of the GitLab instance.'''
+        response = await self._client.get(f'{self.base_url}{READINESS_CHECK_PATH}')
+        return self._handle_readiness_check(response)
+
+
+@functools.lru_cache(maxsize=None)
+def _default_ssl_context() -> 'ssl.SSLContext':
+    '''Returns the SSL context shared by every client.
+
+    Loading the certificate authorities takes tens of milliseconds, which
+    would otherwise be paid, on the event loop, by every client of a fleet.
+    '''
+    return httpx.create_ssl_context()
+
+
+def readiness_components(response_data: 'Dict[str, Any]') -> 'Dict[str, bool]':
+    '''Returns whether each component of a readiness check response passed, by name.
+
+    GitLab reports a list of results for each check (e.g. `db_check`), one per
+    shard or node, told apart by their labels; each is named after its check
+    and labels (e.g. `gitaly_check[shard=default]`). Components reported more
+    than once under the same name pass only if every result passed.
+    '''
+    components = {}
+    for check, results in response_data.items():
+        if not isinstance(results, list):
+            continue
+        for result in results:
+            if not isinstance(result, dict) or 'status' not in result:
+                continue
+            labels = result.get('labels') or {}
+            name = check + (f'[{",".join(f"{key}={value}" for key, value in sorted(labels.items()))}]' if labels else '')
+            passed = str(result['status']).lower() == 'ok'
+            components[name] = components.get(name, True) and passed
+    return components
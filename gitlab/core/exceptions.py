@@ -16,3 +16,7 @@ class HttpRequestException(Exception):
     def __init__(self, response: 'Response', *args, **kwargs) -> 'None':
         self.response = response
         super().__init__(*args, **kwargs)
+
+
+class ConfigurationException(Exception):
+    '''Thrown when a user-supplied configuration (e.g. a fleet file) is invalid.'''
@@ -0,0 +1,212 @@
+import gzip
+import io
+import json
+import os
+import sqlalchemy
+
+from .models import CHECKS, PollEntry, ReadinessComponent, ReadinessResult, ResponseBody
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, TextIO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection, Row
+    from sqlalchemy.sql import ColumnElement, Select
+
+
+BUFFER_SIZE = 1 << 20
+COMPRESSIONS = ('gzip', 'none', 'zstd')
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def csv_columns(
+    *,
+    include_latencies: 'bool' = False,
+    include_readiness_components: 'bool' = False,
+    include_responses: 'bool' = False,
+) -> 'Dict[str, ColumnElement]':
+    '''Returns the exported CSV columns, keyed by their header.
+
+    The values are formatted by the database, so that the rows it returns can
+    be written out as-is; the exception being response bodies, which are
+    selected by id and must be passed through `resolve_response_bodies`.
+    '''
+    def yes_no(column: 'ColumnElement') -> 'ColumnElement':
+        return sqlalchemy.case((column, 'yes'), else_='no')
+
+    columns = {
+        'base_url': PollEntry.base_url,
+        'instance_version': PollEntry.instance_version,
+        'health_check_passed': yes_no(PollEntry.health_check_passed),
+        'readiness_check_passed': yes_no(PollEntry.readiness_check_passed),
+        'created_at': sqlalchemy.func.strftime(TIMESTAMP_FORMAT, PollEntry.created_at),
+    }
+    if include_latencies:
+        for check in CHECKS:
+            columns[f'{check}_duration_ms'] = sqlalchemy.func.round(getattr(PollEntry, f'{check}_duration_ms'), 3)
+            columns[f'{check}_status_code'] = getattr(PollEntry, f'{check}_status_code')
+    if include_readiness_components:
+        # names of the failed components, looked up by the primary key of the results of the poll
+        columns['failed_readiness_components'] = (
+            sqlalchemy.select(sqlalchemy.func.coalesce(sqlalchemy.func.group_concat(ReadinessComponent.name, ' '), ''))
+            .select_from(ReadinessResult)
+            .join(ReadinessComponent, ReadinessComponent.id == ReadinessResult.component_id)
+            .where(ReadinessResult.poll_entry_id == PollEntry.id, sqlalchemy.not_(ReadinessResult.passed))
+            .scalar_subquery()
+        )
+    if include_responses:
+        columns.update({
+            'health_check_response': PollEntry.health_check_response_id,
+            'readiness_check_response': PollEntry.readiness_check_response_id,
+            'metadata_response': PollEntry.metadata_response_id,
+        })
+    return columns
+
+
+def read_checkpoint(path: 'Path') -> 'int':
+    '''Returns the id of the last poll exported according to a checkpoint file, or 0 if there is none yet.'''
+    try:
+        document = json.loads(path.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return 0
+    return int(document['last_id'])
+
+
+def write_checkpoint(path: 'Path', last_id: 'int') -> 'None':
+    '''Records the id of the last poll exported in a checkpoint file.
+
+    The file is replaced atomically, so that it is never left half-written.
+    '''
+    staging = path.with_name(f'{path.name}.tmp')
+    staging.write_text(json.dumps({'last_id': last_id}) + '\n', encoding='utf-8')
+    os.replace(staging, path)
+
+
+def flush_export(fp: 'TextIO') -> 'None':
+    '''Flushes an export through to its file, including whatever its compressor is holding back.
+
+    Flushing the text stream alone stops short of the compressor, which would
+    otherwise keep the latest rows until it is closed.
+    '''
+    fp.flush()
+    raw = getattr(getattr(fp, 'buffer', None), 'raw', None)
+    if raw is not None:
+        raw.flush()
+
+
+def infer_compression(path: 'Path') -> 'str':
+    '''Infers the compression of an export from its file extension.'''
+    return {'.gz': 'gzip', '.zst': 'zstd'}.get(path.suffix.lower(), 'none')
+
+
+def open_export(path: 'Path', compression: 'str' = 'none', *, append: 'bool' = False) -> 'TextIO':
+    '''Opens an export file for buffered text writing, compressing it if requested.
+
+    Raises `FileExistsError` rather than overwriting an existing file, unless
+    appending to it; compressed exports are appended to as further gzip members
+    or zstd frames, which decompress as one.
+    '''
+    mode = 'a' if append else 'x'
+    if compression == 'none':
+        return path.open(mode, buffering=BUFFER_SIZE, encoding='utf-8', newline='')
+    if compression == 'gzip':
+        fp = gzip.GzipFile(fileobj=path.open(f'{mode}b'), mode='wb', compresslevel=6)
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError('zstd compression requires the zstandard package.')
+        fp = zstandard.ZstdCompressor().stream_writer(path.open(f'{mode}b'), closefd=True)
+    else:
+        raise ValueError(f'Unknown compression: {compression}')
+    # compressors are most efficient when fed large chunks at a time
+    return io.TextIOWrapper(io.BufferedWriter(fp, BUFFER_SIZE), encoding='utf-8', newline='')
+
+
+def resolve_response_bodies(
+    connection: 'Connection',
+    batches: 'Iterable[Sequence[Row]]',
+    positions: 'Sequence[int]',
+    *,
+    cache_size: 'int' = 1024,
+) -> 'Iterator[List[List[Any]]]':
+    '''Replaces the response body ids at `positions` of each row with the text of the body.
+
+    Bodies are shared between many polls, so the most recently used ones are
+    cached, and the rest are fetched once per batch.
+    '''
+    cache = OrderedDict()
+    for rows in batches:
+        missing = list({row[i] for row in rows for i in positions if row[i] is not None and row[i] not in cache})
+        # fetch in chunks, staying well within the limit on bound parameters
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            stmt = sqlalchemy.select(ResponseBody.id, ResponseBody.content).where(ResponseBody.id.in_(chunk))
+            for body_id, content in connection.execute(stmt):
+                cache[body_id] = ResponseBody.decompress(content)
+
+        resolved = []
+        for row in rows:
+            row = list(row)
+            for i in positions:
+                body_id = row[i]
+                if body_id is None:
+                    row[i] = ''
+                else:
+                    cache.move_to_end(body_id)
+                    row[i] = cache[body_id]
+            resolved.append(row)
+        while len(cache) > cache_size:
+            cache.popitem(last=False)
+        yield resolved
+
+
+def filter_poll_entries(
+    stmt: 'Select',
+    *,
+    base_url: 'str | None' = None,
+    since: 'datetime | None' = None,
+    until: 'datetime | None' = None,
+) -> 'Select':
+    '''Restricts a statement over the poll entries to those of an instance and/or period.'''
+    if base_url is not None:
+        stmt = stmt.where(PollEntry.base_url == base_url)
+    if since is not None:
+        stmt = stmt.where(PollEntry.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(PollEntry.created_at < until)
+    return stmt
+
+
+def select_poll_entries(
+    columns: 'Sequence[ColumnElement]',
+    *,
+    after_id: 'int | None' = None,
+    base_url: 'str | None' = None,
+    since: 'datetime | None' = None,
+    until: 'datetime | None' = None,
+) -> 'Select':
+    '''Selects only the given columns of the poll entries matching the filters, oldest first.
+
+    Given an `after_id`, only entries recorded after that one are selected, in
+    the order they were recorded; as ids are only ever allocated upwards, and
+    never reused once pruned, this picks up incrementally from where an
+    earlier export left off.
+    '''
+    stmt = sqlalchemy.select(*columns)
+    if after_id is None:
+        stmt = stmt.order_by(PollEntry.created_at)
+    else:
+        stmt = stmt.where(PollEntry.id > after_id).order_by(PollEntry.id)
+    return filter_poll_entries(stmt, base_url=base_url, since=since, until=until)
+
+
+def stream_rows(connection: 'Connection', stmt: 'Select', batch_size: 'int' = 10000) -> 'Iterator[Sequence[Row]]':
+    '''Executes the statement, yielding its rows in batches of at most `batch_size`.
+
+    Rows are fetched from the cursor one batch at a time, so that memory use is
+    independent of the size of the result.
+    '''
+    result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+    yield from result.partitions()
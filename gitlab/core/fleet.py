@@ -0,0 +1,106 @@
+import os
+import tomllib
+
+from .exceptions import ConfigurationException
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .types import URL
+
+
+@dataclass(frozen=True)
+class FleetInstance:
+    '''A GitLab instance to be polled as part of a fleet.'''
+    base_url: 'URL'
+    access_token: 'str'
+    interval: 'float'
+
+    @property
+    def load(self) -> 'float':
+        '''Returns the rate (polls per second) at which the instance is polled.'''
+        return 1 / self.interval
+
+
+def assign_shards(instances: 'List[FleetInstance]', count: 'int') -> 'List[List[FleetInstance]]':
+    '''Splits the instances into `count` shards of about equal load.'''
+    if count < 1:
+        raise ValueError('Shard count must be at least 1.')
+    shards = [[] for _ in range(count)]
+    for shard, assigned in reassign_instances(instances, {i: 0.0 for i in range(count)}).items():
+        shards[shard] = assigned
+    return shards
+
+
+def reassign_instances(instances: 'List[FleetInstance]', loads: 'Dict[int, float]') -> 'Dict[int, List[FleetInstance]]':
+    '''Assigns the instances across shards with the current `loads`, e.g. those of a shard that was lost.
+
+    The busiest instances are assigned first, each to the least loaded shard at
+    the time; returns the instances assigned to each shard, by shard.
+    '''
+    if not loads:
+        raise ValueError('There are no shards to assign instances to.')
+    loads, assigned = dict(loads), {shard: [] for shard in loads}
+    for instance in sorted(instances, key=lambda instance: (-instance.load, instance.base_url)):
+        shard = min(loads, key=lambda shard: (loads[shard], shard))
+        loads[shard] += instance.load
+        assigned[shard].append(instance)
+    return assigned
+
+
+def load_fleet(
+    path: 'Path',
+    *,
+    default_access_token: 'str | None' = None,
+    default_interval: 'float' = 300.0,
+) -> 'List[FleetInstance]':
+    '''Loads the fleet of GitLab instances described by a TOML file.
+
+    The file consists of an array of `instances` tables, e.g.
+
+        [[instances]]
+        url = "https://gitlab.example.com"
+        interval = 60                     # optional; seconds between polls
+        token_env = "EXAMPLE_GITLAB_TOKEN" # optional; or `token` to inline it
+
+    Instances without a token fall back to `default_access_token`.
+    '''
+    try:
+        with path.open('rb') as fp:
+            document = tomllib.load(fp)
+    except (OSError, tomllib.TOMLDecodeError) as exception:
+        raise ConfigurationException(f'Unable to read fleet file: {exception}') from exception
+
+    instances, seen = [], set()
+    for i, table in enumerate(document.get('instances', ()), 1):
+        base_url = str(table.get('url', '')).rstrip('/')
+        if not base_url:
+            raise ConfigurationException(f'Instance #{i} is missing its url.')
+        if base_url in seen:
+            raise ConfigurationException(f'Instance #{i} duplicates {base_url}.')
+        seen.add(base_url)
+
+        if 'token' in table:
+            access_token = table['token']
+        elif 'token_env' in table:
+            access_token = os.environ.get(table['token_env'])
+            if access_token is None:
+                raise ConfigurationException(f'Instance #{i} refers to unset variable {table["token_env"]}.')
+        else:
+            access_token = default_access_token
+        if not access_token:
+            raise ConfigurationException(f'Instance #{i} ({base_url}) has no access token.')
+
+        try:
+            interval = float(table.get('interval', default_interval))
+        except (TypeError, ValueError):
+            raise ConfigurationException(f'Instance #{i} ({base_url}) has an invalid interval.')
+        if interval <= 0:
+            raise ConfigurationException(f'Instance #{i} ({base_url}) has a non-positive interval.')
+
+        instances.append(FleetInstance(base_url, access_token, interval))
+
+    if not instances:
+        raise ConfigurationException('Fleet file does not define any instances.')
+    return instances
@@ -0,0 +1,404 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import sqlalchemy
+
+from .exceptions import ConfigurationException
+from .exports import BUFFER_SIZE
+from .models import CHECKS, PollEntry, ReadinessComponent, ReadinessResult, ResponseBody
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, TextIO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+
+
+IMPORT_FORMATS = ('csv', 'database', 'jsonl')
+SOURCE_SCHEMA = 'source'
+# the first bytes of every SQLite database file
+_SQLITE_HEADER = b'SQLite format 3\x00'
+_EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+# the columns of the polls imported from exports, in the order of their values; followed by the ids of
+# the response bodies, if the export includes them
+_IMPORTED_COLUMNS = (
+    'base_url',
+    'instance_version',
+    'health_check_passed',
+    'readiness_check_passed',
+    'created_at',
+    *(f'{check}_{measure}' for check in CHECKS for measure in ('duration_ms', 'status_code')),
+    'error_message',
+    'source',
+)
+# the columns every exported record must have values for
+_REQUIRED_COLUMNS = ('base_url', 'health_check_passed', 'readiness_check_passed', 'created_at')
+# exported values of the checks, by their lower case; exports written before `yes`/`no` use `True`/`False`
+_BOOLEANS = {'yes': True, 'true': True, 'no': False, 'false': False}
+
+
+def infer_import_format(path: 'Path') -> 'str | None':
+    '''Infers the format of an import; databases from their contents, and exports from their file extension.
+
+    Compression extensions (.gz, .zst) are looked past; returns `None` if the
+    format cannot be told.
+    '''
+    with path.open('rb') as fp:
+        if fp.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER:
+            return 'database'
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if suffixes and suffixes[-1] in ('.gz', '.zst'):
+        suffixes.pop()
+    return _EXTENSIONS.get(suffixes[-1]) if suffixes else None
+
+
+def open_import(path: 'Path', compression: 'str' = 'none') -> 'TextIO':
+    '''Opens an export file for buffered text reading, decompressing it if need be.
+
+    Appended exports (further gzip members or zstd frames) are read through as
+    one.
+    '''
+    if compression == 'none':
+        return path.open('r', buffering=BUFFER_SIZE, encoding='utf-8', newline='')
+    if compression == 'gzip':
+        fp = gzip.open(path, 'rb')
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError('zstd compression requires the zstandard package.')
+        fp = zstandard.ZstdDecompressor().stream_reader(path.open('rb'), read_across_frames=True, closefd=True)
+    else:
+        raise ValueError(f'Unknown compression: {compression}')
+    return io.TextIOWrapper(io.BufferedReader(fp, BUFFER_SIZE), encoding='utf-8', newline='')
+
+
+def read_export(fp: 'TextIO', input_format: 'str') -> 'Iterator[Dict[str, Any]]':
+    '''Reads the polls of a CSV or JSON Lines export, as records keyed by column header.
+
+    The header of a CSV export is checked up front, raising a
+    `ConfigurationException` if it lacks any of the columns imported.
+    '''
+    if input_format == 'csv':
+        reader = csv.DictReader(fp)
+        if reader.fieldnames is None: # an empty file
+            return iter(())
+        missing = [column for column in _REQUIRED_COLUMNS if column not in reader.fieldnames]
+        if missing:
+            raise ConfigurationException(f'The export lacks the {", ".join(missing)} column(s).')
+        return reader
+    if input_format == 'jsonl':
+        return _read_json_lines(fp)
+    raise ValueError(f'Unknown export format: {input_format}')
+
+
+def import_poll_records(
+    engine: 'sqlalchemy.Engine',
+    records: 'Iterable[Dict[str, Any]]',
+    source: 'str',
+    *,
+    batch_size: 'int' = 100000,
+    on_batch: 'Callable[[int], None] | None' = None,
+) -> 'int':
+    '''Imports the polls of an export, as read by `read_export`, returning the number imported.
+
+    Polls are inserted a batch at a time, each in a single transaction, and
+    attributed to `source`; polls of the same instance and timestamp already
+    imported from that source are skipped, so that repeated imports are
+    idempotent. Response bodies are stored once, as when polling.
+
+    Exports carry less than databases: polls are recorded to the second,
+    skipped polls are indistinguishable from failed ones, and the failed
+    readiness check components are not imported, as the passing ones are not
+    exported.
+    '''
+    responses = None
+    bodies: 'OrderedDict[str, int]' = OrderedDict()
+    imported = read = 0
+    records = iter(records)
+    while batch := list(itertools.islice(records, batch_size)):
+        rows = []
+        for record in batch:
+            try:
+                rows.append(_poll_entry_values(record, source))
+            except (TypeError, ValueError) as e:
+                raise ConfigurationException(f'Invalid poll record #{read + len(rows) + 1}: {e}') from e
+        read += len(batch)
+        if responses is None:
+            responses = [check for check in CHECKS if f'{check}_response' in batch[0]]
+            columns = [*_IMPORTED_COLUMNS, *(f'{check}_response_id' for check in CHECKS if responses)]
+            # values are bound as they are stored, as processing each of them through SQLAlchemy takes as long as the insert itself
+            insert_poll_entries = (
+                f'INSERT OR IGNORE INTO {PollEntry.__tablename__} ({", ".join(columns)}) '
+                f'VALUES ({", ".join("?" for _column in columns)})'
+            )
+        with engine.begin() as connection:
+            if responses:
+                _intern_response_texts(connection, batch, rows, responses, bodies)
+            imported += connection.exec_driver_sql(insert_poll_entries, list(map(tuple, rows))).rowcount
+        if on_batch is not None:
+            on_batch(imported)
+    return imported
+
+
+def import_database(
+    engine: 'sqlalchemy.Engine',
+    path: 'Path',
+    source: 'str',
+    *,
+    batch_size: 'int' = 100000,
+    on_batch: 'Callable[[int], None] | None' = None,
+) -> 'int':
+    '''Imports the polls of another poll database, with their response bodies and readiness results.
+
+    The database is attached, and its polls copied over a range of ids at a
+    time, each in a single transaction, without passing through Python. Polls
+    are attributed to `source`, unless the other database had itself imported
+    them, in which case they keep their original source; either way, polls
+    already imported from the same source are skipped, so that repeated
+    imports are idempotent. The other database must be migrated to the latest
+    schema, as this one is.
+    '''
+    imported = 0
+    with engine.connect() as connection:
+        connection.exec_driver_sql(f'ATTACH DATABASE ? AS {SOURCE_SCHEMA}', (path.as_posix(),))
+        connection.commit()
+        try:
+            tables = _source_tables()
+            source_ids = tables[PollEntry.__tablename__].c.id
+            with connection.begin():
+                _check_source_schema(connection, path)
+                high = connection.scalar(sqlalchemy.select(sqlalchemy.func.max(source_ids))) or 0
+            low = 0
+            while low < high:
+                with connection.begin():
+                    last_id = connection.scalar(
+                        sqlalchemy.select(source_ids).where(source_ids > low).order_by(source_ids)
+                        .offset(batch_size - 1).limit(1)
+                    )
+                    if last_id is None: # the final, partial batch
+                        last_id = high
+                    imported += _copy_from_source(connection, tables, low, last_id, source)
+                low = last_id
+                if on_batch is not None:
+                    on_batch(imported)
+        finally:
+            connection.exec_driver_sql(f'DETACH DATABASE {SOURCE_SCHEMA}')
+            connection.commit()
+    return imported
+
+
+def _check_source_schema(connection: 'Connection', path: 'Path') -> 'None':
+    '''Raises a `ConfigurationException` unless the polls of the attached database have every column of those of this one.'''
+    columns = {row.name for row in connection.exec_driver_sql(f'PRAGMA {SOURCE_SCHEMA}.table_info(poll_entry)')}
+    missing = sorted(set(PollEntry.__table__.c.keys()) - columns)
+    if not columns:
+        raise ConfigurationException(f'{path.as_posix()} is not a poll database.')
+    if missing:
+        raise ConfigurationException(
+            f'{path.as_posix()} is not migrated to the latest schema (missing {", ".join(missing)}); migrate it before importing it.'
+        )
+
+
+def _copy_from_source(
+    connection: 'Connection',
+    tables: 'Dict[str, sqlalchemy.Table]',
+    low: 'int',
+    high: 'int',
+    source: 'str',
+) -> 'int':
+    '''Copies the polls of the attached database with ids in (`low`, `high`], returning the number imported.
+
+    Bodies and components are matched up by digest and name respectively, as
+    their ids differ between the databases.
+    '''
+    poll_entry = PollEntry.__table__
+    readiness_component = ReadinessComponent.__table__
+    readiness_result = ReadinessResult.__table__
+    response_body = ResponseBody.__table__
+    source_poll_entry = tables[poll_entry.name]
+    source_readiness_component = tables[readiness_component.name]
+    source_readiness_result = tables[readiness_result.name]
+    source_response_body = tables[response_body.name]
+    batch = sqlalchemy.and_(source_poll_entry.c.id > low, source_poll_entry.c.id <= high)
+    imported_source = sqlalchemy.func.coalesce(source_poll_entry.c.source, source)
+
+    responses = [f'{check}_response_id' for check in CHECKS]
+    referenced = sqlalchemy.union(*(
+        sqlalchemy.select(source_poll_entry.c[column]).where(batch, source_poll_entry.c[column].is_not(None))
+        for column in responses
+    )).subquery()
+    connection.execute(
+        sqlalchemy.insert(response_body)
+        .from_select(
+            ('digest', 'size', 'content'),
+            sqlalchemy.select(source_response_body.c.digest, source_response_body.c.size, source_response_body.c.content)
+            .where(source_response_body.c.id.in_(sqlalchemy.select(referenced.c[0]))),
+        )
+        .prefix_with('OR IGNORE')
+    )
+
+    def body_id(column: 'sqlalchemy.Column') -> 'sqlalchemy.ScalarSelect':
+        return (
+            sqlalchemy.select(response_body.c.id)
+            .join(source_response_body, source_response_body.c.digest == response_body.c.digest)
+            .where(source_response_body.c.id == column)
+            .scalar_subquery()
+        )
+
+    # polls imported by this batch are allocated ids above any already there
+    previous_id = connection.scalar(sqlalchemy.select(sqlalchemy.func.max(poll_entry.c.id))) or 0
+    copied = [column.name for column in poll_entry.c if column.name not in ('id', 'source', *responses)]
+    imported = connection.execute(
+        sqlalchemy.insert(poll_entry)
+        .from_select(
+            (*copied, *responses, 'source'),
+            sqlalchemy.select(
+                *(source_poll_entry.c[column] for column in copied),
+                *(body_id(source_poll_entry.c[column]) for column in responses),
+                imported_source,
+            )
+            .where(batch)
+            .order_by(source_poll_entry.c.id),
+        )
+        .prefix_with('OR IGNORE')
+    ).rowcount
+    if not imported:
+        return 0
+
+    # components are few, so all of them are copied
+    connection.execute(
+        sqlalchemy.insert(readiness_component)
+        .from_select(('name',), sqlalchemy.select(source_readiness_component.c.name))
+        .prefix_with('OR IGNORE')
+    )
+    connection.execute(
+        sqlalchemy.insert(readiness_result)
+        .from_select(
+            ('poll_entry_id', 'component_id', 'passed'),
+            sqlalchemy.select(poll_entry.c.id, readiness_component.c.id, source_readiness_result.c.passed)
+            .select_from(source_poll_entry)
+            .join(source_readiness_result, source_readiness_result.c.poll_entry_id == source_poll_entry.c.id)
+            .join(source_readiness_component, source_readiness_component.c.id == source_readiness_result.c.component_id)
+            .join(readiness_component, readiness_component.c.name == source_readiness_component.c.name)
+            # looked up through the index deduplicating imported polls
+            .join(poll_entry, sqlalchemy.and_(
+                poll_entry.c.base_url == source_poll_entry.c.base_url,
+                poll_entry.c.created_at == source_poll_entry.c.created_at,
+                poll_entry.c.source == imported_source,
+            ))
+            .where(batch, poll_entry.c.id > previous_id),
+        )
+        .prefix_with('OR IGNORE')
+    )
+    return imported
+
+
+def _intern_response_texts(
+    connection: 'Connection',
+    records: 'Sequence[Dict[str, Any]]',
+    rows: 'List[List[Any]]',
+    checks: 'Sequence[str]',
+    bodies: 'OrderedDict[str, int]',
+    *,
+    cache_size: 'int' = 1024,
+) -> 'None':
+    '''Stores the response bodies of a batch of records once each, appending their ids to the rows, for every check.
+
+    Bodies are shared between many polls, so the ids of the most recently used
+    ones are cached in `bodies`, keyed by their text.
+    '''
+    missing = {
+        ResponseBody.from_text(text).digest: text
+        for text in {record.get(f'{check}_response') for record in records for check in checks}
+        if text and text not in bodies
+    }
+    if missing:
+        connection.execute(
+            sqlalchemy.insert(ResponseBody.__table__).prefix_with('OR IGNORE'),
+            [
+                {'digest': body.digest, 'size': body.size, 'content': body.content}
+                for body in map(ResponseBody.from_text, missing.values())
+            ],
+        )
+        digests = list(missing)
+        # fetch in chunks, staying well within the limit on bound parameters
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            stmt = sqlalchemy.select(ResponseBody.id, ResponseBody.digest).where(ResponseBody.digest.in_(chunk))
+            for body_id, digest in connection.execute(stmt):
+                bodies[missing[digest]] = body_id
+
+    for record, row in zip(records, rows):
+        for check in CHECKS:
+            text = record.get(f'{check}_response') if check in checks else None
+            if text:
+                bodies.move_to_end(text)
+                row.append(bodies[text])
+            else:
+                row.append(None)
+    while len(bodies) > cache_size:
+        bodies.popitem(last=False)
+
+
+def _optional(value: 'Any', convert: 'Callable[[Any], Any]') -> 'Any':
+    '''Converts an exported value, which is missing if empty.'''
+    return None if value is None or value == '' else convert(value)
+
+
+def _parse_check(value: 'Any') -> 'bool':
+    '''Parses whether an exported check passed, from `yes`/`no` or `true`/`false` in any case, or a JSON boolean.'''
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in _BOOLEANS:
+        return _BOOLEANS[value.lower()]
+    raise ValueError(f'expected yes or no, not {value!r}')
+
+
+def _poll_entry_values(record: 'Dict[str, Any]', source: 'str') -> 'List[Any]':
+    '''Returns the values of the `_IMPORTED_COLUMNS` of the poll entry of an exported record, as they are stored.
+
+    Raises `ValueError` (or `TypeError`) if a value is missing or invalid.
+    '''
+    missing = [column for column in _REQUIRED_COLUMNS if record.get(column) in (None, '')]
+    if missing:
+        raise ValueError(f'missing {", ".join(missing)}')
+    values = [
+        record['base_url'],
+        record.get('instance_version') or '',
+        _parse_check(record['health_check_passed']),
+        _parse_check(record['readiness_check_passed']),
+        # as SQLAlchemy stores timestamps, so that they compare equal to those of polls made here
+        datetime.fromisoformat(record['created_at']).isoformat(' ', 'microseconds'),
+    ]
+    for check in CHECKS:
+        values.append(_optional(record.get(f'{check}_duration_ms'), float))
+        values.append(_optional(record.get(f'{check}_status_code'), int))
+    values.extend(('', source))
+    return values
+
+
+def _read_json_lines(fp: 'TextIO') -> 'Iterator[Dict[str, Any]]':
+    '''Reads the records of a JSON Lines export, skipping blank lines.'''
+    for number, line in enumerate(fp, start=1):
+        if line.isspace():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ConfigurationException(f'Invalid JSON on line {number}: {e}') from e
+        if not isinstance(record, dict):
+            raise ConfigurationException(f'Invalid poll record on line {number}: expected a JSON object')
+        yield record
+
+
+def _source_tables() -> 'Dict[str, sqlalchemy.Table]':
+    '''Returns the tables of the attached database, keyed by name.'''
+    attached = sqlalchemy.MetaData()
+    return {
+        table.name: table.to_metadata(attached, schema=SOURCE_SCHEMA)
+        for table in (PollEntry.__table__, ReadinessComponent.__table__, ReadinessResult.__table__, ResponseBody.__table__)
+    }
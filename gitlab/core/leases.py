@@ -0,0 +1,106 @@
+import os
+import socket
+import sqlalchemy
+
+from .models import InstanceLease, PollerNode
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.sqlite import insert
+from typing import List, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+
+
+def default_node_id() -> 'str':
+    '''Returns an id for this process as a poller node, unique across the hosts sharing a database.'''
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+@dataclass(frozen=True)
+class LeaseOptions:
+    '''How a poller node shares the polling of a fleet with the other nodes using the same database.
+
+    The node holds leases on its share of the instances, and only polls
+    those; leases (and the heartbeat of the node) last `duration` seconds,
+    and are renewed every `renew_interval` seconds, so that a few renewals
+    may fail before they lapse.
+    '''
+    node_id: 'str' = field(default_factory=default_node_id)
+    duration: 'float' = 30.0
+
+    @property
+    def renew_interval(self) -> 'float':
+        '''Returns the time (seconds) between renewals of the leases.'''
+        return self.duration / 3
+
+
+def renew_leases(
+    connection: 'Connection',
+    node_id: 'str',
+    base_urls: 'Sequence[str]',
+    now: 'datetime',
+    *,
+    duration: 'float',
+) -> 'List[str]':
+    '''Renews the leases of a node on its share of the instances, returning the instances it holds, by URL.
+
+    Every live node (one whose heartbeat has yet to expire) holds an equal
+    share of the instances, rounded up. A node holding more than its share
+    releases the excess, for nodes that just joined to take up; one holding
+    less takes up the instances whose leases are missing or expired, such as
+    those of a node that died. So each instance is held by a single node, and
+    the whole fleet is polled once, however many nodes share it.
+
+    The heartbeat of the node is written first, which takes the write lock of
+    the database; so renewals by different nodes never interleave. Leases and
+    heartbeats are compared with the clock of each node, which should agree
+    to well within `duration` seconds.
+    '''
+    expires_at = now + timedelta(seconds=duration)
+    connection.execute(
+        insert(PollerNode)
+        .values(node_id=node_id, expires_at=expires_at)
+        .on_conflict_do_update(index_elements=[PollerNode.node_id], set_={'expires_at': expires_at})
+    )
+    connection.execute(sqlalchemy.delete(PollerNode).where(PollerNode.expires_at <= now))
+    live_nodes = connection.scalar(sqlalchemy.select(sqlalchemy.func.count()).select_from(PollerNode))
+    share = -(-len(base_urls) // live_nodes) # rounded up, so that every instance is held
+
+    leases = {
+        row.base_url: row
+        for row in connection.execute(
+            sqlalchemy.select(InstanceLease.base_url, InstanceLease.node_id, InstanceLease.expires_at)
+            .where(InstanceLease.base_url.in_(list(base_urls)))
+        )
+    }
+    held = sorted(base_url for base_url, lease in leases.items() if lease.node_id == node_id)
+    held, released = held[:share], held[share:]
+    if len(held) < share:
+        free = [
+            base_url for base_url in base_urls
+            if base_url not in leases or (leases[base_url].node_id != node_id and leases[base_url].expires_at <= now)
+        ]
+        held.extend(free[:share - len(held)])
+
+    if released:
+        connection.execute(
+            sqlalchemy.delete(InstanceLease)
+            .where(InstanceLease.node_id == node_id, InstanceLease.base_url.in_(released))
+        )
+    if held:
+        stmt = insert(InstanceLease)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[InstanceLease.base_url],
+                set_={'node_id': stmt.excluded.node_id, 'expires_at': stmt.excluded.expires_at},
+            ),
+            [{'base_url': base_url, 'node_id': node_id, 'expires_at': expires_at} for base_url in held],
+        )
+    return sorted(held)
+
+
+def release_leases(connection: 'Connection', node_id: 'str') -> 'None':
+    '''Releases every lease of a node, and its heartbeat, so that the other nodes take its instances up at once.'''
+    connection.execute(sqlalchemy.delete(InstanceLease).where(InstanceLease.node_id == node_id))
+    connection.execute(sqlalchemy.delete(PollerNode).where(PollerNode.node_id == node_id))
@@ -0,0 +1,207 @@
+import asyncio
+import bisect
+import time
+
+from .models import CHECKS, PollEntry
+from .persistence import WriterStatistics
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# upper bounds (seconds) of the check duration histogram buckets, besides +Inf
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PATH = '/metrics'
+
+
+@dataclass
+class _Histogram:
+    '''Observations of a histogram; `counts[i]` counts those within bucket `i` alone.'''
+    counts: 'List[int]'
+    sum: 'float' = 0.0
+
+
+@dataclass
+class _InstanceState:
+    '''Latest state and running totals of the polls of an instance.'''
+    up: 'bool' = False
+    ready: 'bool' = False
+    version: 'str' = ''
+    last_polled_at: 'float' = 0.0
+    poll_count: 'int' = 0
+    failed_poll_count: 'int' = 0
+    skipped_poll_count: 'int' = 0
+    durations: 'Dict[str, _Histogram]' = field(default_factory=dict)
+
+
+class PollMetrics:
+    '''Prometheus metrics of the polled instances, kept in memory as polls complete.
+
+    Every poll is folded into the state of its instance by `observe`; `render`
+    formats the state in the text exposition format, without ever touching the
+    database. The rendered instance metrics are cached until the next poll, so
+    that repeated scrapes cost next to nothing.
+    '''
+    _instances: 'Dict[str, _InstanceState]'
+    _rendered: 'str | None'
+    buckets: 'Sequence[float]'
+    writer_statistics: 'Callable[[], WriterStatistics] | None'
+
+    def __init__(
+        self,
+        *,
+        buckets: 'Sequence[float]' = DURATION_BUCKETS,
+        writer_statistics: 'Callable[[], WriterStatistics] | None' = None,
+    ) -> 'None':
+        self._instances = {}
+        self._rendered = None
+        self.buckets = tuple(sorted(buckets))
+        self.writer_statistics = writer_statistics
+
+    def observe(self, poll_entry: 'PollEntry') -> 'None':
+        '''Folds a completed poll into the metrics of its instance.'''
+        state = self._instances.setdefault(poll_entry.base_url, _InstanceState())
+        state.up = bool(poll_entry.health_check_passed)
+        state.ready = bool(poll_entry.readiness_check_passed)
+        # keep reporting the last known version through failures to fetch the metadata
+        state.version = poll_entry.instance_version or state.version
+        state.last_polled_at = time.time()
+        state.poll_count += 1
+        if poll_entry.skipped:
+            state.skipped_poll_count += 1
+        elif not (state.up and state.ready):
+            state.failed_poll_count += 1
+        for check in CHECKS:
+            duration_ms = getattr(poll_entry, f'{check}_duration_ms')
+            if duration_ms is None:
+                continue
+            histogram = state.durations.get(check)
+            if histogram is None:
+                histogram = state.durations[check] = _Histogram([0] * (len(self.buckets) + 1))
+            duration = duration_ms / 1000
+            histogram.counts[bisect.bisect_left(self.buckets, duration)] += 1
+            histogram.sum += duration
+        self._rendered = None
+
+    def render(self) -> 'str':
+        '''Formats the metrics in the Prometheus text exposition format.'''
+        if self._rendered is None:
+            self._rendered = self._render_instances()
+        return self._rendered + self._render_writer()
+
+    def _render_instances(self) -> 'str':
+        '''Formats the metrics of the polled instances.'''
+        instances = sorted(self._instances.items())
+        lines = []
+
+        def family(name: 'str', help_text: 'str', kind: 'str', samples: 'List[Tuple[Dict[str, str], float]]') -> 'None':
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{name}{_labels(labels)} {_number(value)}' for labels, value in samples)
+
+        family('gitlab_up', 'Whether the latest health check of the instance passed.', 'gauge',
+               [({'instance': url}, state.up) for url, state in instances])
+        family('gitlab_ready', 'Whether the latest readiness check of the instance passed.', 'gauge',
+               [({'instance': url}, state.ready) for url, state in instances])
+        family('gitlab_version_info', 'Version last reported by the instance.', 'gauge',
+               [({'instance': url, 'version': state.version}, 1) for url, state in instances if state.version])
+        family('gitlab_last_poll_timestamp_seconds', 'Time at which the instance was last polled.', 'gauge',
+               [({'instance': url}, state.last_polled_at) for url, state in instances])
+        family('gitlab_polls_total', 'Polls of the instance.', 'counter',
+               [({'instance': url}, state.poll_count) for url, state in instances])
+        family('gitlab_poll_failures_total', 'Polls of the instance that found it unavailable.', 'counter',
+               [({'instance': url}, state.failed_poll_count) for url, state in instances])
+        family('gitlab_polls_skipped_total', 'Polls of the instance skipped while its circuit was open.', 'counter',
+               [({'instance': url}, state.skipped_poll_count) for url, state in instances])
+
+        name = 'gitlab_check_duration_seconds'
+        lines.append(f'# HELP {name} Time taken by the checks of the instance.')
+        lines.append(f'# TYPE {name} histogram')
+        for url, state in instances:
+            for check in CHECKS:
+                histogram = state.durations.get(check)
+                if histogram is None:
+                    continue
+                labels = {'instance': url, 'check': check}
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float('inf')), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels({**labels, "le": _number(bound)})} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(histogram.sum)}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+    def _render_writer(self) -> 'str':
+        '''Formats the metrics of the poll writer, which change with every scrape.'''
+        if self.writer_statistics is None:
+            return ''
+        statistics = self.writer_statistics()
+        metrics = [
+            ('gitlab_poller_write_queue_depth', 'Polls waiting to be written to the database.', 'gauge',
+             statistics.queue_depth),
+            ('gitlab_poller_rows_written_total', 'Polls written to the database.', 'counter',
+             statistics.rows_written),
+            ('gitlab_poller_rows_dropped_total', 'Polls that could not be written to the database.', 'counter',
+             statistics.rows_dropped),
+        ]
+        if statistics.write_lag is not None:
+            metrics.append((
+                'gitlab_poller_write_lag_seconds',
+                'Time the oldest poll of the latest batch waited to be written to the database.',
+                'gauge',
+                statistics.write_lag,
+            ))
+        return ''.join(
+            f'# HELP {name} {help_text}\n# TYPE {name} {kind}\n{name} {_number(value)}\n'
+            for name, help_text, kind, value in metrics
+        )
+
+
+async def serve_metrics(metrics: 'PollMetrics', host: 'str', port: 'int') -> 'asyncio.Server':
+    '''Starts serving the metrics over HTTP at `/metrics`, on the current event loop.
+
+    The server is deliberately minimal: one request per connection, and no
+    request bodies, which is all that a Prometheus scrape needs.
+    '''
+    async def handle(reader: 'asyncio.StreamReader', writer: 'asyncio.StreamWriter') -> 'None':
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''): # skip the headers
+                pass
+            method, path, *_ = request_line.decode('latin-1').split(' ') + ['', '']
+            if path.split('?', 1)[0] != METRICS_PATH:
+                status, content_type, body = '404 Not Found', 'text/plain', b'Not Found\n'
+            elif method not in ('GET', 'HEAD'):
+                status, content_type, body = '405 Method Not Allowed', 'text/plain', b'Method Not Allowed\n'
+            else:
+                status, content_type, body = '200 OK', CONTENT_TYPE, metrics.render().encode('utf-8')
+            writer.write(
+                f'HTTP/1.1 {status}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n'
+                '\r\n'.encode('latin-1') + (b'' if method == 'HEAD' else body)
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def _labels(labels: 'Dict[str, str]') -> 'str':
+    '''Formats the labels of a sample, escaped as the exposition format requires.'''
+    def escape(value: 'str') -> 'str':
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value: 'float') -> 'str':
+    '''Formats the value of a sample.'''
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, bool) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -1,44 +1,106 @@
+import hashlib
+import zlib
+
 from datetime import datetime
-from sqlalchemy import Boolean, DateTime, Integer, String
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, and_, false, not_
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from typing import List
 from sqlalchemy.sql import functions
 
 
+# the checks made by a poll, which prefix the names of the poll entry columns recording them
+CHECKS = ('health_check', 'readiness_check', 'metadata')
+
+
 class Base(DeclarativeBase):
     pass
 
 
+class InstanceLease(Base):
+    '''Represents the lease of a poller node on a GitLab instance, which only that node polls.
+
+    Leases are renewed by their node well before they expire; once expired,
+    any node may take the instance over.
+    '''
+    __tablename__ = 'instance_lease'
+
+    base_url: Mapped[str] = mapped_column(String, primary_key=True)
+    node_id: Mapped[str] = mapped_column(String)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+class LatestState(Base):
+    '''Represents the current state of a GitLab instance, as of its latest poll.
+
+    A row is kept per instance, and updated as polls are written, so that the
+    state of a whole fleet is read without scanning its polls. A poll succeeds
+    if it passes both the health and readiness checks; skipped polls leave the
+    state as it was.
+    '''
+    __tablename__ = 'latest_state'
+
+    base_url: Mapped[str] = mapped_column(String, primary_key=True)
+    # not a foreign key, as the state outlives the poll that last updated it
+    poll_entry_id: Mapped[int] = mapped_column(Integer)
+    polled_at: Mapped[datetime] = mapped_column(DateTime)
+    health_check_passed: Mapped[bool] = mapped_column(Boolean)
+    readiness_check_passed: Mapped[bool] = mapped_column(Boolean)
+    # the latest version reported; polls that failed to fetch the metadata keep the previous version
+    instance_version: Mapped[str] = mapped_column(String)
+    last_success_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_failure_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    consecutive_failures: Mapped[int] = mapped_column(Integer)
+
+    def __repr__(self) -> 'str':
+        return f'<{self.__class__.__name__} ({{attributes}})>'.format(
+            attributes=', '.join((
+                f'instance={self.base_url}',
+                f'health={"passed" if self.health_check_passed else "failed"}',
+                f'readiness={"passed" if self.readiness_check_passed else "failed"}',
+                f'version={self.instance_version}',
+                f'timestamp={self.polled_at.isoformat()}',
+            ))
+        )
+
+
 class PollEntry(Base):
-    '''Represents an entry of a GitLab instance poll.'''
+    '''Represents an entry of a GitLab instance poll.
+
+    Ids are never reused, even once the latest polls are pruned, so that
+    watermarks and export checkpoints only ever have newer polls beyond them.
+    '''
     __tablename__ = 'poll_entry'
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    base_url: Mapped[datetime] = mapped_column(String, index=True)
+    base_url: Mapped[datetime] = mapped_column(String)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=functions.now(), nullable=True, index=True)
-    health_check_passed: Mapped[bool] = mapped_column(Boolean, index=True)
-    instance_version: Mapped[str] = mapped_column(String, index=True)
-    readiness_check_passed: Mapped[bool] = mapped_column(Boolean, index=True)
-    # extra information from the calls made
-    health_check_response: Mapped[str] = mapped_column(
-        String,
-        default='',
-        deferred=True,
-        deferred_group='response_bodies',
-    )
-    readiness_check_response: Mapped[str] = mapped_column(
-        String,
-        default='',
-        deferred=True,
-        deferred_group='response_bodies',
-    )
-    metadata_response: Mapped[str] = mapped_column(
-        String,
-        default='',
-        deferred=True,
-        deferred_group='response_bodies',
-    )
+    health_check_passed: Mapped[bool] = mapped_column(Boolean)
+    instance_version: Mapped[str] = mapped_column(String)
+    readiness_check_passed: Mapped[bool] = mapped_column(Boolean)
+    # extra information from the calls made; bodies are shared between all polls that received them
+    health_check_response_id: Mapped[int | None] = mapped_column(ForeignKey('response_body.id'), nullable=True)
+    readiness_check_response_id: Mapped[int | None] = mapped_column(ForeignKey('response_body.id'), nullable=True)
+    metadata_response_id: Mapped[int | None] = mapped_column(ForeignKey('response_body.id'), nullable=True)
+    health_check_response: Mapped['ResponseBody | None'] = relationship(foreign_keys=[health_check_response_id])
+    readiness_check_response: Mapped['ResponseBody | None'] = relationship(foreign_keys=[readiness_check_response_id])
+    metadata_response: Mapped['ResponseBody | None'] = relationship(foreign_keys=[metadata_response_id])
+    # the result of each component of the readiness check, if it responded with any
+    readiness_results: Mapped[List['ReadinessResult']] = relationship(cascade='all, delete-orphan')
+    # time taken (in milliseconds) and HTTP status code of each check; the status code is missing
+    # if no response was received, and both are missing for polls recorded before they were
+    health_check_duration_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    health_check_status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    readiness_check_duration_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    readiness_check_status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    metadata_duration_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    metadata_status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # polls skipped while the circuit of an unresponsive instance was open, rather than made
+    skipped: Mapped[bool] = mapped_column(Boolean, default=False, server_default=false())
     # error-related information
     error_message: Mapped[str] = mapped_column(String, default='')
+    # the node or database the poll was imported from; missing for polls made against this database
+    source: Mapped[str | None] = mapped_column(String, nullable=True)
 
     def __repr__(self) -> 'str':
         return f'<{self.__class__.__name__} ({{attributes}})>'.format(
@@ -50,3 +112,183 @@ class PollEntry(Base):
                 f'timestamp={self.created_at.isoformat()}',
             ))
         )
+
+
+# polls of an instance over a period, as selected by exports and reports
+Index('ix_poll_entry_base_url_created_at', PollEntry.base_url, PollEntry.created_at)
+# failed polls of an instance; only the (rare) failures are indexed, so that most inserts need not maintain it
+Index(
+    'ix_poll_entry_failures',
+    PollEntry.base_url,
+    PollEntry.created_at,
+    sqlite_where=not_(and_(PollEntry.health_check_passed, PollEntry.readiness_check_passed)),
+)
+# imported polls, by which repeated imports are deduplicated; polls made against this database are never deduplicated
+Index(
+    'ix_poll_entry_imports',
+    PollEntry.base_url,
+    PollEntry.created_at,
+    PollEntry.source,
+    sqlite_where=PollEntry.source.is_not(None),
+    unique=True,
+)
+
+
+class PollRollup(Base):
+    '''Represents the aggregated polls of a GitLab instance over an hour or a day.'''
+    __tablename__ = 'poll_rollup'
+
+    base_url: Mapped[str] = mapped_column(String, primary_key=True)
+    granularity: Mapped[str] = mapped_column(String, primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    poll_count: Mapped[int] = mapped_column(Integer)
+    # polls passing both checks, i.e. finding the instance available
+    available_count: Mapped[int] = mapped_column(Integer)
+    health_check_passed_count: Mapped[int] = mapped_column(Integer)
+    readiness_check_passed_count: Mapped[int] = mapped_column(Integer)
+    error_count: Mapped[int] = mapped_column(Integer)
+    skipped_count: Mapped[int] = mapped_column(Integer)
+    first_version: Mapped[str | None] = mapped_column(String, nullable=True)
+    last_version: Mapped[str | None] = mapped_column(String, nullable=True)
+    first_polled_at: Mapped[datetime] = mapped_column(DateTime)
+    last_polled_at: Mapped[datetime] = mapped_column(DateTime)
+    # total time taken (in milliseconds) by each check, over the number of checks measured; polls
+    # recorded before durations were measured are not counted
+    health_check_duration_ms_sum: Mapped[float] = mapped_column(Float)
+    health_check_duration_count: Mapped[int] = mapped_column(Integer)
+    readiness_check_duration_ms_sum: Mapped[float] = mapped_column(Float)
+    readiness_check_duration_count: Mapped[int] = mapped_column(Integer)
+    metadata_duration_ms_sum: Mapped[float] = mapped_column(Float)
+    metadata_duration_count: Mapped[int] = mapped_column(Integer)
+
+    def __repr__(self) -> 'str':
+        return f'<{self.__class__.__name__} ({{attributes}})>'.format(
+            attributes=', '.join((
+                f'instance={self.base_url}',
+                f'{self.granularity}={self.bucket.isoformat()}',
+                f'health={self.health_check_passed_count}/{self.poll_count}',
+                f'readiness={self.readiness_check_passed_count}/{self.poll_count}',
+            ))
+        )
+
+
+class PollerNode(Base):
+    '''Represents a poller node sharing the polling of a fleet with others, for as long as its heartbeat lasts.'''
+    __tablename__ = 'poller_node'
+
+    node_id: Mapped[str] = mapped_column(String, primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+class ReadinessComponent(Base):
+    '''Represents a component of GitLab's readiness check (e.g. `gitaly_check[shard=default]`).
+
+    Component names are stored once, and referred to by id from each result.
+    '''
+    __tablename__ = 'readiness_component'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, unique=True)
+
+    def __repr__(self) -> 'str':
+        return f'<{self.__class__.__name__} ({self.name})>'
+
+
+class ReadinessResult(Base):
+    '''Represents the result of a component of the readiness check of a poll.'''
+    __tablename__ = 'readiness_result'
+    # the rows are all key, so they are stored in the primary key alone, clustered by poll
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    poll_entry_id: Mapped[int] = mapped_column(ForeignKey('poll_entry.id'), primary_key=True)
+    component_id: Mapped[int] = mapped_column(ForeignKey('readiness_component.id'), primary_key=True)
+    passed: Mapped[bool] = mapped_column(Boolean)
+    component: Mapped['ReadinessComponent'] = relationship()
+
+    def __repr__(self) -> 'str':
+        return f'<{self.__class__.__name__} (poll={self.poll_entry_id}, component={self.component_id}, passed={self.passed})>'
+
+
+# failures of a component; only the (rare) failures are indexed, as for the poll entries
+Index(
+    'ix_readiness_result_failures',
+    ReadinessResult.component_id,
+    ReadinessResult.poll_entry_id,
+    sqlite_where=not_(ReadinessResult.passed),
+)
+
+
+class ResponseBody(Base):
+    '''Represents a distinct response body, stored once and compressed.
+
+    Bodies are addressed by the SHA-256 digest of their content, so that every
+    poll receiving an identical body refers to the same row.
+    '''
+    __tablename__ = 'response_body'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    digest: Mapped[bytes] = mapped_column(LargeBinary, unique=True)
+    size: Mapped[int] = mapped_column(Integer)
+    content: Mapped[bytes] = mapped_column(LargeBinary, deferred=True)
+
+    @classmethod
+    def from_text(cls, text: 'str') -> 'ResponseBody':
+        '''Creates a (transient) response body holding the text.'''
+        encoded = text.encode('utf-8')
+        return cls(digest=hashlib.sha256(encoded).digest(), size=len(encoded), content=zlib.compress(encoded))
+
+    @staticmethod
+    def decompress(content: 'bytes') -> 'str':
+        '''Decodes the stored content of a response body.'''
+        return zlib.decompress(content).decode('utf-8')
+
+    @property
+    def text(self) -> 'str':
+        '''Returns the text of the response body.'''
+        return self.decompress(self.content)
+
+    def __repr__(self) -> 'str':
+        return f'<{self.__class__.__name__} (digest={self.digest.hex()[:12]}, size={self.size})>'
+
+
+class StateTransition(Base):
+    '''Represents a change in the state of a GitLab instance, recorded from the poll that first saw it.
+
+    Transitions hold the state of the instance after the change; the state
+    before it is that of the previous transition of the instance. The first
+    poll of an instance records its initial state.
+    '''
+    __tablename__ = 'state_transition'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    base_url: Mapped[str] = mapped_column(String)
+    # not a foreign key, as transitions outlive the polls that recorded them
+    poll_entry_id: Mapped[int] = mapped_column(Integer)
+    occurred_at: Mapped[datetime] = mapped_column(DateTime)
+    health_check_passed: Mapped[bool] = mapped_column(Boolean)
+    readiness_check_passed: Mapped[bool] = mapped_column(Boolean)
+    # the latest version reported; polls that failed to fetch the metadata keep the previous version
+    instance_version: Mapped[str] = mapped_column(String)
+
+    def __repr__(self) -> 'str':
+        return f'<{self.__class__.__name__} ({{attributes}})>'.format(
+            attributes=', '.join((
+                f'instance={self.base_url}',
+                f'health={"passed" if self.health_check_passed else "failed"}',
+                f'readiness={"passed" if self.readiness_check_passed else "failed"}',
+                f'version={self.instance_version}',
+                f'timestamp={self.occurred_at.isoformat()}',
+            ))
+        )
+
+
+# transitions of an instance over a period, as listed by incident timelines
+Index('ix_state_transition_base_url_occurred_at', StateTransition.base_url, StateTransition.occurred_at)
+
+
+class Watermark(Base):
+    '''Represents how far an incremental process has progressed through the poll entries.'''
+    __tablename__ = 'watermark'
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    poll_entry_id: Mapped[int] = mapped_column(Integer)
@@ -0,0 +1,298 @@
+import queue
+import sqlalchemy
+import sqlalchemy.orm
+import threading
+import time
+
+from .models import PollEntry, ReadinessComponent, ReadinessResult, ResponseBody
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+
+BatchProcessor = Callable[[sqlalchemy.orm.Session, List[PollEntry]], Any]
+RESPONSE_ATTRIBUTES = ('health_check_response', 'readiness_check_response', 'metadata_response')
+_STOP = object() # sentinel to wind down the writer thread
+_COLUMN_ATTRIBUTES = tuple(attribute.key for attribute in sqlalchemy.inspect(PollEntry).column_attrs)
+
+
+def create_engine(database: 'str', *, busy_timeout: 'float' = 30.0) -> 'sqlalchemy.Engine':
+    '''Creates a long-lived engine for the specified database.
+
+    SQLite databases are switched to write-ahead logging, which lets readers
+    (e.g. exports) proceed while polls are being written, and given a busy
+    timeout so that concurrent writers wait on each other instead of failing.
+    New databases are incrementally vacuumed, so that pruning may return
+    space to the file system.
+    '''
+    engine = sqlalchemy.create_engine(database)
+    if engine.dialect.name == 'sqlite':
+        @sqlalchemy.event.listens_for(engine, 'connect')
+        def configure_sqlite(dbapi_connection, _connection_record) -> 'None':
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout * 1000)}')
+            # only takes effect if no table has been created yet
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            cursor.execute('PRAGMA journal_mode = WAL')
+            # durable against application crashes; only a power loss may roll back the latest commits
+            cursor.execute('PRAGMA synchronous = NORMAL')
+            cursor.close()
+    return engine
+
+
+@dataclass(frozen=True)
+class WriterStatistics:
+    '''Snapshot of the throughput of a `PollWriter`.
+
+    The `write_lag` is the time (seconds) the oldest poll of the latest batch
+    waited between being polled and being committed, if a batch was written.
+    '''
+    batches_written: 'int'
+    elapsed: 'float'
+    queue_depth: 'int'
+    rows_dropped: 'int'
+    rows_written: 'int'
+    write_lag: 'float | None' = None
+
+    @property
+    def rows_per_second(self) -> 'float':
+        '''Returns the average number of rows written per second.'''
+        return self.rows_written / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass(frozen=True)
+class _SubmittedPoll:
+    '''An immutable record of a submitted poll entry, from which a fresh entry is built for each attempt to write it.
+
+    Readiness results are recorded by the name of their component, which is
+    interned afresh by each attempt too.
+
+    The entries of a failed attempt are expired and detached by its session,
+    so are never reused by the next attempt.
+    '''
+    columns: 'Tuple[Tuple[str, Any], ...]'
+    response_bodies: 'Tuple[Tuple[str, bytes, int, bytes], ...]'
+    readiness_results: 'Tuple[Tuple[str, bool], ...]'
+
+    @classmethod
+    def of(cls, poll_entry: 'PollEntry') -> '_SubmittedPoll':
+        '''Records the attributes set on a (transient) poll entry.'''
+        state = sqlalchemy.inspect(poll_entry).dict
+        return cls(
+            columns=tuple((key, state[key]) for key in _COLUMN_ATTRIBUTES if key in state),
+            response_bodies=tuple(
+                (attribute, body.digest, body.size, body.content)
+                for attribute in RESPONSE_ATTRIBUTES
+                if (body := state.get(attribute)) is not None
+            ),
+            readiness_results=tuple((result.component.name, result.passed) for result in state.get('readiness_results', ())),
+        )
+
+    def build(self) -> 'PollEntry':
+        '''Builds a new, transient poll entry with the recorded attributes.'''
+        poll_entry = PollEntry(**dict(self.columns))
+        for attribute, digest, size, content in self.response_bodies:
+            setattr(poll_entry, attribute, ResponseBody(digest=digest, size=size, content=content))
+        if self.readiness_results:
+            poll_entry.readiness_results = [
+                ReadinessResult(component=ReadinessComponent(name=name), passed=passed)
+                for name, passed in self.readiness_results
+            ]
+        return poll_entry
+
+
+class PollWriter:
+    '''Write-behind persistence for poll entries.
+
+    Entries are queued by `submit` and committed in batches by a background
+    thread, once either `batch_size` entries are pending or the oldest pending
+    entry has waited for `max_delay` seconds. Closing the writer (directly or
+    by leaving its context) flushes whatever is still pending.
+
+    Each of the `processors` is called with the session and the batch once the
+    batch has been flushed, so that derived data may be maintained within the
+    same transaction as the entries themselves.
+    '''
+    _batches_written: 'int'
+    _component_ids: 'Dict[str, int]'
+    _queue: 'queue.SimpleQueue'
+    _response_body_ids: 'Dict[bytes, int]'
+    _rows_dropped: 'int'
+    _rows_written: 'int'
+    _started_at: 'float'
+    _thread: 'threading.Thread'
+    _write_lag: 'float | None'
+    batch_size: 'int'
+    engine: 'sqlalchemy.Engine'
+    max_delay: 'float'
+    on_error: 'Callable[[Exception, List[PollEntry]], Any] | None'
+    processors: 'Sequence[BatchProcessor]'
+    retries: 'int'
+
+    def __init__(
+        self,
+        engine: 'sqlalchemy.Engine',
+        *,
+        batch_size: 'int' = 500,
+        max_delay: 'float' = 1.0,
+        on_error: 'Callable[[Exception, List[PollEntry]], Any] | None' = None,
+        processors: 'Sequence[BatchProcessor]' = (),
+        retries: 'int' = 3,
+    ) -> 'None':
+        self._batches_written = 0
+        self._component_ids = {}
+        self._queue = queue.SimpleQueue()
+        self._response_body_ids = {}
+        self._rows_dropped = 0
+        self._rows_written = 0
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='poll-writer', daemon=True)
+        self._write_lag = None
+        self.batch_size = batch_size
+        self.engine = engine
+        self.max_delay = max_delay
+        self.on_error = on_error
+        self.processors = processors
+        self.retries = retries
+        self._thread.start()
+
+    def __enter__(self) -> 'PollWriter':
+        return self
+
+    def __exit__(self, *_exc_info) -> 'None':
+        self.close()
+
+    @property
+    def statistics(self) -> 'WriterStatistics':
+        '''Returns a snapshot of the writer's throughput.'''
+        return WriterStatistics(
+            batches_written=self._batches_written,
+            elapsed=time.monotonic() - self._started_at,
+            queue_depth=self._queue.qsize(),
+            rows_dropped=self._rows_dropped,
+            rows_written=self._rows_written,
+            write_lag=self._write_lag,
+        )
+
+    def close(self) -> 'None':
+        '''Flushes all pending entries and stops the writer; idempotent.'''
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def submit(self, poll_entry: 'PollEntry') -> 'None':
+        '''Queues a poll entry to be written; never blocks.'''
+        if not self._thread.is_alive():
+            raise RuntimeError('Writer has been closed.')
+        self._queue.put(_SubmittedPoll.of(poll_entry))
+
+    def _run(self) -> 'None':
+        '''Consumes the queue, writing entries in batches.'''
+        batch, deadline, stopping = [], None, False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            # drain whatever else is already waiting, up to a full batch
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_delay
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch, deadline = [], None
+
+    def _write(self, submitted: 'List[_SubmittedPoll]') -> 'None':
+        '''Commits a batch of entries in a single transaction, retrying on failure with entries built afresh.'''
+        for attempt in range(1, self.retries + 1):
+            batch = [poll.build() for poll in submitted]
+            try:
+                with sqlalchemy.orm.Session(self.engine, expire_on_commit=False) as session:
+                    interned = self._intern_response_bodies(session, batch)
+                    components = self._intern_readiness_components(session, batch)
+                    session.add_all(batch)
+                    session.flush()
+                    for processor in self.processors:
+                        processor(session, batch)
+                    session.commit()
+            except Exception as exception:
+                if attempt < self.retries:
+                    time.sleep(0.5 * attempt)
+                    continue
+                self._rows_dropped += len(batch)
+                if self.on_error is not None:
+                    self.on_error(exception, batch)
+            else:
+                # only remember bodies once they are known to be committed
+                self._response_body_ids.update((digest, body.id) for digest, body in interned.items())
+                self._component_ids.update((name, component.id) for name, component in components.items())
+                self._batches_written += 1
+                self._rows_written += len(batch)
+                polled_at = [poll_entry.created_at for poll_entry in batch if poll_entry.created_at is not None]
+                if polled_at:
+                    committed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+                    self._write_lag = (committed_at - min(polled_at)).total_seconds()
+                return
+
+    def _intern_response_bodies(
+        self,
+        session: 'sqlalchemy.orm.Session',
+        batch: 'List[PollEntry]',
+    ) -> 'Dict[bytes, ResponseBody]':
+        '''Points the response bodies of the entries at existing, identical bodies where possible.
+
+        Only bodies never seen before are left to be inserted. Returns the
+        bodies referenced by the batch, keyed by their digest.
+        '''
+        interned = {}
+        for poll_entry in batch:
+            for attribute in RESPONSE_ATTRIBUTES:
+                body = getattr(poll_entry, attribute)
+                if body is None:
+                    continue
+                if body.digest not in interned:
+                    body_id = self._response_body_ids.get(body.digest)
+                    existing = None if body_id is None else session.get(ResponseBody, body_id)
+                    if existing is None:
+                        stmt = sqlalchemy.select(ResponseBody).where(ResponseBody.digest == body.digest)
+                        existing = session.scalars(stmt).one_or_none()
+                    interned[body.digest] = existing or body
+                setattr(poll_entry, attribute, interned[body.digest])
+        return interned
+
+    def _intern_readiness_components(
+        self,
+        session: 'sqlalchemy.orm.Session',
+        batch: 'List[PollEntry]',
+    ) -> 'Dict[str, ReadinessComponent]':
+        '''Points the readiness results of the entries at the existing components of the same name.
+
+        Only components never seen before are left to be inserted. Returns the
+        components referenced by the batch, keyed by their name.
+        '''
+        interned = {}
+        for poll_entry in batch:
+            for result in poll_entry.readiness_results:
+                name = result.component.name
+                if name not in interned:
+                    component_id = self._component_ids.get(name)
+                    existing = None if component_id is None else session.get(ReadinessComponent, component_id)
+                    if existing is None:
+                        stmt = sqlalchemy.select(ReadinessComponent).where(ReadinessComponent.name == name)
+                        existing = session.scalars(stmt).one_or_none()
+                    interned[name] = existing or result.component
+                result.component = interned[name]
+        return interned
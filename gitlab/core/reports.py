@@ -0,0 +1,424 @@
+import sqlalchemy
+
+from .exports import filter_poll_entries
+from .models import CHECKS, PollEntry, PollRollup, ReadinessComponent, ReadinessResult
+from .rollups import WATERMARK as ROLLUP_WATERMARK
+from .watermarks import read_watermark
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+
+
+@dataclass(frozen=True)
+class ComponentFailures:
+    '''Failures of a component of the readiness check of an instance.'''
+    base_url: 'str'
+    component: 'str'
+    check_count: 'int'
+    failed_count: 'int'
+
+    @property
+    def failure_rate(self) -> 'float':
+        '''Returns the fraction of the checks of the component that failed.'''
+        return self.failed_count / self.check_count if self.check_count else 0.0
+
+
+@dataclass(frozen=True)
+class LatencyPercentiles:
+    '''Percentiles (in milliseconds) of the time taken by a check of an instance.
+
+    Percentiles are nearest-rank, so each is the duration of an actual check.
+    '''
+    base_url: 'str'
+    check: 'str'
+    sample_count: 'int'
+    p50: 'float'
+    p95: 'float'
+    p99: 'float'
+
+
+@dataclass(frozen=True)
+class Outage:
+    '''Represents an uninterrupted run of failed polls of an instance.
+
+    The outage lasts from its first failed poll until the next successful
+    poll, or until its last failed poll if the instance has yet to recover.
+    '''
+    started_at: 'datetime'
+    ended_at: 'datetime'
+    poll_count: 'int'
+    recovered: 'bool'
+
+    @property
+    def duration(self) -> 'timedelta':
+        '''Returns the length of the outage.'''
+        return self.ended_at - self.started_at
+
+
+@dataclass(frozen=True)
+class VersionSpan:
+    '''Represents the period over which an instance reported a version.'''
+    version: 'str'
+    first_seen: 'datetime'
+    last_seen: 'datetime'
+    poll_count: 'int'
+
+
+@dataclass(frozen=True)
+class InstanceReport:
+    '''Uptime statistics of an instance over the reported period.
+
+    An instance is considered available when it passed both its health and
+    readiness checks; polls skipped while it was down count as unavailable.
+
+    Polls that have been pruned are still counted, from the rollups of their
+    whole hours, but are missing from the outage, readiness components and
+    versions, which are only found among the polls kept since `kept_since`.
+    '''
+    base_url: 'str'
+    poll_count: 'int'
+    available_count: 'int'
+    health_check_failed_count: 'int'
+    readiness_check_failed_count: 'int'
+    error_count: 'int'
+    skipped_count: 'int'
+    first_polled_at: 'datetime'
+    last_polled_at: 'datetime'
+    longest_outage: 'Outage | None' = None
+    readiness_components: 'List[ComponentFailures]' = field(default_factory=list)
+    versions: 'List[VersionSpan]' = field(default_factory=list)
+    kept_since: 'datetime | None' = None
+
+    @property
+    def availability(self) -> 'float':
+        '''Returns the fraction of polls during which the instance was available.'''
+        return self.available_count / self.poll_count if self.poll_count else 0.0
+
+    @property
+    def pruned(self) -> 'bool':
+        '''Returns whether some of the polls of the period have been pruned since they were counted.'''
+        return self.kept_since is None or self.kept_since > self.first_polled_at
+
+
+def build_reports(
+    connection: 'Connection',
+    *,
+    base_url: 'str | None' = None,
+    since: 'datetime | None' = None,
+    until: 'datetime | None' = None,
+) -> 'List[InstanceReport]':
+    '''Computes the uptime statistics of every instance polled within the filters, by URL.
+
+    All of the aggregation is done by the database, so only a handful of rows
+    per instance are ever returned, regardless of the number of polls. The
+    counts are summed from the daily and hourly rollups of the whole days and
+    hours of the period, so that only the polls of the partial hours at
+    either end of it (and any not yet folded into the rollups) are read.
+    '''
+    filters = {'base_url': base_url, 'since': since, 'until': until}
+    outages = _longest_outages(connection, filters)
+    components = {}
+    for failures in readiness_component_failures(connection, **filters):
+        components.setdefault(failures.base_url, []).append(failures)
+    versions = _version_spans(connection, filters)
+    kept = dict(connection.execute(filter_poll_entries(
+        sqlalchemy.select(PollEntry.base_url, sqlalchemy.func.min(PollEntry.created_at)).group_by(PollEntry.base_url),
+        **filters,
+    )).all())
+
+    counts = _counts(connection, filters).subquery()
+    stmt = (
+        sqlalchemy.select(
+            counts.c.base_url,
+            sqlalchemy.func.sum(counts.c.poll_count).label('poll_count'),
+            sqlalchemy.func.sum(counts.c.available_count).label('available_count'),
+            sqlalchemy.func.sum(counts.c.health_check_failed_count).label('health_check_failed_count'),
+            sqlalchemy.func.sum(counts.c.readiness_check_failed_count).label('readiness_check_failed_count'),
+            sqlalchemy.func.sum(counts.c.error_count).label('error_count'),
+            sqlalchemy.func.sum(counts.c.skipped_count).label('skipped_count'),
+            sqlalchemy.func.min(counts.c.first_polled_at).label('first_polled_at'),
+            sqlalchemy.func.max(counts.c.last_polled_at).label('last_polled_at'),
+        )
+        .group_by(counts.c.base_url)
+        .order_by(counts.c.base_url)
+    )
+    return [
+        InstanceReport(
+            **row._asdict(),
+            longest_outage=outages.get(row.base_url),
+            readiness_components=components.get(row.base_url, []),
+            versions=versions.get(row.base_url, []),
+            kept_since=kept.get(row.base_url),
+        )
+        for row in connection.execute(stmt)
+    ]
+
+
+def latency_percentiles(
+    connection: 'Connection',
+    *,
+    base_url: 'str | None' = None,
+    since: 'datetime | None' = None,
+    until: 'datetime | None' = None,
+) -> 'List[LatencyPercentiles]':
+    '''Computes the p50, p95 and p99 durations of each check of every instance polled within the filters.
+
+    Results are ordered by URL, then check (as in `CHECKS`). Polls recorded
+    before durations were measured are left out.
+    '''
+    samples = sqlalchemy.union_all(*(
+        filter_poll_entries(
+            sqlalchemy.select(
+                PollEntry.base_url,
+                sqlalchemy.literal(check).label('check'),
+                getattr(PollEntry, f'{check}_duration_ms').label('duration_ms'),
+            )
+            .where(getattr(PollEntry, f'{check}_duration_ms').is_not(None)),
+            base_url=base_url,
+            since=since,
+            until=until,
+        )
+        for check in CHECKS
+    )).subquery()
+    window = {'partition_by': (samples.c.base_url, samples.c.check)}
+    ranked = sqlalchemy.select(
+        samples,
+        sqlalchemy.func.row_number().over(**window, order_by=samples.c.duration_ms).label('rank'),
+        sqlalchemy.func.count().over(**window).label('sample_count'),
+    ).subquery()
+
+    def percentile(p: 'int') -> 'sqlalchemy.ColumnElement':
+        # the nearest-rank percentile is the smallest duration ranked at or above p% of the samples
+        return sqlalchemy.func.min(ranked.c.duration_ms).filter(ranked.c.rank * 100 >= ranked.c.sample_count * p)
+
+    stmt = (
+        sqlalchemy.select(
+            ranked.c.base_url,
+            ranked.c.check,
+            sqlalchemy.func.max(ranked.c.sample_count).label('sample_count'),
+            percentile(50).label('p50'),
+            percentile(95).label('p95'),
+            percentile(99).label('p99'),
+        )
+        .group_by(ranked.c.base_url, ranked.c.check)
+    )
+    order = {check: i for i, check in enumerate(CHECKS)}
+    return sorted(
+        (LatencyPercentiles(**row._asdict()) for row in connection.execute(stmt)),
+        key=lambda percentiles: (percentiles.base_url, order[percentiles.check]),
+    )
+
+
+def readiness_component_failures(
+    connection: 'Connection',
+    *,
+    component: 'str | None' = None,
+    base_url: 'str | None' = None,
+    since: 'datetime | None' = None,
+    until: 'datetime | None' = None,
+) -> 'List[ComponentFailures]':
+    '''Counts the checks and failures of each readiness component of every instance polled within the filters.
+
+    Results are ordered by URL, then component. A `component` selects the
+    components of that name, or of that check across all of its shards
+    (e.g. `gitaly_check` for `gitaly_check[shard=default]`). Polls recorded
+    before readiness components were recorded are left out.
+    '''
+    stmt = filter_poll_entries(
+        sqlalchemy.select(
+            PollEntry.base_url,
+            ReadinessComponent.name.label('component'),
+            sqlalchemy.func.count().label('check_count'),
+            sqlalchemy.func.count().filter(sqlalchemy.not_(ReadinessResult.passed)).label('failed_count'),
+        )
+        .join(ReadinessResult, ReadinessResult.poll_entry_id == PollEntry.id)
+        .join(ReadinessComponent, ReadinessComponent.id == ReadinessResult.component_id)
+        .group_by(PollEntry.base_url, ReadinessComponent.name)
+        .order_by(PollEntry.base_url, ReadinessComponent.name),
+        base_url=base_url,
+        since=since,
+        until=until,
+    )
+    if component is not None:
+        stmt = stmt.where(sqlalchemy.or_(
+            ReadinessComponent.name == component,
+            ReadinessComponent.name.startswith(f'{component}[', autoescape=True),
+        ))
+    return [ComponentFailures(**row._asdict()) for row in connection.execute(stmt)]
+
+
+def _available() -> 'sqlalchemy.ColumnElement':
+    '''Returns whether a poll found its instance available.'''
+    return sqlalchemy.and_(PollEntry.health_check_passed, PollEntry.readiness_check_passed)
+
+
+def _counts(connection: 'Connection', filters: 'Dict') -> 'sqlalchemy.CompoundSelect':
+    '''Selects the counts of the polls of each instance within the filters, as rows to be summed by instance.
+
+    Whole days and hours of the period are counted from their rollups, and the
+    rest from the polls themselves: those of the partial hours at either end,
+    and those beyond the rollup watermark, which are yet to be folded in.
+    '''
+    since, until = filters['since'] or datetime.min, filters['until'] or datetime.max
+    hours = (_ceil(since, 'hour'), _floor(until, 'hour'))
+    days = (_ceil(since, 'day'), _floor(until, 'day'))
+    if hours[0] >= hours[1]: # not a single whole hour
+        hours = days = (since, since)
+    elif days[0] >= days[1]:
+        days = (hours[0], hours[0])
+
+    def rollups(granularity: 'str', start: 'datetime', end: 'datetime') -> 'sqlalchemy.Select':
+        stmt = sqlalchemy.select(
+            PollRollup.base_url,
+            PollRollup.poll_count,
+            PollRollup.available_count,
+            (PollRollup.poll_count - PollRollup.health_check_passed_count).label('health_check_failed_count'),
+            (PollRollup.poll_count - PollRollup.readiness_check_passed_count).label('readiness_check_failed_count'),
+            PollRollup.error_count,
+            PollRollup.skipped_count,
+            PollRollup.first_polled_at,
+            PollRollup.last_polled_at,
+        ).where(PollRollup.granularity == granularity, PollRollup.bucket >= start, PollRollup.bucket < end)
+        if filters['base_url'] is not None:
+            stmt = stmt.where(PollRollup.base_url == filters['base_url'])
+        return stmt
+
+    def count_where(condition: 'sqlalchemy.ColumnElement') -> 'sqlalchemy.ColumnElement':
+        return sqlalchemy.func.count().filter(condition)
+
+    polls = filter_poll_entries(
+        sqlalchemy.select(
+            PollEntry.base_url,
+            sqlalchemy.func.count().label('poll_count'),
+            count_where(_available()).label('available_count'),
+            count_where(sqlalchemy.not_(PollEntry.health_check_passed)).label('health_check_failed_count'),
+            count_where(sqlalchemy.not_(PollEntry.readiness_check_passed)).label('readiness_check_failed_count'),
+            count_where(PollEntry.error_message != '').label('error_count'),
+            count_where(PollEntry.skipped).label('skipped_count'),
+            sqlalchemy.func.min(PollEntry.created_at).label('first_polled_at'),
+            sqlalchemy.func.max(PollEntry.created_at).label('last_polled_at'),
+        )
+        .where(sqlalchemy.or_(
+            PollEntry.created_at < hours[0],
+            PollEntry.created_at >= hours[1],
+            PollEntry.id > read_watermark(connection, ROLLUP_WATERMARK),
+        ))
+        .group_by(PollEntry.base_url),
+        **filters,
+    )
+    return sqlalchemy.union_all(
+        polls,
+        rollups('day', *days),
+        rollups('hour', hours[0], days[0]),
+        rollups('hour', days[1], hours[1]),
+    )
+
+
+def _ceil(timestamp: 'datetime', granularity: 'str') -> 'datetime':
+    '''Returns the start of the first whole hour or day from `timestamp` on.'''
+    floor = _floor(timestamp, granularity)
+    if floor == timestamp or timestamp == datetime.max:
+        return floor
+    return floor + (timedelta(hours=1) if granularity == 'hour' else timedelta(days=1))
+
+
+def _floor(timestamp: 'datetime', granularity: 'str') -> 'datetime':
+    '''Returns the start of the hour or day of `timestamp`.'''
+    floor = timestamp.replace(minute=0, second=0, microsecond=0)
+    return floor if granularity == 'hour' else floor.replace(hour=0)
+
+
+def _longest_outages(connection: 'Connection', filters: 'Dict') -> 'Dict[str, Outage]':
+    '''Finds the longest outage of each instance.
+
+    Polls are numbered by the count of available polls preceding them (the
+    classic "gaps and islands" technique), so that each run of failed polls
+    shares a number and may be grouped on it.
+    '''
+    order = (PollEntry.created_at, PollEntry.id)
+    available = sqlalchemy.cast(_available(), sqlalchemy.Integer)
+    polls = filter_poll_entries(
+        sqlalchemy.select(
+            PollEntry.base_url,
+            PollEntry.created_at,
+            available.label('available'),
+            sqlalchemy.func.sum(available)
+                .over(partition_by=PollEntry.base_url, order_by=order, rows=(None, 0))
+                .label('run'),
+            sqlalchemy.func.lead(PollEntry.created_at, type_=sqlalchemy.DateTime)
+                .over(partition_by=PollEntry.base_url, order_by=order)
+                .label('next_polled_at'),
+        ),
+        **filters,
+    ).subquery()
+
+    started_at = sqlalchemy.func.min(polls.c.created_at)
+    last_failed_at = sqlalchemy.func.max(polls.c.created_at)
+    # the poll following the last failure of a run is, by construction, the recovery; unless the
+    # run includes the latest poll of the instance (the only one without a next poll)
+    recovered_at = sqlalchemy.case(
+        (
+            sqlalchemy.func.count(polls.c.next_polled_at) == sqlalchemy.func.count(),
+            sqlalchemy.func.max(polls.c.next_polled_at),
+        ),
+        else_=None,
+    )
+    ended_at = sqlalchemy.func.coalesce(recovered_at, last_failed_at)
+    duration = sqlalchemy.func.julianday(ended_at) - sqlalchemy.func.julianday(started_at)
+    runs = (
+        sqlalchemy.select(
+            polls.c.base_url,
+            started_at.label('started_at'),
+            ended_at.label('ended_at'),
+            sqlalchemy.func.count().label('poll_count'),
+            (recovered_at.is_not(None)).label('recovered'),
+            sqlalchemy.func.row_number().over(
+                partition_by=polls.c.base_url,
+                order_by=(duration.desc(), started_at),
+            ).label('rank'),
+        )
+        .where(polls.c.available == 0)
+        .group_by(polls.c.base_url, polls.c.run)
+        .subquery()
+    )
+    stmt = sqlalchemy.select(runs).where(runs.c.rank == 1)
+    return {
+        row.base_url: Outage(
+            started_at=row.started_at,
+            ended_at=row.ended_at,
+            poll_count=row.poll_count,
+            recovered=bool(row.recovered),
+        )
+        for row in connection.execute(stmt)
+    }
+
+
+def _version_spans(connection: 'Connection', filters: 'Dict') -> 'Dict[str, List[VersionSpan]]':
+    '''Finds the versions reported by each instance, in the order they were first seen.'''
+    first_seen = sqlalchemy.func.min(PollEntry.created_at)
+    stmt = filter_poll_entries(
+        sqlalchemy.select(
+            PollEntry.base_url,
+            PollEntry.instance_version,
+            first_seen.label('first_seen'),
+            sqlalchemy.func.max(PollEntry.created_at).label('last_seen'),
+            sqlalchemy.func.count().label('poll_count'),
+        )
+        # polls that failed to fetch the metadata have no version
+        .where(PollEntry.instance_version != '')
+        .group_by(PollEntry.base_url, PollEntry.instance_version)
+        .order_by(PollEntry.base_url, first_seen),
+        **filters,
+    )
+    versions = {}
+    for row in connection.execute(stmt):
+        versions.setdefault(row.base_url, []).append(VersionSpan(
+            version=row.instance_version,
+            first_seen=row.first_seen,
+            last_seen=row.last_seen,
+            poll_count=row.poll_count,
+        ))
+    return versions
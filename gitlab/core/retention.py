@@ -0,0 +1,258 @@
+import sqlalchemy
+
+from .models import PollEntry, ReadinessComponent, ReadinessResult, ResponseBody, Watermark
+from .rollups import WATERMARK as ROLLUP_WATERMARK
+from .states import WATERMARK as STATE_WATERMARK
+from .transitions import WATERMARK as TRANSITION_WATERMARK
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterable, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+
+
+ARCHIVE_SCHEMA = 'archive'
+# incremental processes that must have seen a poll before it may be deleted
+_WATERMARKS = (ROLLUP_WATERMARK, STATE_WATERMARK, TRANSITION_WATERMARK)
+
+
+@dataclass(frozen=True)
+class RetentionRule:
+    '''Keeps the polls of an instance for `keep_days` days.
+
+    A rule without a `base_url` applies to every instance without a rule of
+    its own.
+    '''
+    keep_days: 'float'
+    base_url: 'str | None' = None
+
+    def cutoff(self, now: 'datetime') -> 'datetime':
+        '''Returns the time before which polls are no longer kept.'''
+        return now - timedelta(days=self.keep_days)
+
+
+def archive_path(database: 'Path', month: 'str', directory: 'Path | None' = None) -> 'Path':
+    '''Returns the path of the archive of the given month (YYYY-MM) of a database.'''
+    return (directory or database.parent) / f'{database.stem}-{month}{database.suffix}'
+
+
+def prune_poll_entries(
+    engine: 'sqlalchemy.Engine',
+    rules: 'Iterable[RetentionRule]',
+    now: 'datetime',
+    *,
+    archive_directory: 'Path | None' = None,
+    batch_size: 'int' = 10000,
+    initialise_archive: 'Callable[[str], None] | None' = None,
+    on_batch: 'Callable[[int], None] | None' = None,
+) -> 'int':
+    '''Deletes the polls that have outlived the retention rules, returning the number deleted.
+
+    Polls are deleted in batches, each in its own short transaction, so that a
+    concurrent poller is never locked out for long. Only polls already folded
+    into the rollups and latest states, and compared for state transitions,
+    are deleted; their summaries, states and transitions outlive them.
+
+    If an `archive_directory` is given, each batch is first copied (with the
+    response bodies it references) into the archive file of its month, which
+    is created by `initialise_archive` if it does not exist yet. Copies are
+    idempotent, so an interrupted run may simply be repeated.
+    '''
+    rules = list(rules)
+    with engine.connect() as connection:
+        # never delete a poll before it is summarised in the rollups and latest states, and its transitions are recorded
+        watermarks = connection.execute(
+            sqlalchemy.select(Watermark.poll_entry_id)
+            .where(Watermark.name.in_(_WATERMARKS))
+        ).scalars().all()
+    if len(watermarks) < len(_WATERMARKS):
+        return 0
+    folded = min(watermarks)
+
+    deleted = 0
+
+    def report_progress(count: 'int') -> 'None':
+        if on_batch is not None:
+            on_batch(deleted + count)
+
+    for condition in _expired(rules, now):
+        if archive_directory is None:
+            deleted += _delete_in_batches(engine, condition, folded, batch_size, report_progress)
+            continue
+        database = Path(engine.url.database)
+        for month in _months(engine, sqlalchemy.and_(condition, PollEntry.id <= folded)):
+            path = archive_path(database, month, archive_directory)
+            if not path.exists() and initialise_archive is not None:
+                initialise_archive(f'sqlite:///{path.as_posix()}')
+            in_month = sqlalchemy.and_(condition, _month() == month)
+            deleted += _delete_in_batches(engine, in_month, folded, batch_size, report_progress, archive=path)
+    return deleted
+
+
+def reclaim_space(engine: 'sqlalchemy.Engine', *, pages: 'int' = 1000) -> 'int | None':
+    '''Returns the free pages of an incrementally vacuumed database to the file system.
+
+    Pages are released a bounded number at a time, so that concurrent writers
+    are only ever held up briefly. Returns the number of pages released, or
+    `None` if the database is not incrementally vacuumed (see
+    `enable_incremental_vacuum`).
+    '''
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+            return None
+        initially_free = free = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        while free > 0:
+            connection.exec_driver_sql(f'PRAGMA incremental_vacuum({min(free, pages)})')
+            remaining = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+            if remaining >= free: # e.g. held back by a concurrent reader
+                break
+            free = remaining
+        return initially_free - free
+
+
+def enable_incremental_vacuum(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Switches an existing database to incremental vacuuming.
+
+    This rewrites the whole database once, during which it is locked and needs
+    as much free disk space again; databases created since are incrementally
+    vacuumed from the start.
+    '''
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+
+
+def remove_orphaned_response_bodies(engine: 'sqlalchemy.Engine') -> 'int':
+    '''Deletes the response bodies no longer referenced by any poll, returning the number deleted.'''
+    referenced = sqlalchemy.union(
+        sqlalchemy.select(PollEntry.health_check_response_id.label('id')),
+        sqlalchemy.select(PollEntry.readiness_check_response_id),
+        sqlalchemy.select(PollEntry.metadata_response_id),
+    ).subquery()
+    # the referenced ids are gathered in one pass, rather than probing the polls once per body
+    stmt = sqlalchemy.delete(ResponseBody).where(ResponseBody.id.not_in(
+        sqlalchemy.select(referenced.c.id).where(referenced.c.id.is_not(None))
+    ))
+    with engine.begin() as connection:
+        return connection.execute(stmt).rowcount
+
+
+def _copy_to_archive(connection: 'Connection', condition: 'sqlalchemy.ColumnElement') -> 'None':
+    '''Copies the polls matching the condition, and the bodies and readiness results they reference, into the attached archive.'''
+    poll_entry = PollEntry.__table__
+    readiness_component = ReadinessComponent.__table__
+    readiness_result = ReadinessResult.__table__
+    response_body = ResponseBody.__table__
+    archived = sqlalchemy.MetaData()
+    archived_poll_entry = poll_entry.to_metadata(archived, schema=ARCHIVE_SCHEMA)
+    archived_readiness_component = readiness_component.to_metadata(archived, schema=ARCHIVE_SCHEMA)
+    archived_readiness_result = readiness_result.to_metadata(archived, schema=ARCHIVE_SCHEMA)
+    archived_response_body = response_body.to_metadata(archived, schema=ARCHIVE_SCHEMA)
+
+    referenced = sqlalchemy.union(*(
+        sqlalchemy.select(column).where(condition, column.is_not(None))
+        for column in (
+            poll_entry.c.health_check_response_id,
+            poll_entry.c.readiness_check_response_id,
+            poll_entry.c.metadata_response_id,
+        )
+    )).subquery()
+    connection.execute(
+        sqlalchemy.insert(archived_response_body)
+        .from_select(response_body.c.keys(), sqlalchemy.select(response_body).where(response_body.c.id.in_(
+            sqlalchemy.select(referenced.c[0])
+        )))
+        .prefix_with('OR IGNORE')
+    )
+    connection.execute(
+        sqlalchemy.insert(archived_poll_entry)
+        .from_select(poll_entry.c.keys(), sqlalchemy.select(poll_entry).where(condition))
+        .prefix_with('OR IGNORE')
+    )
+    # components are few, so all of them are copied, keeping their ids
+    connection.execute(
+        sqlalchemy.insert(archived_readiness_component)
+        .from_select(readiness_component.c.keys(), sqlalchemy.select(readiness_component))
+        .prefix_with('OR IGNORE')
+    )
+    connection.execute(
+        sqlalchemy.insert(archived_readiness_result)
+        .from_select(readiness_result.c.keys(), sqlalchemy.select(readiness_result).where(
+            readiness_result.c.poll_entry_id.in_(sqlalchemy.select(poll_entry.c.id).where(condition))
+        ))
+        .prefix_with('OR IGNORE')
+    )
+
+
+def _delete_in_batches(
+    engine: 'sqlalchemy.Engine',
+    condition: 'sqlalchemy.ColumnElement',
+    high: 'int',
+    batch_size: 'int',
+    on_batch: 'Callable[[int], None]',
+    *,
+    archive: 'Path | None' = None,
+) -> 'int':
+    '''Deletes the polls matching the condition, with ids up to `high`, a batch at a time.
+
+    The polls are archived first if requested. Each batch is the matching
+    polls within a range of ids, so that every statement is a bounded range
+    scan of the primary key, and no poll is looked at twice.
+    '''
+    deleted = 0
+    low = 0
+    with engine.connect() as connection:
+        if archive is not None:
+            connection.exec_driver_sql(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (archive.as_posix(),))
+            connection.commit()
+        try:
+            while low < high:
+                with connection.begin():
+                    remaining = sqlalchemy.and_(condition, PollEntry.id > low, PollEntry.id <= high)
+                    last_id = connection.scalar(
+                        sqlalchemy.select(PollEntry.id).where(remaining).order_by(PollEntry.id)
+                        .offset(batch_size - 1).limit(1)
+                    )
+                    if last_id is None: # the final, partial batch
+                        last_id = high
+                    batch = sqlalchemy.and_(condition, PollEntry.id > low, PollEntry.id <= last_id)
+                    if archive is not None:
+                        _copy_to_archive(connection, batch)
+                    connection.execute(
+                        sqlalchemy.delete(ReadinessResult)
+                        .where(ReadinessResult.poll_entry_id.in_(sqlalchemy.select(PollEntry.id).where(batch)))
+                    )
+                    count = connection.execute(sqlalchemy.delete(PollEntry).where(batch)).rowcount
+                deleted += count
+                low = last_id
+                if count:
+                    on_batch(deleted)
+        finally:
+            if archive is not None:
+                connection.exec_driver_sql(f'DETACH DATABASE {ARCHIVE_SCHEMA}')
+                connection.commit()
+    return deleted
+
+
+def _expired(rules: 'List[RetentionRule]', now: 'datetime') -> 'List[sqlalchemy.ColumnElement]':
+    '''Returns a condition selecting the expired polls of each rule.'''
+    urls = [rule.base_url for rule in rules if rule.base_url is not None]
+    conditions = []
+    for rule in rules:
+        scope = PollEntry.base_url.not_in(urls) if rule.base_url is None else PollEntry.base_url == rule.base_url
+        conditions.append(sqlalchemy.and_(scope, PollEntry.created_at < rule.cutoff(now)))
+    return conditions
+
+
+def _month() -> 'sqlalchemy.ColumnElement':
+    '''Returns the month (YYYY-MM) of a poll; robust to timestamps stored with or without fractions.'''
+    return sqlalchemy.func.strftime('%Y-%m', PollEntry.created_at)
+
+
+def _months(engine: 'sqlalchemy.Engine', condition: 'sqlalchemy.ColumnElement') -> 'List[str]':
+    '''Returns the months (YYYY-MM) of the polls matching the condition, oldest first.'''
+    month = _month()
+    with engine.connect() as connection:
+        return connection.scalars(sqlalchemy.select(month).where(condition).distinct().order_by(month)).all()
@@ -0,0 +1,165 @@
+import sqlalchemy
+
+from .models import CHECKS, PollEntry, PollRollup
+from .watermarks import CATCH_UP_LIMIT, advance_watermark, backlog, pending_range
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert
+from typing import List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+    from sqlalchemy.orm import Session
+
+
+GRANULARITIES = {
+    'day': '%Y-%m-%d 00:00:00',
+    'hour': '%Y-%m-%d %H:00:00',
+}
+WATERMARK = 'poll_rollup'
+
+
+def rollup_backlog(connection: 'Connection') -> 'int':
+    '''Returns the span of poll entry ids yet to be folded into the rollups.'''
+    return backlog(connection, WATERMARK)
+
+
+def fold_rollups(connection: 'Connection', *, limit: 'int | None' = None) -> 'int':
+    '''Folds the poll entries beyond the rollup watermark into the rollups.
+
+    At most `limit` entries are folded, so that a large backlog may be worked
+    through in bounded steps. The rollups and the watermark are updated in the
+    transaction of `connection`, so a step is either wholly applied or not at
+    all. Returns the number of entries folded.
+    '''
+    watermark, high = pending_range(connection, WATERMARK, limit=limit)
+    if high <= watermark:
+        return 0
+
+    folded = 0
+    for granularity, bucket_format in GRANULARITIES.items():
+        rows = connection.execute(_aggregate(bucket_format, watermark, high)).all()
+        if rows:
+            connection.execute(_upsert(), [
+                {
+                    **row._asdict(),
+                    'granularity': granularity,
+                    'bucket': datetime.fromisoformat(row.bucket),
+                }
+                for row in rows
+            ])
+            folded = sum(row.poll_count for row in rows)
+
+    advance_watermark(connection, WATERMARK, high)
+    return folded
+
+
+def fold_rollups_on_write(session: 'Session', batch: 'List[PollEntry]') -> 'None':
+    '''Folds a freshly written batch into the rollups; intended as a `PollWriter` processor.
+
+    Any backlog (e.g. polls written before the rollups existed) is caught up
+    on a little at a time, so that no single write is held up for long.
+    '''
+    fold_rollups(session.connection(), limit=len(batch) + CATCH_UP_LIMIT)
+
+
+def _aggregate(bucket_format: 'str', low: 'int', high: 'int') -> 'sqlalchemy.Select':
+    '''Aggregates the poll entries with ids in (`low`, `high`] into buckets of the given format.'''
+    bucket = sqlalchemy.func.strftime(bucket_format, PollEntry.created_at)
+    version = sqlalchemy.func.nullif(PollEntry.instance_version, '')
+    # polls without a version (i.e. failed metadata fetches) sort last, and never win a bucket's version;
+    # the others are ordered by when they were polled, as imported polls may be recorded out of order
+    unversioned = PollEntry.instance_version == ''
+    entries = (
+        sqlalchemy.select(
+            PollEntry.base_url,
+            bucket.label('bucket'),
+            PollEntry.created_at,
+            sqlalchemy.and_(PollEntry.health_check_passed, PollEntry.readiness_check_passed).label('available'),
+            PollEntry.health_check_passed,
+            PollEntry.readiness_check_passed,
+            (PollEntry.error_message != '').label('errored'),
+            PollEntry.skipped,
+            *(getattr(PollEntry, f'{check}_duration_ms') for check in CHECKS),
+            sqlalchemy.func.first_value(version).over(
+                partition_by=(PollEntry.base_url, bucket),
+                order_by=(unversioned, PollEntry.created_at, PollEntry.id),
+            ).label('first_version'),
+            sqlalchemy.func.first_value(version).over(
+                partition_by=(PollEntry.base_url, bucket),
+                order_by=(unversioned, PollEntry.created_at.desc(), PollEntry.id.desc()),
+            ).label('last_version'),
+        )
+        .where(PollEntry.id > low, PollEntry.id <= high)
+        .subquery()
+    )
+    def count_true(column: 'sqlalchemy.ColumnElement') -> 'sqlalchemy.ColumnElement':
+        return sqlalchemy.func.sum(sqlalchemy.cast(column, sqlalchemy.Integer))
+
+    return (
+        sqlalchemy.select(
+            entries.c.base_url,
+            entries.c.bucket,
+            sqlalchemy.func.count().label('poll_count'),
+            count_true(entries.c.available).label('available_count'),
+            count_true(entries.c.health_check_passed).label('health_check_passed_count'),
+            count_true(entries.c.readiness_check_passed).label('readiness_check_passed_count'),
+            count_true(entries.c.errored).label('error_count'),
+            count_true(entries.c.skipped).label('skipped_count'),
+            sqlalchemy.func.max(entries.c.first_version).label('first_version'),
+            sqlalchemy.func.max(entries.c.last_version).label('last_version'),
+            sqlalchemy.func.min(entries.c.created_at).label('first_polled_at'),
+            sqlalchemy.func.max(entries.c.created_at).label('last_polled_at'),
+            *(
+                column
+                for check in CHECKS
+                for column in (
+                    # total() sums to 0.0 rather than null when no duration was measured
+                    sqlalchemy.func.total(entries.c[f'{check}_duration_ms']).label(f'{check}_duration_ms_sum'),
+                    sqlalchemy.func.count(entries.c[f'{check}_duration_ms']).label(f'{check}_duration_count'),
+                )
+            ),
+        )
+        .group_by(entries.c.base_url, entries.c.bucket)
+    )
+
+
+def _upsert() -> 'sqlalchemy.Insert':
+    '''Inserts a rollup, or merges it into the existing rollup of the same bucket.
+
+    The versions of the bucket are only replaced by those of polls made before
+    its first, or after its last poll; e.g. polls imported after the fact
+    leave the versions of the polls made around them as they are.
+    '''
+    stmt = insert(PollRollup)
+    excluded = stmt.excluded
+    sums = (
+        'poll_count',
+        'available_count',
+        'health_check_passed_count',
+        'readiness_check_passed_count',
+        'error_count',
+        'skipped_count',
+        *(f'{check}_duration_{measure}' for check in CHECKS for measure in ('ms_sum', 'count')),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[PollRollup.base_url, PollRollup.granularity, PollRollup.bucket],
+        set_={
+            **{column: getattr(PollRollup, column) + excluded[column] for column in sums},
+            'first_version': sqlalchemy.case(
+                (
+                    excluded.first_polled_at < PollRollup.first_polled_at,
+                    sqlalchemy.func.coalesce(excluded.first_version, PollRollup.first_version),
+                ),
+                else_=sqlalchemy.func.coalesce(PollRollup.first_version, excluded.first_version),
+            ),
+            'last_version': sqlalchemy.case(
+                (
+                    excluded.last_polled_at >= PollRollup.last_polled_at,
+                    sqlalchemy.func.coalesce(excluded.last_version, PollRollup.last_version),
+                ),
+                else_=sqlalchemy.func.coalesce(PollRollup.last_version, excluded.last_version),
+            ),
+            'first_polled_at': sqlalchemy.func.min(PollRollup.first_polled_at, excluded.first_polled_at),
+            'last_polled_at': sqlalchemy.func.max(PollRollup.last_polled_at, excluded.last_polled_at),
+        },
+    )
@@ -0,0 +1,129 @@
+import asyncio
+
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+@dataclass
+class JobStatistics:
+    '''Bookkeeping for a single scheduled job.'''
+    ticks: 'int' = 0
+    missed_ticks: 'int' = 0
+    failed_ticks: 'int' = 0
+    last_duration: 'float' = 0.0
+
+
+class FixedRateScheduler:
+    '''Runs jobs on a fixed-rate schedule with bounded concurrency.
+
+    Every job is anchored to the monotonic clock of the running event loop, so
+    a job's cadence does not drift with the time it takes to run. Ticks that
+    cannot be serviced in time (e.g. when the concurrency limit is saturated)
+    are skipped and counted as missed, rather than queued up as a burst.
+
+    A job may adapt its own cadence by returning the interval until its next
+    tick; any other return value keeps the interval it was scheduled with. A
+    job raising an exception is reported to `on_error`, and keeps its schedule.
+    '''
+    _semaphore: 'asyncio.Semaphore'
+    _stopped: 'asyncio.Event'
+    _tasks: 'Dict[Hashable, asyncio.Task]'
+    on_error: 'Callable[[Hashable, Exception], Any] | None'
+    on_missed_ticks: 'Callable[[Hashable, int], Any] | None'
+    statistics: 'Dict[Hashable, JobStatistics]'
+
+    def __init__(
+        self,
+        concurrency: 'int',
+        *,
+        on_error: 'Callable[[Hashable, Exception], Any] | None' = None,
+        on_missed_ticks: 'Callable[[Hashable, int], Any] | None' = None,
+    ) -> 'None':
+        if concurrency < 1:
+            raise ValueError('Concurrency must be at least 1.')
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._stopped = asyncio.Event()
+        self._tasks = {}
+        self.on_error = on_error
+        self.on_missed_ticks = on_missed_ticks
+        self.statistics = {}
+
+    @property
+    def missed_ticks(self) -> 'int':
+        '''Returns the total number of missed ticks across all jobs.'''
+        return sum(statistics.missed_ticks for statistics in self.statistics.values())
+
+    def cancel(self, key: 'Hashable') -> 'None':
+        '''Cancels a scheduled job, if scheduled; its statistics are kept, and carried on should it be scheduled again.'''
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def schedule(
+        self,
+        key: 'Hashable',
+        interval: 'float',
+        job: 'Callable[[], Awaitable[Any]]',
+        *,
+        offset: 'float' = 0.0,
+    ) -> 'None':
+        '''Schedules `job` to run every `interval` seconds (or as it returns), starting `offset` seconds from now.'''
+        if interval <= 0:
+            raise ValueError('Interval must be positive.')
+        if key in self._tasks:
+            raise ValueError(f'Job already scheduled: {key}')
+        self.statistics.setdefault(key, JobStatistics())
+        self._tasks[key] = asyncio.create_task(self._run_job(key, interval, job, offset))
+
+    async def run(self) -> 'None':
+        '''Runs the scheduled jobs, including those scheduled later on, until stopped or cancelled.'''
+        try:
+            await self._stopped.wait()
+        finally:
+            await self.stop()
+
+    async def stop(self) -> 'None':
+        '''Cancels all scheduled jobs and waits for them to unwind, returning from `run`.'''
+        self._stopped.set()
+        tasks, self._tasks = list(self._tasks.values()), {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_job(
+        self,
+        key: 'Hashable',
+        interval: 'float',
+        job: 'Callable[[], Awaitable[Any]]',
+        offset: 'float',
+    ) -> 'None':
+        '''Runs a single job forever on its fixed-rate schedule.'''
+        loop = asyncio.get_running_loop()
+        statistics = self.statistics[key]
+        due = loop.time() + offset
+
+        while True:
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            async with self._semaphore:
+                started = loop.time()
+                try:
+                    result = await job()
+                except Exception as exception:
+                    result = None
+                    statistics.failed_ticks += 1
+                    if self.on_error is not None:
+                        self.on_error(key, exception)
+                statistics.last_duration = loop.time() - started
+            statistics.ticks += 1
+            tick_interval = result if isinstance(result, (int, float)) and result > 0 else interval
+
+            # anchor the next tick to the schedule, not to when this tick finished;
+            # a late tick still runs once, but wholly elapsed ticks are dropped
+            due += tick_interval
+            lateness = loop.time() - due
+            if lateness >= tick_interval:
+                missed = int(lateness // tick_interval)
+                due += missed * tick_interval
+                statistics.missed_ticks += missed
+                if self.on_missed_ticks is not None:
+                    self.on_missed_ticks(key, missed)
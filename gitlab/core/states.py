@@ -0,0 +1,146 @@
+import sqlalchemy
+
+from .models import LatestState, PollEntry
+from .watermarks import CATCH_UP_LIMIT, advance_watermark, backlog, pending_range
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert
+from typing import Any, Dict, Iterable, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+    from sqlalchemy.orm import Session
+
+
+WATERMARK = 'latest_state'
+# columns of the latest state, as listed by `latest_states`
+_STATE_COLUMNS = (
+    LatestState.base_url,
+    LatestState.polled_at,
+    LatestState.health_check_passed,
+    LatestState.readiness_check_passed,
+    LatestState.instance_version,
+    LatestState.last_success_at,
+    LatestState.last_failure_at,
+    LatestState.consecutive_failures,
+)
+
+
+@dataclass(frozen=True)
+class InstanceState:
+    '''Represents the current state of an instance, as of its latest poll; see `LatestState`.'''
+    base_url: 'str'
+    polled_at: 'datetime'
+    health_check_passed: 'bool'
+    readiness_check_passed: 'bool'
+    instance_version: 'str'
+    last_success_at: 'datetime | None'
+    last_failure_at: 'datetime | None'
+    consecutive_failures: 'int'
+
+    @property
+    def available(self) -> 'bool':
+        '''Returns whether the latest poll passed both the health and readiness checks.'''
+        return self.health_check_passed and self.readiness_check_passed
+
+
+def state_backlog(connection: 'Connection') -> 'int':
+    '''Returns the span of poll entry ids yet to be folded into the latest states.'''
+    return backlog(connection, WATERMARK)
+
+
+def update_latest_states(connection: 'Connection', *, limit: 'int | None' = None) -> 'int':
+    '''Folds the poll entries beyond the latest state watermark into the latest states of their instances.
+
+    At most `limit` entries are folded, and the states and the watermark are
+    updated in the transaction of `connection`, as with `fold_rollups`. Polls
+    older than the state of their instance (e.g. recorded out of order) leave
+    it as it is. Returns the number of instances updated.
+    '''
+    watermark, high = pending_range(connection, WATERMARK, limit=limit)
+    if high <= watermark:
+        return 0
+
+    polls = connection.execute(
+        sqlalchemy.select(
+            PollEntry.id,
+            PollEntry.base_url,
+            PollEntry.created_at,
+            PollEntry.health_check_passed,
+            PollEntry.readiness_check_passed,
+            PollEntry.instance_version,
+        )
+        .where(PollEntry.id > watermark, PollEntry.id <= high, sqlalchemy.not_(PollEntry.skipped))
+        .order_by(PollEntry.id)
+    ).all()
+    states = _load_states(connection, {poll.base_url for poll in polls})
+    updated = {}
+    for poll in polls:
+        state = states.get(poll.base_url)
+        if state is None:
+            state = states[poll.base_url] = {
+                'base_url': poll.base_url,
+                'instance_version': '',
+                'last_success_at': None,
+                'last_failure_at': None,
+                'consecutive_failures': 0,
+            }
+        elif poll.created_at < state['polled_at']:
+            continue
+        state.update({
+            'poll_entry_id': poll.id,
+            'polled_at': poll.created_at,
+            'health_check_passed': bool(poll.health_check_passed),
+            'readiness_check_passed': bool(poll.readiness_check_passed),
+            # polls without a version (i.e. failed metadata fetches) say nothing of the version
+            'instance_version': poll.instance_version or state['instance_version'],
+        })
+        if poll.health_check_passed and poll.readiness_check_passed:
+            state['last_success_at'] = poll.created_at
+            state['consecutive_failures'] = 0
+        else:
+            state['last_failure_at'] = poll.created_at
+            state['consecutive_failures'] += 1
+        updated[poll.base_url] = state
+    if updated:
+        stmt = insert(LatestState)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[LatestState.base_url],
+                set_={
+                    column.name: stmt.excluded[column.name]
+                    for column in LatestState.__table__.columns
+                    if not column.primary_key
+                },
+            ),
+            list(updated.values()),
+        )
+
+    advance_watermark(connection, WATERMARK, high)
+    return len(updated)
+
+
+def update_latest_states_on_write(session: 'Session', batch: 'List[PollEntry]') -> 'None':
+    '''Updates the latest states with a freshly written batch; intended as a `PollWriter` processor.
+
+    Any backlog (e.g. polls written before the latest states were kept) is
+    caught up on a little at a time, as with `fold_rollups_on_write`.
+    '''
+    update_latest_states(session.connection(), limit=len(batch) + CATCH_UP_LIMIT)
+
+
+def latest_states(connection: 'Connection', *, base_url: 'str | None' = None) -> 'List[InstanceState]':
+    '''Lists the current state of every instance (or just one), by URL.
+
+    States are read from a row per instance, however many polls were made.
+    '''
+    stmt = sqlalchemy.select(*_STATE_COLUMNS).order_by(LatestState.base_url)
+    if base_url is not None:
+        stmt = stmt.where(LatestState.base_url == base_url)
+    return [InstanceState(**row._mapping) for row in connection.execute(stmt)]
+
+
+def _load_states(connection: 'Connection', base_urls: 'Iterable[str]') -> 'Dict[str, Dict[str, Any]]':
+    '''Loads the latest states of the instances, as the values of their rows.'''
+    stmt = sqlalchemy.select(LatestState.__table__).where(LatestState.base_url.in_(list(base_urls)))
+    return {row.base_url: dict(row._mapping) for row in connection.execute(stmt)}
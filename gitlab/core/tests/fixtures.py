@@ -1,7 +1,9 @@
 import pytest
+import sqlalchemy
 import uuid
 
-from .. import GitLabClient
+from .. import AsyncGitLabClient, Base, GitLabClient, create_engine
+from pathlib import Path
 
 
 @pytest.fixture
@@ -9,11 +11,24 @@ def access_token() -> 'str':
     '''UUID string as an access token.'''
     yield str(uuid.uuid4())
 
+@pytest.fixture
+def async_client(access_token: 'str', instance_url: 'str') -> 'AsyncGitLabClient':
+    '''Asynchronous GitLab client.'''
+    yield AsyncGitLabClient(access_token, instance_url)
+
 @pytest.fixture
 def client(access_token: 'str', instance_url: 'str') -> 'GitLabClient':
     '''GitLab client.'''
     yield GitLabClient(access_token, instance_url)
 
+@pytest.fixture
+def engine(tmp_path: 'Path') -> 'sqlalchemy.Engine':
+    '''Engine for an initialised, temporary database.'''
+    engine = create_engine(f'sqlite:///{(tmp_path / "polls.db").as_posix()}')
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
 @pytest.fixture
 def instance_url() -> 'str':
     '''GitLab instance URL.'''
@@ -0,0 +1,134 @@
+from .fixtures import * # import to initialise fixtures
+
+import asyncio
+import re
+
+from .. import AsyncGitLabClient, HttpRequestException, MetadataCache, TransportOptions
+from .patches import patched_client_context
+from http import HTTPStatus
+from httpx import Response
+from unittest import mock
+
+
+def test_health_check(async_client: 'AsyncGitLabClient') -> 'None':
+    '''Health check.'''
+    code, body = HTTPStatus.OK, 'GitLab OK'
+    with patched_client_context(async_client._client, 'get', code, text_body=body):
+        retval = asyncio.run(async_client.health_check())
+        assert retval == body
+
+
+def test_readiness_check(async_client: 'AsyncGitLabClient') -> 'None':
+    '''Readiness check.'''
+    code, body = HTTPStatus.OK, {'status': 'ok', 'master_check': [{'status': 'ok'}]}
+    with patched_client_context(async_client._client, 'get', code, json_body=body):
+        retval = asyncio.run(async_client.readiness_check())
+        assert retval == body
+
+
+def test_failing_readiness_check(async_client: 'AsyncGitLabClient') -> 'None':
+    '''Readiness check with a failing status value.'''
+    code, body = HTTPStatus.OK, {'status': 'failed', 'master_check': [{'status': 'ok'}]}
+    with patched_client_context(async_client._client, 'get', code, json_body=body):
+        with pytest.raises(
+            HttpRequestException,
+            match=re.compile(r'failed readiness check', re.IGNORECASE),
+        ):
+            asyncio.run(async_client.readiness_check())
+
+
+def test_fetch_metadata(async_client: 'AsyncGitLabClient') -> 'None':
+    '''Fetch instance metadata.'''
+    code, body = HTTPStatus.OK, {'version': '16.6.1-ee', 'revision': '9aa991a5ee9'}
+    with patched_client_context(async_client._client, 'get', code, json_body=body):
+        retval = asyncio.run(async_client.fetch_metadata())
+        assert retval == body
+
+
+def test_unparseable_fetch_metadata_response(async_client: 'AsyncGitLabClient') -> 'None':
+    '''Fetch instance metadata with unparseable response body.'''
+    code, body = HTTPStatus.OK, 'not valid json'
+    with patched_client_context(async_client._client, 'get', code, text_body=body):
+        with pytest.raises(
+            HttpRequestException,
+            match=re.compile(r'failed to decode response', re.IGNORECASE),
+        ):
+            asyncio.run(async_client.fetch_metadata())
+
+
+def test_unauthorised_fetch_metadata_response(async_client: 'AsyncGitLabClient') -> 'None':
+    '''Fetch instance metadata without sufficient authorisation.'''
+    code, body = HTTPStatus.UNAUTHORIZED, { 'error': 'insufficient_scope' }
+    with patched_client_context(async_client._client, 'get', code, json_body=body):
+        with pytest.raises(
+            HttpRequestException,
+            match=re.compile(r'expected one of http \(200,\)', re.IGNORECASE),
+        ):
+            asyncio.run(async_client.fetch_metadata())
+
+
+def test_checks_run_concurrently(async_client: 'AsyncGitLabClient') -> 'None':
+    '''All checks are in flight at once when gathered.'''
+    delay, in_flight, peak = 0.05, 0, 0
+
+    async def slow_get(url: 'str', **_kwargs) -> 'Response':
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(delay)
+        in_flight -= 1
+        if url.endswith('/-/health'):
+            return Response(HTTPStatus.OK, text='GitLab OK')
+        return Response(HTTPStatus.OK, json={'status': 'ok', 'version': '16.6.1-ee'})
+
+    async def gather_checks() -> 'None':
+        await asyncio.gather(
+            async_client.health_check(),
+            async_client.readiness_check(),
+            async_client.fetch_metadata(),
+        )
+
+    with mock.patch.object(async_client._client, 'get', side_effect=slow_get):
+        asyncio.run(gather_checks())
+    assert peak == 3
+
+
+def test_transport_options(access_token: 'str', instance_url: 'str') -> 'None':
+    '''Transport options configure the timeouts of the underlying client.'''
+    transport = TransportOptions(connect_timeout=1.5, read_timeout=4.0)
+    async_client = AsyncGitLabClient(access_token, instance_url, transport=transport)
+    assert async_client._client.timeout.connect == 1.5
+    assert async_client._client.timeout.read == 4.0
+    asyncio.run(async_client.aclose())
+
+
+def test_metadata_is_revalidated_with_etag(access_token: 'str', instance_url: 'str') -> 'None':
+    '''Cached metadata is requested conditionally, and reused on HTTP 304.'''
+    async_client = AsyncGitLabClient(access_token, instance_url, metadata_ttl=60.0)
+    body = {'version': '16.6.1-ee', 'revision': '9aa991a5ee9'}
+    responses = [
+        Response(HTTPStatus.OK, json=body, headers={'ETag': 'W/"1"'}),
+        Response(HTTPStatus.NOT_MODIFIED, headers={'ETag': 'W/"1"'}),
+    ]
+    with mock.patch.object(async_client._client, 'get', side_effect=responses) as get:
+        assert asyncio.run(async_client.fetch_metadata()) == body
+        assert async_client.metadata_cache.fresh
+        async_client.metadata_cache.invalidate()
+        assert asyncio.run(async_client.fetch_metadata()) == body
+    assert get.call_args_list[0].kwargs['headers'] == {}
+    assert get.call_args_list[1].kwargs['headers'] == {'If-None-Match': 'W/"1"'}
+    assert async_client.metadata_cache.fresh
+
+
+def test_metadata_cache_is_invalidated_by_health_changes() -> 'None':
+    '''Cached metadata goes stale when the instance goes down or comes back, and on expiry.'''
+    cache = MetadataCache(ttl=60.0)
+    cache.store({'version': '16.6.1-ee'}, None)
+    assert cache.observe_health(True) is False
+    assert cache.fresh
+    assert cache.observe_health(False) is True
+    assert not cache.fresh
+    cache.store({'version': '16.6.1-ee'}, None)
+    assert cache.observe_health(True) is True
+    assert not cache.fresh
+    assert not MetadataCache(ttl=0.0).fresh
@@ -0,0 +1,47 @@
+import random
+
+from .. import AdaptivePolicy, CircuitBreaker
+
+
+def test_degraded_and_recovering_instances_are_polled_faster() -> 'None':
+    '''The interval shortens while polls fail, and for a few polls after the circuit closes.'''
+    breaker = CircuitBreaker(60.0, AdaptivePolicy(failure_threshold=2, fast_factor=0.5, recovery_polls=2))
+    assert breaker.next_interval == 60.0
+    breaker.record(0.0, healthy=True, available=False) # e.g. failing its readiness check
+    assert breaker.next_interval == 30.0
+    breaker.record(30.0, healthy=True, available=True)
+    assert breaker.next_interval == 60.0
+
+
+def test_circuit_opens_and_backs_off_until_a_probe_passes() -> 'None':
+    '''Polls are skipped while open; probes back off exponentially, and one passing closes the circuit.'''
+    policy = AdaptivePolicy(failure_threshold=2, jitter=0.0, max_backoff=4.0, recovery_polls=1)
+    breaker = CircuitBreaker(10.0, policy, rng=random.Random(0))
+    breaker.record(0.0, healthy=False, available=False)
+    assert not breaker.is_open
+    breaker.record(10.0, healthy=False, available=False)
+    assert breaker.is_open
+    # open circuits tick at the regular interval, to record the skipped polls
+    assert breaker.next_interval == 10.0
+    assert not breaker.allow(29.0) and breaker.allow(30.0) # 2 intervals
+
+    breaker.record(30.0, healthy=False, available=False)
+    assert not breaker.allow(69.0) and breaker.allow(70.0) # 4 intervals
+    breaker.record(70.0, healthy=False, available=False)
+    assert not breaker.allow(109.0) and breaker.allow(110.0) # capped at 4 intervals
+
+    breaker.record(110.0, healthy=True, available=True)
+    assert not breaker.is_open and breaker.allow(111.0)
+    assert breaker.recovering == 0 and breaker.consecutive_failures == 0
+
+
+def test_probes_are_jittered() -> 'None':
+    '''Instances that went down together are not all probed at once.'''
+    policy = AdaptivePolicy(failure_threshold=1, jitter=0.2)
+    probe_times = set()
+    for seed in range(10):
+        breaker = CircuitBreaker(10.0, policy, rng=random.Random(seed))
+        breaker.record(0.0, healthy=False, available=False)
+        probe_times.add(breaker._probe_at)
+    assert len(probe_times) == 10
+    assert all(16.0 <= probe_at <= 24.0 for probe_at in probe_times)
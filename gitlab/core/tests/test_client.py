@@ -2,7 +2,7 @@ from .fixtures import * # import to initialise fixtures
 
 import re
 
-from .. import HttpRequestException
+from .. import HttpRequestException, readiness_components
 from .patches import patched_client_context
 from http import HTTPStatus
 from typing import TYPE_CHECKING
@@ -67,6 +67,25 @@ def test_failing_readiness_check(client: 'GitLabClient') -> 'None':
             client.readiness_check()
 
 
+def test_readiness_components_are_named_by_labels() -> 'None':
+    '''Each result of a readiness check is a component, told apart from the other shards of its check by its labels.'''
+    body = {
+        'status': 'failed',
+        'master_check': [{'status': 'ok'}],
+        'gitaly_check': [
+            {'status': 'ok', 'labels': {'shard': 'default'}},
+            {'status': 'failed', 'message': 'unavailable', 'labels': {'shard': 'archive'}},
+        ],
+        'redis_check': [{'status': 'ok'}, {'status': 'failed'}],
+    }
+    assert readiness_components(body) == {
+        'master_check': True,
+        'gitaly_check[shard=default]': True,
+        'gitaly_check[shard=archive]': False,
+        'redis_check': False,
+    }
+
+
 def test_fetch_metadata(client: 'GitLabClient') -> 'None':
     '''Fetch instance metadata.'''
     code = HTTPStatus.OK
@@ -0,0 +1,86 @@
+from .fixtures import * # import to initialise fixtures
+
+import pytest
+
+pyarrow = pytest.importorskip('pyarrow')
+
+import pyarrow.ipc
+import pyarrow.parquet
+
+from .. import ColumnarWriter, PollEntry, arrow_columns, select_poll_entries, stream_rows
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy.orm import Session
+
+
+def _populate(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Populates the database with poll entries of two instances, over two days.'''
+    with Session(engine) as session:
+        session.add_all(
+            PollEntry(
+                base_url=f'https://{"a" if i % 2 else "b"}.example.com',
+                created_at=datetime(2024, 1, 1 + i // 6, 0, i, 30, 123456),
+                health_check_duration_ms=12.5 if i else None,
+                health_check_passed=bool(i % 3),
+                health_check_status_code=200 if i else None,
+                instance_version='16.6.1-ee',
+                readiness_check_passed=True,
+            )
+            for i in range(10)
+        )
+        session.commit()
+
+
+def _export(engine: 'sqlalchemy.Engine', path: 'Path', output_format: 'str', **options) -> 'None':
+    '''Exports every poll, with its latencies, in batches of four rows.'''
+    columns = arrow_columns(include_latencies=True)
+    with engine.connect() as connection, ColumnarWriter(path, output_format, list(columns), **options) as writer:
+        for rows in stream_rows(connection, select_poll_entries(tuple(columns.values())), batch_size=4):
+            writer.write(rows)
+
+
+def test_parquet_export_has_native_types(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Booleans and timestamps are exported as such, and URLs and versions are dictionary-encoded.'''
+    _populate(engine)
+    path = tmp_path / 'export.parquet'
+    _export(engine, path, 'parquet')
+
+    table = pyarrow.parquet.read_table(path)
+    assert table.schema.field('base_url').type == pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    assert table.schema.field('health_check_passed').type == pyarrow.bool_()
+    assert table.schema.field('created_at').type == pyarrow.timestamp('us')
+    assert table.column('created_at')[1].as_py() == datetime(2024, 1, 1, 0, 1, 30, 123456)
+    assert table.column('health_check_passed').to_pylist()[:4] == [False, True, True, False]
+    assert table.column('health_check_duration_ms').to_pylist()[:2] == [None, 12.5]
+    assert table.column('base_url').to_pylist()[:2] == ['https://b.example.com', 'https://a.example.com']
+
+
+def test_parquet_row_groups_are_partitioned_by_date(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Each date polled starts a row group of its own, however the batches fall.'''
+    _populate(engine)
+    path = tmp_path / 'export.parquet'
+    _export(engine, path, 'parquet', partition_by_date=True)
+
+    metadata = pyarrow.parquet.ParquetFile(path).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [6, 4]
+
+
+def test_arrow_export_shares_dictionaries_between_batches(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Arrow files are written a batch at a time, with dictionaries that grow as new values are seen.'''
+    _populate(engine)
+    path = tmp_path / 'export.arrow'
+    _export(engine, path, 'arrow', compression='zstd')
+
+    with pyarrow.ipc.open_file(path) as reader:
+        assert reader.num_record_batches == 3
+        table = reader.read_all()
+    assert table.num_rows == 10
+    assert set(table.column('base_url').to_pylist()) == {'https://a.example.com', 'https://b.example.com'}
+
+
+def test_columnar_export_does_not_overwrite(tmp_path: 'Path') -> 'None':
+    '''Existing files are never overwritten.'''
+    path = tmp_path / 'export.parquet'
+    path.touch()
+    with pytest.raises(FileExistsError):
+        ColumnarWriter(path, 'parquet', list(arrow_columns()))
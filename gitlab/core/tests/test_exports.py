@@ -0,0 +1,190 @@
+from .fixtures import * # import to initialise fixtures
+
+import csv
+import gzip
+
+from .. import (
+    PollEntry,
+    ReadinessComponent,
+    ReadinessResult,
+    ResponseBody,
+    csv_columns,
+    open_export,
+    read_checkpoint,
+    resolve_response_bodies,
+    select_poll_entries,
+    stream_rows,
+    write_checkpoint,
+)
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+
+def _populate(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Populates the database with poll entries of two instances.'''
+    with Session(engine) as session:
+        session.add_all(
+            PollEntry(
+                base_url=f'https://{"a" if i % 2 else "b"}.example.com',
+                created_at=datetime(2024, 1, 1, 0, i, 30, 123456),
+                health_check_passed=bool(i % 3),
+                instance_version='16.6.1-ee',
+                readiness_check_passed=True,
+            )
+            for i in range(10)
+        )
+        session.commit()
+
+
+def test_csv_columns_are_formatted_by_the_database(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Booleans and timestamps come back from the database formatted for export.'''
+    _populate(engine)
+    columns = csv_columns()
+    stmt = select_poll_entries(tuple(columns.values()), base_url='https://a.example.com', since=datetime(2024, 1, 1, 0, 3))
+    with engine.connect() as connection:
+        rows = [tuple(row) for rows in stream_rows(connection, stmt, batch_size=2) for row in rows]
+    assert rows == [
+        ('https://a.example.com', '16.6.1-ee', 'no', 'yes', '2024-01-01 00:03:30'),
+        ('https://a.example.com', '16.6.1-ee', 'yes', 'yes', '2024-01-01 00:05:30'),
+        ('https://a.example.com', '16.6.1-ee', 'yes', 'yes', '2024-01-01 00:07:30'),
+        ('https://a.example.com', '16.6.1-ee', 'no', 'yes', '2024-01-01 00:09:30'),
+    ]
+
+
+def test_latency_columns_are_exported(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Check durations are rounded to microseconds; missing status codes are left empty.'''
+    with Session(engine) as session:
+        session.add(PollEntry(
+            base_url='https://a.example.com',
+            created_at=datetime(2024, 1, 1),
+            health_check_passed=True,
+            instance_version='',
+            readiness_check_passed=False,
+            health_check_duration_ms=12.3456789,
+            health_check_status_code=200,
+            readiness_check_duration_ms=30000.0,
+        ))
+        session.commit()
+    columns = csv_columns(include_latencies=True)
+    with engine.connect() as connection:
+        (row,) = connection.execute(select_poll_entries(tuple(columns.values())))
+    assert dict(zip(columns, row)) == {
+        'base_url': 'https://a.example.com',
+        'instance_version': '',
+        'health_check_passed': 'yes',
+        'readiness_check_passed': 'no',
+        'created_at': '2024-01-01 00:00:00',
+        'health_check_duration_ms': 12.346,
+        'health_check_status_code': 200,
+        'readiness_check_duration_ms': 30000.0,
+        'readiness_check_status_code': None,
+        'metadata_duration_ms': None,
+        'metadata_status_code': None,
+    }
+
+
+def test_rows_are_streamed_in_batches(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Rows are yielded in batches no larger than requested.'''
+    _populate(engine)
+    stmt = select_poll_entries(tuple(csv_columns().values()))
+    with engine.connect() as connection:
+        assert [len(rows) for rows in stream_rows(connection, stmt, batch_size=4)] == [4, 4, 2]
+
+
+def test_gzip_export(tmp_path: 'Path') -> 'None':
+    '''Compressed exports are readable with the standard library.'''
+    path = tmp_path / 'export.csv.gz'
+    with open_export(path, 'gzip') as fp:
+        csv.writer(fp).writerows([('a', 'b'), ('c', 'd')])
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as fp:
+        assert list(csv.reader(fp)) == [['a', 'b'], ['c', 'd']]
+
+
+def test_export_does_not_overwrite(tmp_path: 'Path') -> 'None':
+    '''Existing files are never overwritten.'''
+    path = tmp_path / 'export.csv'
+    path.touch()
+    with pytest.raises(FileExistsError):
+        open_export(path)
+
+
+def test_export_appends(tmp_path: 'Path') -> 'None':
+    '''Incremental exports append to their existing files.'''
+    path = tmp_path / 'export.csv.gz'
+    with open_export(path, 'gzip') as fp:
+        csv.writer(fp).writerow(('a', 'b'))
+    with open_export(path, 'gzip', append=True) as fp:
+        csv.writer(fp).writerow(('c', 'd'))
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as fp:
+        assert list(csv.reader(fp)) == [['a', 'b'], ['c', 'd']]
+
+
+def test_checkpoint_round_trip(tmp_path: 'Path') -> 'None':
+    '''Checkpoints start from the first poll, and are replaced as exports progress.'''
+    path = tmp_path / 'export.checkpoint'
+    assert read_checkpoint(path) == 0
+    write_checkpoint(path, 42)
+    write_checkpoint(path, 64)
+    assert read_checkpoint(path) == 64
+    assert [child.name for child in tmp_path.iterdir()] == ['export.checkpoint']
+
+
+def test_polls_after_checkpoint_are_selected(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Only polls recorded after the checkpoint are selected, in the order they were recorded.'''
+    _populate(engine)
+    stmt = select_poll_entries((PollEntry.id,), after_id=7)
+    with engine.connect() as connection:
+        assert [row.id for rows in stream_rows(connection, stmt) for row in rows] == [8, 9, 10]
+
+
+def test_response_bodies_are_resolved(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Response body ids are replaced with the text of the bodies.'''
+    with Session(engine) as session:
+        body = ResponseBody.from_text('GitLab OK')
+        session.add_all((
+            PollEntry(
+                base_url='https://a.example.com',
+                created_at=datetime(2024, 1, 1, 0, i),
+                health_check_passed=True,
+                health_check_response=body if i else None,
+                instance_version='16.6.1-ee',
+                readiness_check_passed=True,
+            )
+            for i in range(3)
+        ))
+        session.commit()
+
+    columns = csv_columns(include_responses=True)
+    positions = [list(columns).index('health_check_response'), list(columns).index('metadata_response')]
+    stmt = select_poll_entries(tuple(columns.values()))
+    with engine.connect() as connection:
+        batches = resolve_response_bodies(connection, stream_rows(connection, stmt, batch_size=2), positions)
+        assert [(row[positions[0]], row[positions[1]]) for rows in batches for row in rows] == [
+            ('', ''),
+            ('GitLab OK', ''),
+            ('GitLab OK', ''),
+        ]
+
+
+def test_failed_readiness_components_are_exported(engine: 'sqlalchemy.Engine') -> 'None':
+    '''The names of the failed readiness components of each poll are exported, space-separated.'''
+    with Session(engine) as session:
+        db, redis = ReadinessComponent(name='db_check'), ReadinessComponent(name='redis_check')
+        for i, failed in enumerate(((), (db,), (db, redis))):
+            poll_entry = PollEntry(
+                base_url='https://a.example.com',
+                created_at=datetime(2024, 1, 1, 0, i),
+                health_check_passed=True,
+                instance_version='16.6.1-ee',
+                readiness_check_passed=not failed,
+            )
+            poll_entry.readiness_results = [
+                ReadinessResult(component=component, passed=component not in failed) for component in (db, redis)
+            ]
+            session.add(poll_entry)
+        session.commit()
+
+    columns = csv_columns(include_readiness_components=True)
+    stmt = select_poll_entries((PollEntry.id, columns['failed_readiness_components']))
+    with engine.connect() as connection:
+        assert [row[1] for rows in stream_rows(connection, stmt) for row in rows] == ['', 'db_check', 'db_check redis_check']
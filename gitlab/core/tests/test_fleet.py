@@ -0,0 +1,70 @@
+import pytest
+import re
+
+from .. import ConfigurationException, FleetInstance, assign_shards, load_fleet, reassign_instances
+from pathlib import Path
+
+
+def _write_fleet(directory: 'Path', content: 'str') -> 'Path':
+    '''Writes a fleet file into the directory.'''
+    path = directory / 'fleet.toml'
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+def test_load_fleet(tmp_path: 'Path', monkeypatch: 'pytest.MonkeyPatch') -> 'None':
+    '''Instances fall back to the defaults where they do not override them.'''
+    monkeypatch.setenv('EXAMPLE_TOKEN', 'from-environment')
+    path = _write_fleet(tmp_path, '\n'.join((
+        '[[instances]]',
+        'url = "https://a.example.com/"',
+        '[[instances]]',
+        'url = "https://b.example.com"',
+        'interval = 30',
+        'token = "inline"',
+        '[[instances]]',
+        'url = "https://c.example.com"',
+        'token_env = "EXAMPLE_TOKEN"',
+    )))
+
+    instances = load_fleet(path, default_access_token='default', default_interval=60)
+    assert instances == [
+        FleetInstance('https://a.example.com', 'default', 60.0),
+        FleetInstance('https://b.example.com', 'inline', 30.0),
+        FleetInstance('https://c.example.com', 'from-environment', 60.0),
+    ]
+
+
+@pytest.mark.parametrize(('content', 'message'), (
+    ('', r'does not define any instances'),
+    ('[[instances]]\ninterval = 5', r'missing its url'),
+    ('[[instances]]\nurl = "https://a.example.com"', r'has no access token'),
+    ('[[instances]]\nurl = "https://a.example.com"\ntoken = "x"\ninterval = 0', r'non-positive interval'),
+    ('[[instances]]\nurl = "https://a"\ntoken = "x"\n[[instances]]\nurl = "https://a/"\ntoken = "x"', r'duplicates'),
+    ('[[instances]\n', r'unable to read fleet file'),
+))
+def test_invalid_fleet(tmp_path: 'Path', content: 'str', message: 'str') -> 'None':
+    '''Invalid fleet files are rejected with a descriptive message.'''
+    path = _write_fleet(tmp_path, content)
+    with pytest.raises(ConfigurationException, match=re.compile(message, re.IGNORECASE)):
+        load_fleet(path)
+
+
+def test_shards_are_balanced_by_load() -> 'None':
+    '''Shards are balanced by polls per second, rather than by their number of instances.'''
+    fast = [FleetInstance(f'https://fast{i}.example.com', 'x', 10.0) for i in range(2)]
+    slow = [FleetInstance(f'https://slow{i}.example.com', 'x', 60.0) for i in range(12)]
+    shards = assign_shards([*slow, *fast], 2)
+
+    assert sorted(map(len, shards)) == [7, 7]
+    assert [sum(instance.load for instance in shard) for shard in shards] == pytest.approx([0.2, 0.2])
+    assert {instance for shard in shards for instance in shard} == {*slow, *fast}
+
+
+def test_instances_of_lost_shards_are_reassigned() -> 'None':
+    '''The instances of a lost shard go to the least loaded of the remaining shards.'''
+    orphans = [FleetInstance(f'https://{i}.example.com', 'x', 60.0) for i in range(3)]
+    assigned = reassign_instances(orphans, {0: 0.02, 2: 0.0})
+    assert assigned == {0: [orphans[2]], 2: orphans[:2]}
+    with pytest.raises(ValueError):
+        reassign_instances(orphans, {})
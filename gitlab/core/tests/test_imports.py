@@ -0,0 +1,234 @@
+from .fixtures import * # import to initialise fixtures
+
+import gzip
+import itertools
+import json
+import pytest
+import sqlalchemy
+
+from .. import (
+    ConfigurationException,
+    Incident,
+    PollEntry,
+    ReadinessComponent,
+    ReadinessResult,
+    ResponseBody,
+    create_engine,
+    find_incidents,
+    import_database,
+    import_poll_records,
+    infer_import_format,
+    initialise_schema,
+    open_import,
+    read_export,
+    record_transitions,
+)
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy.orm import Session
+
+
+CSV_EXPORT = '''"base_url","instance_version","health_check_passed","readiness_check_passed","created_at","health_check_duration_ms","health_check_status_code","health_check_response"
+"https://a.example.com","16.6.1-ee","yes","yes","2024-01-01 00:00:30","12.5","200","GitLab OK"
+"https://a.example.com","","no","no","2024-01-01 00:01:30","","",""
+"https://b.example.com","16.6.1-ee","yes","no","2024-01-01 00:00:30","8.25","200","GitLab OK"
+'''
+
+
+def _source_engine(tmp_path: 'Path') -> 'sqlalchemy.Engine':
+    '''Creates the database of another node, with polls referring to a body and readiness components of its own.'''
+    engine = create_engine(f'sqlite:///{(tmp_path / "site-a.db").as_posix()}')
+    initialise_schema(engine)
+    with Session(engine) as session:
+        # allocated other ids than the importing database would, so that they must be matched by name
+        session.add(ReadinessComponent(name='redis_check'))
+        body = ResponseBody.from_text('{"status": "ok"}')
+        for minute in range(3):
+            session.add(PollEntry(
+                base_url='https://a.example.com',
+                created_at=datetime(2024, 1, 1, 0, minute, 0, 123456),
+                health_check_passed=True,
+                instance_version='16.6.1-ee',
+                readiness_check_passed=minute != 1,
+                readiness_check_response=body,
+                readiness_results=[ReadinessResult(
+                    component=ReadinessComponent(name=f'gitaly_check[{minute}]'),
+                    passed=minute != 1,
+                )],
+            ))
+        session.commit()
+    return engine
+
+
+def test_exports_are_imported_once(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Exported polls are imported with their bodies stored once; importing them again imports nothing.'''
+    path = tmp_path / 'site-a.csv'
+    path.write_text(CSV_EXPORT, encoding='utf-8')
+    assert infer_import_format(path) == 'csv'
+    for expected in (3, 0):
+        with open_import(path) as fp:
+            assert import_poll_records(engine, read_export(fp, 'csv'), 'site-a', batch_size=2) == expected
+
+    with Session(engine) as session:
+        polls = session.query(PollEntry).order_by(PollEntry.id).all()
+        assert [(poll.base_url, poll.created_at, poll.source) for poll in polls] == [
+            ('https://a.example.com', datetime(2024, 1, 1, 0, 0, 30), 'site-a'),
+            ('https://a.example.com', datetime(2024, 1, 1, 0, 1, 30), 'site-a'),
+            ('https://b.example.com', datetime(2024, 1, 1, 0, 0, 30), 'site-a'),
+        ]
+        assert (polls[0].health_check_duration_ms, polls[0].health_check_status_code) == (12.5, 200)
+        assert (polls[1].health_check_duration_ms, polls[1].health_check_status_code) == (None, None)
+        assert polls[1].health_check_response is None
+        assert polls[0].health_check_response_id == polls[2].health_check_response_id
+        assert polls[0].health_check_response.text == 'GitLab OK'
+
+
+def test_compressed_jsonl_exports_are_imported(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''JSON Lines exports are read through every gzip member, as appended exports are written.'''
+    path = tmp_path / 'site-a.jsonl.gz'
+    record = {
+        'base_url': 'https://a.example.com',
+        'instance_version': '16.6.1-ee',
+        'health_check_passed': 'yes',
+        'readiness_check_passed': 'no',
+        'created_at': '2024-01-01 00:00:30',
+        'readiness_check_status_code': 503,
+    }
+    with path.open('wb') as fp:
+        fp.write(gzip.compress((json.dumps(record) + '\n').encode('utf-8')))
+        fp.write(gzip.compress((json.dumps({**record, 'created_at': '2024-01-01 00:01:30'}) + '\n').encode('utf-8')))
+    assert infer_import_format(path) == 'jsonl'
+
+    with open_import(path, 'gzip') as fp:
+        assert import_poll_records(engine, read_export(fp, 'jsonl'), 'site-a') == 2
+    with Session(engine) as session:
+        assert session.query(PollEntry).filter(PollEntry.readiness_check_status_code == 503).count() == 2
+
+
+def test_invalid_records_are_reported(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''The first invalid record is reported by its position in the export.'''
+    path = tmp_path / 'site-a.csv'
+    path.write_text(CSV_EXPORT.replace('2024-01-01 00:01:30', 'yesterday'), encoding='utf-8')
+    with open_import(path) as fp, pytest.raises(ConfigurationException, match='#2'):
+        import_poll_records(engine, read_export(fp, 'csv'), 'site-a')
+
+    path = tmp_path / 'site-a.jsonl'
+    path.write_text('{"base_url": "https://a.example.com"}\n\n{"base_url":\n', encoding='utf-8')
+    with open_import(path) as fp, pytest.raises(ConfigurationException, match='line 3'):
+        list(read_export(fp, 'jsonl'))
+
+    path.write_text('{"base_url": "https://a.example.com"}\n[]\n', encoding='utf-8')
+    with open_import(path) as fp, pytest.raises(ConfigurationException, match='line 2'):
+        list(read_export(fp, 'jsonl'))
+    with open_import(path) as fp, pytest.raises(ConfigurationException, match='#1: missing health_check_passed'):
+        import_poll_records(engine, itertools.islice(read_export(fp, 'jsonl'), 1), 'site-a')
+
+    path = tmp_path / 'site-a.csv'
+    path.write_text(CSV_EXPORT.replace('"no","no"', '"no","maybe"'), encoding='utf-8')
+    with open_import(path) as fp, pytest.raises(ConfigurationException, match="#2: expected yes or no, not 'maybe'"):
+        import_poll_records(engine, read_export(fp, 'csv'), 'site-a')
+    path.write_text(CSV_EXPORT.replace('"created_at"', '"polled_at"'), encoding='utf-8')
+    with open_import(path) as fp, pytest.raises(ConfigurationException, match='lacks the created_at column'):
+        read_export(fp, 'csv')
+
+
+def test_checks_are_parsed_whatever_their_spelling(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Checks exported as true/false (in any case), or as JSON booleans, are imported as yes/no.'''
+    path = tmp_path / 'site-a.csv'
+    path.write_text(CSV_EXPORT.replace('"yes"', '"True"').replace('"no"', '"FALSE"'), encoding='utf-8')
+    with open_import(path) as fp:
+        assert import_poll_records(engine, read_export(fp, 'csv'), 'site-a') == 3
+    path = tmp_path / 'site-b.jsonl'
+    path.write_text(
+        '{"base_url": "https://a.example.com", "health_check_passed": true, '
+        '"readiness_check_passed": false, "created_at": "2024-01-01 00:00:30"}\n',
+        encoding='utf-8',
+    )
+    with open_import(path) as fp:
+        assert import_poll_records(engine, read_export(fp, 'jsonl'), 'site-b') == 1
+
+    with Session(engine) as session:
+        polls = session.query(PollEntry).order_by(PollEntry.id).all()
+        assert [(poll.health_check_passed, poll.readiness_check_passed, poll.instance_version) for poll in polls] == [
+            (True, True, '16.6.1-ee'),
+            (False, False, ''),
+            (True, False, '16.6.1-ee'),
+            (True, False, ''),
+        ]
+
+
+def test_databases_are_imported_once(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Polls are copied with their bodies and readiness results, matched up by digest and name.'''
+    source_engine = _source_engine(tmp_path)
+    path = tmp_path / 'site-a.db'
+    assert infer_import_format(path) == 'database'
+    with Session(engine) as session:
+        session.add(PollEntry(
+            base_url='https://b.example.com',
+            created_at=datetime(2024, 1, 1),
+            health_check_passed=True,
+            instance_version='16.6.1-ee',
+            readiness_check_passed=True,
+            readiness_check_response=ResponseBody.from_text('{"status": "ok"}'),
+        ))
+        session.commit()
+
+    batches = []
+    assert import_database(engine, path, 'site-a', batch_size=2, on_batch=batches.append) == 3
+    assert batches == [2, 3]
+    assert import_database(engine, path, 'site-a') == 0
+    source_engine.dispose()
+
+    with Session(engine) as session:
+        polls = session.query(PollEntry).filter(PollEntry.source == 'site-a').order_by(PollEntry.created_at).all()
+        assert [poll.created_at for poll in polls] == [datetime(2024, 1, 1, 0, minute, 0, 123456) for minute in range(3)]
+        assert session.query(ResponseBody).count() == 1
+        assert {poll.readiness_check_response.text for poll in polls} == {'{"status": "ok"}'}
+        assert [
+            [(result.component.name, result.passed) for result in poll.readiness_results]
+            for poll in polls
+        ] == [[('gitaly_check[0]', True)], [('gitaly_check[1]', False)], [('gitaly_check[2]', True)]]
+
+
+def test_unmigrated_databases_are_refused(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Databases missing columns of the latest schema are refused, rather than imported in part.'''
+    other = create_engine(f'sqlite:///{(tmp_path / "other.db").as_posix()}')
+    with other.begin() as connection:
+        connection.exec_driver_sql('CREATE TABLE poll_entry (id INTEGER PRIMARY KEY, base_url VARCHAR)')
+    other.dispose()
+    with pytest.raises(ConfigurationException, match='migrate it'):
+        import_database(engine, tmp_path / 'other.db', 'other')
+
+
+def test_interleaved_history_is_recorded_in_order(engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Polls imported after those made here, but polled between them, record transitions in the order they were polled.'''
+    with Session(engine) as session:
+        session.add_all(
+            PollEntry(
+                base_url='https://a.example.com',
+                created_at=datetime(2024, 1, 1, 0, minute),
+                health_check_passed=minute != 2,
+                instance_version='16.6.1-ee',
+                readiness_check_passed=True,
+            )
+            for minute in range(5)
+        )
+        session.commit()
+    with engine.begin() as connection:
+        record_transitions(connection)
+
+    path = tmp_path / 'site-b.csv'
+    path.write_text(
+        '"base_url","instance_version","health_check_passed","readiness_check_passed","created_at"\n'
+        '"https://a.example.com","16.6.1-ee","yes","yes","2024-01-01 00:02:30"\n'
+        '"https://a.example.com","16.6.1-ee","no","yes","2024-01-01 00:03:30"\n',
+        encoding='utf-8',
+    )
+    with open_import(path) as fp:
+        import_poll_records(engine, read_export(fp, 'csv'), 'site-b')
+    with engine.begin() as connection:
+        record_transitions(connection)
+        assert find_incidents(connection) == [
+            Incident('https://a.example.com', 'outage', datetime(2024, 1, 1, 0, 2), datetime(2024, 1, 1, 0, 2, 30), 'health check failed'),
+            Incident('https://a.example.com', 'outage', datetime(2024, 1, 1, 0, 3, 30), datetime(2024, 1, 1, 0, 4), 'health check failed'),
+        ]
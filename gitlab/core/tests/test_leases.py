@@ -0,0 +1,71 @@
+from .fixtures import * # import to initialise fixtures
+
+import sqlalchemy
+import threading
+
+from .. import create_engine, release_leases, renew_leases
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+
+URLS = [f'https://{name}.example.com' for name in 'abcd']
+NOW = datetime(2024, 1, 1)
+
+
+def _renew(engine: 'sqlalchemy.Engine', node_id: 'str', seconds: 'float' = 0.0) -> 'List[str]':
+    '''Renews the leases of a node on the fleet, the given number of seconds from `NOW`.'''
+    with engine.begin() as connection:
+        return renew_leases(connection, node_id, URLS, NOW + timedelta(seconds=seconds), duration=30.0)
+
+
+def test_nodes_joining_share_the_fleet(engine: 'sqlalchemy.Engine') -> 'None':
+    '''A node joining takes up the instances the others release, once they see it.'''
+    assert _renew(engine, 'a') == URLS
+    # every instance is still held, so the new node waits for the others to release its share
+    assert _renew(engine, 'b', 1) == []
+    assert _renew(engine, 'a', 2) == URLS[:2]
+    assert _renew(engine, 'b', 3) == URLS[2:]
+    assert _renew(engine, 'a', 4) == URLS[:2]
+
+
+def test_instances_of_dead_nodes_are_taken_up(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Once the leases of a node expire, the remaining nodes take up its instances.'''
+    _renew(engine, 'a')
+    _renew(engine, 'b', 1)
+    _renew(engine, 'a', 2)
+    assert _renew(engine, 'b', 3) == URLS[2:]
+    # the leases of "a" are still live, until it fails to renew them for their whole duration
+    assert _renew(engine, 'b', 31) == URLS[2:]
+    assert _renew(engine, 'b', 33) == URLS
+
+
+def test_released_instances_are_taken_up_at_once(engine: 'sqlalchemy.Engine') -> 'None':
+    '''A node stopping releases its instances, rather than leaving them until its leases expire.'''
+    _renew(engine, 'a')
+    _renew(engine, 'b', 1)
+    _renew(engine, 'a', 2)
+    _renew(engine, 'b', 3)
+    with engine.begin() as connection:
+        release_leases(connection, 'a')
+    assert _renew(engine, 'b', 4) == URLS
+
+
+def test_concurrent_nodes_never_share_an_instance(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Nodes renewing at once over their own connections end up holding every instance once, in equal shares.'''
+    held: 'Dict[str, List[str]]' = {}
+
+    def node(node_id: 'str') -> 'None':
+        node_engine = create_engine(engine.url)
+        for step in range(5):
+            held[node_id] = _renew(node_engine, node_id, step)
+            barrier.wait()
+        node_engine.dispose()
+
+    barrier = threading.Barrier(4)
+    threads = [threading.Thread(target=node, args=(f'node-{i}',)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(url for urls in held.values() for url in urls) == URLS
+    assert all(len(urls) == 1 for urls in held.values())
@@ -0,0 +1,70 @@
+import asyncio
+
+from .. import PollEntry, PollMetrics, WriterStatistics, serve_metrics
+
+
+def _poll_entry(*, passed: 'bool' = True, health_check_duration_ms: 'float | None' = 30.0) -> 'PollEntry':
+    '''Creates a poll entry of an instance.'''
+    return PollEntry(
+        base_url='https://a.example.com',
+        health_check_passed=passed,
+        instance_version='16.6.1-ee' if passed else '',
+        readiness_check_passed=passed,
+        health_check_duration_ms=health_check_duration_ms,
+    )
+
+
+def test_metrics_track_latest_state_and_totals() -> 'None':
+    '''Gauges reflect the latest poll, counters every poll, and the version survives failed polls.'''
+    metrics = PollMetrics()
+    metrics.observe(_poll_entry())
+    metrics.observe(_poll_entry(passed=False))
+    lines = metrics.render().splitlines()
+
+    labels = '{instance="https://a.example.com"}'
+    assert f'gitlab_up{labels} 0' in lines
+    assert f'gitlab_polls_total{labels} 2' in lines
+    assert f'gitlab_poll_failures_total{labels} 1' in lines
+    assert 'gitlab_version_info{instance="https://a.example.com",version="16.6.1-ee"} 1' in lines
+
+
+def test_check_durations_are_histograms() -> 'None':
+    '''Buckets are cumulative, in seconds; checks without durations are left out.'''
+    metrics = PollMetrics(buckets=(0.05, 0.01))
+    for duration_ms in (5.0, 10.0, 20.0, 100.0):
+        metrics.observe(_poll_entry(health_check_duration_ms=duration_ms))
+    samples = [line for line in metrics.render().splitlines() if line.startswith('gitlab_check_duration_seconds')]
+
+    labels = 'instance="https://a.example.com",check="health_check"'
+    assert samples == [
+        f'gitlab_check_duration_seconds_bucket{{{labels},le="0.01"}} 2',
+        f'gitlab_check_duration_seconds_bucket{{{labels},le="0.05"}} 3',
+        f'gitlab_check_duration_seconds_bucket{{{labels},le="+Inf"}} 4',
+        f'gitlab_check_duration_seconds_sum{{{labels}}} 0.135',
+        f'gitlab_check_duration_seconds_count{{{labels}}} 4',
+    ]
+
+
+def test_metrics_are_served_over_http() -> 'None':
+    '''Scrapes are answered from memory, including the current state of the writer.'''
+    statistics = WriterStatistics(batches_written=1, elapsed=1.0, queue_depth=7, rows_dropped=0, rows_written=1)
+    metrics = PollMetrics(writer_statistics=lambda: statistics)
+    metrics.observe(_poll_entry())
+
+    async def scrape(path: 'str') -> 'bytes':
+        server = await serve_metrics(metrics, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            response = await reader.read()
+            writer.close()
+            return response
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    response = asyncio.run(scrape('/metrics'))
+    assert response.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert b'\ngitlab_poller_write_queue_depth 7\n' in response
+    assert asyncio.run(scrape('/')).startswith(b'HTTP/1.1 404 Not Found\r\n')
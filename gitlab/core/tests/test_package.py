@@ -0,0 +1,10 @@
+import gitlab.core
+import importlib
+
+
+def test_exports_resolve() -> 'None':
+    '''Every exported name is imported from the submodule it is listed under.'''
+    assert gitlab.core.__all__ == tuple(gitlab.core._EXPORTS)
+    for name, module in gitlab.core._EXPORTS.items():
+        submodule = importlib.import_module(f'gitlab.core.{module}')
+        assert getattr(gitlab.core, name) is getattr(submodule, name)
@@ -0,0 +1,135 @@
+from .fixtures import * # import to initialise fixtures
+
+import sqlalchemy
+import time
+
+from .. import PollEntry, PollWriter, ReadinessComponent, ReadinessResult, ResponseBody, create_engine
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy.orm import Session
+from typing import List
+
+
+def _poll_entry(i: 'int') -> 'PollEntry':
+    '''Creates a distinguishable poll entry.'''
+    return PollEntry(
+        base_url=f'https://{i}.example.com',
+        created_at=datetime(2024, 1, 1),
+        health_check_passed=True,
+        instance_version='16.6.1-ee',
+        readiness_check_passed=True,
+    )
+
+
+def _count(engine: 'sqlalchemy.Engine') -> 'int':
+    '''Counts the persisted poll entries.'''
+    with engine.connect() as connection:
+        return connection.scalar(sqlalchemy.select(sqlalchemy.func.count()).select_from(PollEntry))
+
+
+def test_engine_uses_write_ahead_logging(engine: 'sqlalchemy.Engine') -> 'None':
+    '''SQLite databases are switched to WAL mode with a busy timeout.'''
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == 30000
+
+
+def test_writer_flushes_full_batches(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Entries are committed as soon as a full batch is pending.'''
+    with PollWriter(engine, batch_size=10, max_delay=60) as writer:
+        for i in range(25):
+            writer.submit(_poll_entry(i))
+        deadline = time.monotonic() + 5
+        while writer.statistics.rows_written < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert _count(engine) == 20
+    assert _count(engine) == 25 # the partial batch is flushed on close
+    assert writer.statistics.batches_written == 3
+
+
+def test_writer_flushes_by_age(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Entries are committed once the oldest has waited for the maximum delay.'''
+    with PollWriter(engine, batch_size=100, max_delay=0.05) as writer:
+        writer.submit(_poll_entry(1))
+        deadline = time.monotonic() + 5
+        while writer.statistics.rows_written < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert _count(engine) == 1
+
+
+def test_writer_reports_failed_batches(tmp_path: 'Path') -> 'None':
+    '''Batches that cannot be written are dropped and reported after retrying.'''
+    failures = []
+    engine = create_engine(f'sqlite:///{(tmp_path / "uninitialised.db").as_posix()}')
+    with PollWriter(engine, on_error=lambda exception, batch: failures.append(batch), retries=1) as writer:
+        writer.submit(_poll_entry(1))
+    assert len(failures) == 1
+    assert writer.statistics.rows_dropped == 1
+    with pytest.raises(RuntimeError):
+        writer.submit(_poll_entry(2))
+
+
+def test_identical_response_bodies_are_stored_once(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Entries with identical response bodies share the same stored body.'''
+    with PollWriter(engine, batch_size=2, max_delay=60) as writer:
+        for i in range(5):
+            poll_entry = _poll_entry(i)
+            poll_entry.health_check_response = ResponseBody.from_text('GitLab OK')
+            poll_entry.metadata_response = ResponseBody.from_text(f'{{"version": "16.{i // 3}"}}')
+            writer.submit(poll_entry)
+
+    with Session(engine) as session:
+        bodies = session.scalars(sqlalchemy.select(ResponseBody).order_by(ResponseBody.id)).all()
+        assert [body.text for body in bodies] == ['GitLab OK', '{"version": "16.0"}', '{"version": "16.1"}']
+        references = session.execute(sqlalchemy.select(
+            PollEntry.health_check_response_id,
+            PollEntry.metadata_response_id,
+        ).order_by(PollEntry.id)).all()
+        assert references == [(1, 2), (1, 2), (1, 2), (1, 3), (1, 3)]
+
+
+def test_readiness_components_are_interned(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Readiness results refer to a single component of each name, across batches.'''
+    with PollWriter(engine, batch_size=2, max_delay=60) as writer:
+        for i in range(3):
+            poll_entry = _poll_entry(i)
+            poll_entry.readiness_results = [
+                ReadinessResult(component=ReadinessComponent(name='db_check'), passed=True),
+                ReadinessResult(component=ReadinessComponent(name='gitaly_check[shard=default]'), passed=i != 1),
+            ]
+            writer.submit(poll_entry)
+
+    with Session(engine) as session:
+        components = session.scalars(sqlalchemy.select(ReadinessComponent).order_by(ReadinessComponent.id)).all()
+        assert [component.name for component in components] == ['db_check', 'gitaly_check[shard=default]']
+        results = session.execute(sqlalchemy.select(
+            ReadinessResult.poll_entry_id,
+            ReadinessResult.component_id,
+            ReadinessResult.passed,
+        ).order_by(ReadinessResult.poll_entry_id, ReadinessResult.component_id)).all()
+        assert results == [(1, 1, True), (1, 2, True), (2, 1, True), (2, 2, False), (3, 1, True), (3, 2, True)]
+
+
+def test_writer_retries_batches_failing_after_flush(engine: 'sqlalchemy.Engine') -> 'None':
+    '''A batch whose attempt failed once flushed (e.g. on a locked database) is written in full by the next attempt.'''
+    attempts = []
+
+    def fail_once(session: 'Session', batch: 'List[PollEntry]') -> 'None':
+        attempts.append(len(batch))
+        if len(attempts) == 1:
+            raise sqlalchemy.exc.OperationalError('COMMIT', {}, Exception('database is locked'))
+
+    with PollWriter(engine, batch_size=3, max_delay=60, processors=(fail_once,)) as writer:
+        for i in range(3):
+            poll_entry = _poll_entry(i)
+            poll_entry.health_check_response = ResponseBody.from_text('GitLab OK')
+            poll_entry.readiness_results = [ReadinessResult(component=ReadinessComponent(name='db_check'), passed=i != 1)]
+            writer.submit(poll_entry)
+    assert attempts == [3, 3]
+    assert (writer.statistics.rows_written, writer.statistics.rows_dropped) == (3, 0)
+    assert _count(engine) == 3
+    with Session(engine) as session:
+        assert [body.text for body in session.scalars(sqlalchemy.select(ResponseBody))] == ['GitLab OK']
+        assert [component.name for component in session.scalars(sqlalchemy.select(ReadinessComponent))] == ['db_check']
+        results = session.execute(sqlalchemy.select(ReadinessResult.poll_entry_id, ReadinessResult.passed)).all()
+        assert sorted(results) == [(1, True), (2, False), (3, True)]
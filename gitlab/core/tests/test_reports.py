@@ -0,0 +1,203 @@
+from .fixtures import * # import to initialise fixtures
+
+import sqlalchemy
+
+from .. import (
+    PollEntry,
+    ReadinessComponent,
+    ReadinessResult,
+    build_reports,
+    fold_rollups,
+    latency_percentiles,
+    readiness_component_failures,
+)
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+
+
+def _poll_entry(base_url: 'str', minute: 'int', *, passed: 'bool' = True, version: 'str' = '16.6.1-ee') -> 'PollEntry':
+    '''Creates a poll entry of the given minute.'''
+    return PollEntry(
+        base_url=base_url,
+        created_at=datetime(2024, 1, 1, 10, minute),
+        error_message='' if passed else 'Failed health check',
+        health_check_passed=passed,
+        instance_version=version if passed else '',
+        readiness_check_passed=passed,
+    )
+
+
+@pytest.fixture
+def polled_engine(engine: 'sqlalchemy.Engine') -> 'sqlalchemy.Engine':
+    '''Engine for a database of polls of two instances, one of which suffered outages.'''
+    outcomes = [True, False, True, False, False, False, True, True, False]
+    with Session(engine) as session:
+        session.add_all(
+            _poll_entry('https://a.example.com', minute, passed=passed, version='16.5.0-ee' if minute < 5 else '16.6.1-ee')
+            for minute, passed in enumerate(outcomes)
+        )
+        session.add_all(_poll_entry('https://b.example.com', minute) for minute in range(3))
+        session.commit()
+    yield engine
+
+
+def test_report_counts_availability_and_errors(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''Polls are counted per instance, available only when both checks passed.'''
+    with polled_engine.connect() as connection:
+        a, b = build_reports(connection)
+    assert (a.base_url, a.poll_count, a.available_count, a.error_count) == ('https://a.example.com', 9, 4, 5)
+    assert a.availability == 4 / 9
+    assert (b.poll_count, b.availability, b.longest_outage) == (3, 1.0, None)
+
+
+def test_report_finds_longest_outage(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''The longest outage runs from its first failure until the instance recovered.'''
+    with polled_engine.connect() as connection:
+        outage = build_reports(connection, base_url='https://a.example.com')[0].longest_outage
+    assert (outage.started_at, outage.ended_at) == (datetime(2024, 1, 1, 10, 3), datetime(2024, 1, 1, 10, 6))
+    assert (outage.poll_count, outage.recovered, outage.duration) == (3, True, timedelta(minutes=3))
+
+
+def test_report_marks_ongoing_outage(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''An outage including the latest poll has yet to recover.'''
+    with polled_engine.connect() as connection:
+        (report,) = build_reports(connection, base_url='https://a.example.com', since=datetime(2024, 1, 1, 10, 7))
+    assert report.longest_outage.recovered is False
+    assert report.longest_outage.ended_at == datetime(2024, 1, 1, 10, 8)
+
+
+def test_report_lists_version_history(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''Versions are listed in the order they were first seen, ignoring polls without one.'''
+    with polled_engine.connect() as connection:
+        (report,) = build_reports(connection, base_url='https://a.example.com')
+    assert [(span.version, span.poll_count) for span in report.versions] == [('16.5.0-ee', 2), ('16.6.1-ee', 2)]
+    assert report.versions[1].first_seen == datetime(2024, 1, 1, 10, 6)
+
+
+def test_report_applies_filters(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''Only the polls within the filtered period are reported on.'''
+    with polled_engine.connect() as connection:
+        reports = build_reports(connection, since=datetime(2024, 1, 1, 10, 1), until=datetime(2024, 1, 1, 10, 3))
+    assert [(report.base_url, report.poll_count) for report in reports] == [
+        ('https://a.example.com', 2),
+        ('https://b.example.com', 2),
+    ]
+
+
+def test_report_counts_whole_hours_and_days_from_rollups(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Whole hours and days are counted from their rollups, even once their polls are gone; the rest from the polls.'''
+    def poll_entry(created_at: 'datetime', passed: 'bool' = True) -> 'PollEntry':
+        return PollEntry(
+            base_url='https://a.example.com',
+            created_at=created_at,
+            health_check_passed=passed,
+            instance_version='16.6.1-ee',
+            readiness_check_passed=passed,
+            skipped=not passed,
+        )
+
+    folded = [
+        datetime(2024, 1, 1, 22, 0), # before the period, in its partial first hour
+        datetime(2024, 1, 1, 22, 30),
+        datetime(2024, 1, 1, 23, 10), # in a whole hour
+        datetime(2024, 1, 2, 12, 0), # in a whole day
+        datetime(2024, 1, 3, 0, 30), # in a whole hour
+        datetime(2024, 1, 3, 1, 20),
+        datetime(2024, 1, 3, 1, 50), # after the period, in its partial last hour
+    ]
+    with Session(engine) as session:
+        session.add_all(poll_entry(created_at, passed=created_at.minute != 10) for created_at in folded)
+        session.commit()
+    with engine.begin() as connection:
+        fold_rollups(connection)
+        # as pruning leaves them, summarised in the rollups alone
+        connection.execute(sqlalchemy.delete(PollEntry).where(PollEntry.created_at.in_(folded[2:5])))
+    with Session(engine) as session:
+        session.add(poll_entry(datetime(2024, 1, 2, 13, 0), passed=False)) # yet to be folded
+        session.commit()
+
+    with engine.connect() as connection:
+        (report,) = build_reports(connection, since=datetime(2024, 1, 1, 22, 15), until=datetime(2024, 1, 3, 1, 45))
+    assert (report.poll_count, report.available_count, report.health_check_failed_count, report.skipped_count) == (6, 4, 2, 2)
+    assert (report.first_polled_at, report.last_polled_at) == (datetime(2024, 1, 1, 22, 30), datetime(2024, 1, 3, 1, 20))
+
+
+def test_report_flags_pruned_polls(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Instances whose earliest polls of the period were pruned are flagged, with when their kept polls start.'''
+    with Session(engine) as session:
+        session.add_all(
+            PollEntry(
+                base_url=base_url,
+                created_at=datetime(2024, 1, 1, hour, 30),
+                health_check_passed=True,
+                instance_version='16.6.1-ee',
+                readiness_check_passed=True,
+            )
+            for base_url in ('https://a.example.com', 'https://b.example.com')
+            for hour in range(10, 13)
+        )
+        session.commit()
+    with engine.begin() as connection:
+        fold_rollups(connection)
+        connection.execute(sqlalchemy.delete(PollEntry).where(
+            PollEntry.base_url == 'https://a.example.com',
+            PollEntry.created_at < datetime(2024, 1, 1, 12),
+        ))
+
+    with engine.connect() as connection:
+        a, b = build_reports(connection, since=datetime(2024, 1, 1, 10))
+        (pruned,) = build_reports(connection, base_url='https://a.example.com', until=datetime(2024, 1, 1, 12))
+    assert (a.poll_count, a.pruned, a.kept_since) == (3, True, datetime(2024, 1, 1, 12, 30))
+    assert (b.poll_count, b.pruned, b.kept_since) == (3, False, datetime(2024, 1, 1, 10, 30))
+    assert (pruned.poll_count, pruned.pruned, pruned.kept_since) == (2, True, None)
+
+
+def test_latency_percentiles_are_nearest_rank(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Percentiles are the durations of actual checks; polls without durations are left out.'''
+    with Session(engine) as session:
+        for minute in range(100):
+            poll_entry = _poll_entry('https://a.example.com', minute % 60)
+            poll_entry.health_check_duration_ms = float(minute + 1)
+            poll_entry.readiness_check_duration_ms = 5.0
+            session.add(poll_entry)
+        session.add(_poll_entry('https://b.example.com', 0))
+        session.commit()
+
+    with engine.connect() as connection:
+        health, readiness = latency_percentiles(connection)
+    assert (health.base_url, health.check, health.sample_count) == ('https://a.example.com', 'health_check', 100)
+    assert (health.p50, health.p95, health.p99) == (50.0, 95.0, 99.0)
+    assert (readiness.check, readiness.p50, readiness.p99) == ('readiness_check', 5.0, 5.0)
+
+
+def test_readiness_component_failures_are_counted(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Checks and failures are counted per component, selecting a check across its shards by name.'''
+    with Session(engine) as session:
+        db, default, archive = (
+            ReadinessComponent(name=name)
+            for name in ('db_check', 'gitaly_check[shard=default]', 'gitaly_check[shard=archive]')
+        )
+        for minute in range(4):
+            poll_entry = _poll_entry('https://a.example.com', minute, passed=minute != 2)
+            poll_entry.readiness_results = [
+                ReadinessResult(component=db, passed=True),
+                ReadinessResult(component=default, passed=minute != 2),
+                ReadinessResult(component=archive, passed=minute not in (2, 3)),
+            ]
+            session.add(poll_entry)
+        # polls recorded before readiness components were
+        session.add(_poll_entry('https://a.example.com', 4))
+        session.commit()
+
+    with engine.connect() as connection:
+        failures = readiness_component_failures(connection, component='gitaly_check', until=datetime(2024, 1, 1, 10, 3))
+        assert [(f.component, f.check_count, f.failed_count) for f in failures] == [
+            ('gitaly_check[shard=archive]', 3, 1),
+            ('gitaly_check[shard=default]', 3, 1),
+        ]
+        (report,) = build_reports(connection)
+    assert [(f.component, f.failed_count, f.failure_rate) for f in report.readiness_components] == [
+        ('db_check', 0, 0.0),
+        ('gitaly_check[shard=archive]', 2, 0.5),
+        ('gitaly_check[shard=default]', 1, 0.25),
+    ]
@@ -0,0 +1,155 @@
+from .fixtures import * # import to initialise fixtures
+
+import sqlalchemy
+
+from .. import (
+    Base,
+    PollEntry,
+    ReadinessComponent,
+    ReadinessResult,
+    ResponseBody,
+    RetentionRule,
+    create_engine,
+    fold_rollups,
+    prune_poll_entries,
+    reclaim_space,
+    record_transitions,
+    remove_orphaned_response_bodies,
+    update_latest_states,
+)
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy.orm import Session
+from typing import List
+
+
+NOW = datetime(2024, 3, 1)
+
+
+def _poll_entry(base_url: 'str', created_at: 'datetime', body: 'ResponseBody | None' = None) -> 'PollEntry':
+    '''Creates a poll entry of an instance, optionally with a saved health check response.'''
+    return PollEntry(
+        base_url=base_url,
+        created_at=created_at,
+        health_check_passed=True,
+        health_check_response=body,
+        instance_version='16.6.1-ee',
+        readiness_check_passed=True,
+    )
+
+
+def _remaining(engine: 'sqlalchemy.Engine') -> 'List[tuple]':
+    '''Lists the instance and timestamp of the remaining polls, oldest first.'''
+    with engine.connect() as connection:
+        stmt = sqlalchemy.select(PollEntry.base_url, PollEntry.created_at).order_by(PollEntry.created_at, PollEntry.base_url)
+        return [tuple(row) for row in connection.execute(stmt)]
+
+
+@pytest.fixture
+def polled_engine(engine: 'sqlalchemy.Engine') -> 'sqlalchemy.Engine':
+    '''Engine for a database of two instances polled in January and February, folded into the rollups, transitions and latest states.'''
+    with Session(engine) as session:
+        body = ResponseBody.from_text('GitLab OK')
+        component = ReadinessComponent(name='db_check')
+        for base_url in ('https://a.example.com', 'https://b.example.com'):
+            polls = (_poll_entry(base_url, datetime(2024, 1, 15), body), _poll_entry(base_url, datetime(2024, 2, 15)))
+            for poll_entry in polls:
+                poll_entry.readiness_results = [ReadinessResult(component=component, passed=True)]
+            session.add_all(polls)
+        session.commit()
+    with engine.begin() as connection:
+        fold_rollups(connection)
+        record_transitions(connection)
+        update_latest_states(connection)
+    yield engine
+
+
+def test_prune_applies_rules_per_instance(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''Instances with a rule of their own are exempt from the default rule.'''
+    rules = [RetentionRule(keep_days=30), RetentionRule(keep_days=0, base_url='https://b.example.com')]
+    assert prune_poll_entries(polled_engine, rules, NOW, batch_size=1) == 3
+    assert _remaining(polled_engine) == [('https://a.example.com', datetime(2024, 2, 15))]
+
+
+def test_prune_spares_polls_missing_from_rollups(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''Polls are only deleted once they are summarised in the rollups.'''
+    with Session(polled_engine) as session:
+        session.add(_poll_entry('https://a.example.com', datetime(2024, 1, 16)))
+        session.commit()
+    prune_poll_entries(polled_engine, [RetentionRule(keep_days=0)], NOW)
+    assert _remaining(polled_engine) == [('https://a.example.com', datetime(2024, 1, 16))]
+
+
+def test_prune_spares_polls_missing_from_transitions(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''Polls are only deleted once they are compared for state transitions.'''
+    with Session(polled_engine) as session:
+        session.add(_poll_entry('https://a.example.com', datetime(2024, 1, 16)))
+        session.commit()
+    with polled_engine.begin() as connection:
+        fold_rollups(connection)
+    prune_poll_entries(polled_engine, [RetentionRule(keep_days=0)], NOW)
+    assert _remaining(polled_engine) == [('https://a.example.com', datetime(2024, 1, 16))]
+
+
+def test_pruned_ids_are_not_reused(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''Polls made after the latest ones were pruned are allocated ids beyond the watermarks.'''
+    prune_poll_entries(polled_engine, [RetentionRule(keep_days=0)], NOW)
+    with Session(polled_engine) as session:
+        session.add(_poll_entry('https://a.example.com', datetime(2024, 3, 1)))
+        session.commit()
+    with polled_engine.begin() as connection:
+        assert connection.scalar(sqlalchemy.select(PollEntry.id)) == 5
+        assert fold_rollups(connection) == 1
+
+
+def test_prune_archives_by_month(polled_engine: 'sqlalchemy.Engine', tmp_path: 'Path') -> 'None':
+    '''Pruned polls, and the bodies they reference, are moved into the archive of their month.'''
+    def initialise(database: 'str') -> 'None':
+        engine = create_engine(database)
+        Base.metadata.create_all(engine)
+        engine.dispose()
+
+    archive_directory = tmp_path / 'archives'
+    archive_directory.mkdir()
+    prune_poll_entries(
+        polled_engine,
+        [RetentionRule(keep_days=0)],
+        NOW,
+        archive_directory=archive_directory,
+        initialise_archive=initialise,
+    )
+    assert sorted(path.name for path in archive_directory.glob('*.db')) == ['polls-2024-01.db', 'polls-2024-02.db']
+
+    archive = create_engine(f'sqlite:///{(archive_directory / "polls-2024-01.db").as_posix()}')
+    assert [url for url, _ in _remaining(archive)] == ['https://a.example.com', 'https://b.example.com']
+    with Session(archive) as session:
+        polls = session.scalars(sqlalchemy.select(PollEntry)).all()
+        assert {poll.health_check_response.text for poll in polls} == {'GitLab OK'}
+        assert {result.component.name for poll in polls for result in poll.readiness_results} == {'db_check'}
+    assert _remaining(polled_engine) == []
+    with polled_engine.connect() as connection:
+        assert connection.scalar(sqlalchemy.select(sqlalchemy.func.count()).select_from(ReadinessResult)) == 0
+
+
+def test_orphaned_response_bodies_are_removed(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''Bodies are removed once no poll references them, and only then.'''
+    prune_poll_entries(polled_engine, [RetentionRule(keep_days=0, base_url='https://a.example.com')], NOW)
+    assert remove_orphaned_response_bodies(polled_engine) == 0
+    prune_poll_entries(polled_engine, [RetentionRule(keep_days=0)], NOW)
+    assert remove_orphaned_response_bodies(polled_engine) == 1
+
+
+def test_space_is_reclaimed_incrementally(polled_engine: 'sqlalchemy.Engine') -> 'None':
+    '''New databases are incrementally vacuumed, returning their free pages after pruning.'''
+    with Session(polled_engine) as session:
+        session.add_all(_poll_entry('https://a.example.com', datetime(2024, 1, 1), ResponseBody.from_text(str(i) * 5000)) for i in range(200))
+        session.commit()
+    with polled_engine.begin() as connection:
+        fold_rollups(connection)
+        record_transitions(connection)
+        update_latest_states(connection)
+    prune_poll_entries(polled_engine, [RetentionRule(keep_days=0)], NOW)
+    remove_orphaned_response_bodies(polled_engine)
+    assert reclaim_space(polled_engine, pages=2) > 0
+    with polled_engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA freelist_count').scalar() == 0
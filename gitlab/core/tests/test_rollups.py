@@ -0,0 +1,120 @@
+from .fixtures import * # import to initialise fixtures
+
+import sqlalchemy
+
+from .. import PollEntry, PollRollup, PollWriter, fold_rollups, fold_rollups_on_write, rollup_backlog
+from datetime import datetime
+from sqlalchemy.orm import Session
+from typing import List
+
+
+def _poll_entry(created_at: 'datetime', *, passed: 'bool' = True, version: 'str' = '16.6.1-ee') -> 'PollEntry':
+    '''Creates a poll entry for the example instance.'''
+    return PollEntry(
+        base_url='https://example.com',
+        created_at=created_at,
+        error_message='' if passed else 'Failed health check',
+        health_check_passed=passed,
+        instance_version=version,
+        readiness_check_passed=passed,
+    )
+
+
+def _rollups(engine: 'sqlalchemy.Engine', granularity: 'str') -> 'List[PollRollup]':
+    '''Loads the rollups of the given granularity, oldest first.'''
+    with Session(engine) as session:
+        stmt = sqlalchemy.select(PollRollup).where(PollRollup.granularity == granularity).order_by(PollRollup.bucket)
+        return session.scalars(stmt).all()
+
+
+def test_fold_rollups_aggregates_by_hour_and_day(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Polls are counted into hourly and daily buckets, tracking the versions seen.'''
+    with Session(engine) as session:
+        session.add_all([
+            _poll_entry(datetime(2024, 1, 1, 10, 0), version='16.5.0-ee'),
+            _poll_entry(datetime(2024, 1, 1, 10, 30), passed=False, version=''),
+            _poll_entry(datetime(2024, 1, 1, 11, 0), version='16.6.1-ee'),
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        assert fold_rollups(connection) == 3
+
+    hourly = _rollups(engine, 'hour')
+    assert [rollup.bucket for rollup in hourly] == [datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 11)]
+    assert (hourly[0].poll_count, hourly[0].health_check_passed_count, hourly[0].error_count) == (2, 1, 1)
+    assert hourly[0].first_version == hourly[0].last_version == '16.5.0-ee'
+
+    (daily,) = _rollups(engine, 'day')
+    assert (daily.poll_count, daily.readiness_check_passed_count) == (3, 2)
+    assert (daily.first_version, daily.last_version) == ('16.5.0-ee', '16.6.1-ee')
+    assert (daily.first_polled_at, daily.last_polled_at) == (datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 11))
+
+
+def test_fold_rollups_resumes_from_watermark(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Each poll is folded exactly once, however the backlog is split up.'''
+    with Session(engine) as session:
+        session.add_all(_poll_entry(datetime(2024, 1, 1, 10, minute)) for minute in range(5))
+        session.commit()
+    with engine.begin() as connection:
+        assert rollup_backlog(connection) == 5
+        assert fold_rollups(connection, limit=2) == 2
+        assert rollup_backlog(connection) == 3
+        assert fold_rollups(connection) == 3
+        assert fold_rollups(connection) == 0
+    (daily,) = _rollups(engine, 'day')
+    assert daily.poll_count == 5
+
+
+def test_writer_maintains_rollups(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Rollups are kept up to date as batches are written.'''
+    with PollWriter(engine, batch_size=2, processors=(fold_rollups_on_write,)) as writer:
+        for minute in range(3):
+            writer.submit(_poll_entry(datetime(2024, 1, 1, 10, minute)))
+    (hourly,) = _rollups(engine, 'hour')
+    assert hourly.poll_count == 3
+    with engine.connect() as connection:
+        assert rollup_backlog(connection) == 0
+
+
+def test_backdated_polls_keep_the_versions_of_later_ones(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Polls folded after those made around them (e.g. imported) only replace the versions of a bucket they precede or follow.'''
+    with Session(engine) as session:
+        session.add_all([
+            _poll_entry(datetime(2024, 1, 1, 10, 20), version='16.6.0-ee'),
+            _poll_entry(datetime(2024, 1, 1, 10, 40), version='16.6.1-ee'),
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        fold_rollups(connection)
+    with Session(engine) as session:
+        session.add_all([
+            _poll_entry(datetime(2024, 1, 1, 10, 10), version='16.5.0-ee'),
+            _poll_entry(datetime(2024, 1, 1, 10, 30), version='16.5.0-ee'),
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        fold_rollups(connection)
+
+    (hourly,) = _rollups(engine, 'hour')
+    assert hourly.poll_count == 4
+    assert (hourly.first_version, hourly.last_version) == ('16.5.0-ee', '16.6.1-ee')
+    assert (hourly.first_polled_at, hourly.last_polled_at) == (datetime(2024, 1, 1, 10, 10), datetime(2024, 1, 1, 10, 40))
+
+
+def test_fold_rollups_sums_availability_and_latencies(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Available and skipped polls are counted, and the durations of the checks measured summed.'''
+    polls = [_poll_entry(datetime(2024, 1, 1, 10, minute)) for minute in range(4)]
+    polls[1].readiness_check_passed = False
+    polls[2].health_check_passed = polls[2].readiness_check_passed = False
+    polls[2].skipped = True
+    polls[0].health_check_duration_ms, polls[1].health_check_duration_ms = 10.0, 30.5
+    with Session(engine) as session:
+        session.add_all(polls)
+        session.commit()
+    with engine.begin() as connection:
+        fold_rollups(connection)
+
+    (daily,) = _rollups(engine, 'day')
+    assert (daily.poll_count, daily.available_count, daily.skipped_count) == (4, 2, 1)
+    assert (daily.health_check_duration_ms_sum, daily.health_check_duration_count) == (40.5, 2)
+    assert (daily.metadata_duration_ms_sum, daily.metadata_duration_count) == (0.0, 0)
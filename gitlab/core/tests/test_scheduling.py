@@ -0,0 +1,147 @@
+import asyncio
+import pytest
+
+from .. import FixedRateScheduler
+
+
+def test_schedule_does_not_drift() -> 'None':
+    '''Ticks are anchored to the schedule rather than to the end of the previous tick.'''
+    timestamps = []
+
+    async def run() -> 'None':
+        loop = asyncio.get_running_loop()
+        scheduler = FixedRateScheduler(1)
+
+        async def job() -> 'None':
+            timestamps.append(loop.time())
+            await asyncio.sleep(0.03) # a significant fraction of the interval
+
+        scheduler.schedule('job', 0.05, job)
+        try:
+            await asyncio.wait_for(scheduler.run(), 0.52)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run())
+    assert len(timestamps) == 11
+    # every tick lands close to its slot, no matter how long the ticks took
+    for i, timestamp in enumerate(timestamps):
+        assert timestamp - timestamps[0] == pytest.approx(i * 0.05, abs=0.02)
+
+
+def test_missed_ticks_are_skipped_and_reported() -> 'None':
+    '''Ticks that cannot be serviced are counted as missed instead of being queued.'''
+    reported = []
+
+    async def job() -> 'None':
+        await asyncio.sleep(0.11) # longer than two intervals
+
+    async def run() -> 'FixedRateScheduler':
+        scheduler = FixedRateScheduler(1, on_missed_ticks=lambda key, missed: reported.append((key, missed)))
+        scheduler.schedule('job', 0.05, job)
+        try:
+            await asyncio.wait_for(scheduler.run(), 0.3)
+        except asyncio.TimeoutError:
+            pass
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.statistics['job'].ticks == 2
+    assert scheduler.missed_ticks == 2
+    assert reported == [('job', 1), ('job', 1)]
+
+
+def test_concurrency_is_bounded() -> 'None':
+    '''No more than the configured number of jobs run at once.'''
+    in_flight, peak = 0, 0
+
+    async def job() -> 'None':
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+
+    async def run() -> 'None':
+        scheduler = FixedRateScheduler(2)
+        for key in range(5):
+            scheduler.schedule(key, 0.2, job)
+        try:
+            await asyncio.wait_for(scheduler.run(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_jobs_may_adapt_their_interval() -> 'None':
+    '''The interval returned by a job replaces the scheduled one for the next tick.'''
+    timestamps = []
+
+    async def run() -> 'None':
+        loop = asyncio.get_running_loop()
+        scheduler = FixedRateScheduler(1)
+
+        async def job() -> 'float':
+            timestamps.append(loop.time())
+            return 0.05 if len(timestamps) < 3 else 0.2
+
+        scheduler.schedule('job', 1.0, job)
+        try:
+            await asyncio.wait_for(scheduler.run(), 0.35)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run())
+    gaps = [later - earlier for earlier, later in zip(timestamps, timestamps[1:])]
+    assert gaps == [pytest.approx(0.05, abs=0.02), pytest.approx(0.05, abs=0.02), pytest.approx(0.2, abs=0.02)]
+
+
+def test_cancelled_jobs_may_be_scheduled_again() -> 'None':
+    '''A cancelled job stops ticking, and resumes with its statistics once scheduled again.'''
+    async def job() -> 'None':
+        pass
+
+    async def run() -> 'FixedRateScheduler':
+        scheduler = FixedRateScheduler(1)
+        scheduler.schedule('job', 0.05, job)
+        await asyncio.sleep(0.12)
+        scheduler.cancel('job')
+        await asyncio.sleep(0.12)
+        assert scheduler.statistics['job'].ticks == 3
+        scheduler.schedule('job', 0.05, job)
+        await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.statistics['job'].ticks == 4
+
+
+def test_failing_jobs_keep_their_schedule() -> 'None':
+    '''A job raising an exception is reported, and ticks on; jobs scheduled later run until the scheduler is stopped.'''
+    errors = []
+    timestamps = []
+
+    async def failing_job() -> 'None':
+        raise RuntimeError('boom')
+
+    async def job() -> 'None':
+        timestamps.append(asyncio.get_running_loop().time())
+
+    async def run() -> 'FixedRateScheduler':
+        scheduler = FixedRateScheduler(1, on_error=lambda key, exception: errors.append((key, str(exception))))
+        scheduler.schedule('failing', 0.05, failing_job)
+        running = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.12)
+        scheduler.schedule('job', 0.05, job)
+        await asyncio.sleep(0.12)
+        await scheduler.stop()
+        await asyncio.wait_for(running, 0.1)
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.statistics['failing'].failed_ticks == scheduler.statistics['failing'].ticks == len(errors) >= 4
+    assert set(errors) == {('failing', 'boom')}
+    assert len(timestamps) >= 2
@@ -0,0 +1,53 @@
+import alembic.command
+import alembic.config
+import alembic.script
+import argparse
+import sqlalchemy
+
+from .. import HEAD, create_engine, has_schema, initialise_schema
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+MIGRATIONS = Path(__file__).resolve().parent.parent.parent / 'migrations'
+
+
+def _describe_schema(engine: 'sqlalchemy.Engine') -> 'Dict[str, Tuple[List[str], List[str]]]':
+    '''Describes the tables of a database by their columns and indexes.'''
+    inspector = sqlalchemy.inspect(engine)
+    return {
+        table: (
+            sorted(column['name'] for column in inspector.get_columns(table)),
+            sorted(index['name'] for index in inspector.get_indexes(table)),
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+def test_head_is_latest_migration() -> 'None':
+    '''The fast path stamps the head revision of the migrations.'''
+    config = alembic.config.Config()
+    config.set_main_option('script_location', MIGRATIONS.as_posix())
+    assert alembic.script.ScriptDirectory.from_config(config).get_current_head() == HEAD
+
+
+def test_initialised_schema_matches_migrations(tmp_path: 'Path') -> 'None':
+    '''A new database initialised directly ends up as if every migration was run.'''
+    initialised = create_engine(f'sqlite:///{(tmp_path / "initialised.db").as_posix()}')
+    with initialised.connect() as connection:
+        assert not has_schema(connection)
+    initialise_schema(initialised)
+
+    migrated_url = f'sqlite:///{(tmp_path / "migrated.db").as_posix()}'
+    config = alembic.config.Config()
+    config.set_main_option('script_location', MIGRATIONS.as_posix())
+    config.cmd_opts = argparse.Namespace(x=[f'database={migrated_url}'])
+    alembic.command.upgrade(config, 'head')
+    migrated = create_engine(migrated_url)
+
+    with initialised.connect() as connection:
+        assert has_schema(connection)
+        assert connection.exec_driver_sql('SELECT version_num FROM alembic_version').scalar_one() == HEAD
+    assert _describe_schema(initialised) == _describe_schema(migrated)
+    initialised.dispose()
+    migrated.dispose()
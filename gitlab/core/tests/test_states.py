@@ -0,0 +1,96 @@
+from .fixtures import * # import to initialise fixtures
+
+import sqlalchemy
+
+from .. import (
+    InstanceState,
+    PollEntry,
+    PollWriter,
+    latest_states,
+    state_backlog,
+    update_latest_states,
+    update_latest_states_on_write,
+)
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+
+def _poll_entry(
+    minute: 'int',
+    *,
+    base_url: 'str' = 'https://example.com',
+    health: 'bool' = True,
+    readiness: 'bool' = True,
+    skipped: 'bool' = False,
+    version: 'str' = '16.6.1-ee',
+) -> 'PollEntry':
+    '''Creates a poll entry of an instance, polled at the given minute.'''
+    return PollEntry(
+        base_url=base_url,
+        created_at=datetime(2024, 1, 1, 0, minute),
+        health_check_passed=health,
+        instance_version=version,
+        readiness_check_passed=readiness,
+        skipped=skipped,
+    )
+
+
+def _minute(minute: 'int') -> 'datetime':
+    '''Returns the timestamp of a poll made at the given minute.'''
+    return datetime(2024, 1, 1, 0, minute)
+
+
+def test_latest_state_follows_polls(engine: 'sqlalchemy.Engine') -> 'None':
+    '''The state is that of the latest poll, counting the failures since the latest success.'''
+    with Session(engine) as session:
+        session.add_all([
+            _poll_entry(0),
+            _poll_entry(1, readiness=False),
+            _poll_entry(2, health=False, readiness=False, version=''),
+            # skipped polls are not observations of the instance
+            _poll_entry(3, health=False, readiness=False, skipped=True, version=''),
+            _poll_entry(4, base_url='https://other.example.com'),
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        assert update_latest_states(connection) == 2
+
+    with engine.connect() as connection:
+        assert latest_states(connection) == [
+            InstanceState('https://example.com', _minute(2), False, False, '16.6.1-ee', _minute(0), _minute(2), 2),
+            InstanceState('https://other.example.com', _minute(4), True, True, '16.6.1-ee', _minute(4), None, 0),
+        ]
+        [state] = latest_states(connection, base_url='https://other.example.com')
+        assert state.available
+
+
+def test_latest_states_resume_from_watermark(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Polls are folded into the states as of the previous step, and older polls leave them as they are.'''
+    with Session(engine) as session:
+        session.add_all([_poll_entry(0, health=False), _poll_entry(1, health=False), _poll_entry(2)])
+        session.commit()
+    with engine.begin() as connection:
+        assert state_backlog(connection) == 3
+        assert update_latest_states(connection, limit=2) == 1
+        assert latest_states(connection)[0].consecutive_failures == 2
+        assert update_latest_states(connection) == 1
+        assert state_backlog(connection) == 0
+
+    with Session(engine) as session:
+        session.add(_poll_entry(1, health=False, version='16.5.0-ee'))
+        session.commit()
+    with engine.begin() as connection:
+        assert update_latest_states(connection) == 0
+        [state] = latest_states(connection)
+    assert (state.polled_at, state.available, state.instance_version, state.consecutive_failures) == (_minute(2), True, '16.6.1-ee', 0)
+    assert (state.last_success_at, state.last_failure_at) == (_minute(2), _minute(1))
+
+
+def test_latest_states_are_updated_on_write(engine: 'sqlalchemy.Engine') -> 'None':
+    '''States are updated within the transaction writing the polls.'''
+    with PollWriter(engine, batch_size=2, processors=(update_latest_states_on_write,)) as writer:
+        for poll_entry in (_poll_entry(0), _poll_entry(1, readiness=False), _poll_entry(2, readiness=False)):
+            writer.submit(poll_entry)
+    with engine.connect() as connection:
+        [state] = latest_states(connection)
+    assert (state.polled_at, state.readiness_check_passed, state.consecutive_failures) == (_minute(2), False, 2)
@@ -0,0 +1,118 @@
+from .fixtures import * # import to initialise fixtures
+
+import sqlalchemy
+
+from .. import (
+    Incident,
+    PollEntry,
+    PollWriter,
+    StateTransition,
+    find_incidents,
+    record_transitions,
+    record_transitions_on_write,
+    transition_backlog,
+)
+from datetime import datetime
+from sqlalchemy.orm import Session
+from typing import List, Tuple
+
+
+def _poll_entry(
+    minute: 'int',
+    *,
+    base_url: 'str' = 'https://example.com',
+    health: 'bool' = True,
+    readiness: 'bool' = True,
+    version: 'str' = '16.6.1-ee',
+) -> 'PollEntry':
+    '''Creates a poll entry of an instance, polled at the given minute.'''
+    return PollEntry(
+        base_url=base_url,
+        created_at=datetime(2024, 1, 1, 0, minute),
+        health_check_passed=health,
+        instance_version=version,
+        readiness_check_passed=readiness,
+    )
+
+
+def _transitions(engine: 'sqlalchemy.Engine') -> 'List[Tuple[int, bool, bool, str]]':
+    '''Loads the transitions, as (minute, health, readiness, version), oldest first.'''
+    with Session(engine) as session:
+        stmt = sqlalchemy.select(StateTransition).order_by(StateTransition.id)
+        return [
+            (transition.occurred_at.minute, transition.health_check_passed, transition.readiness_check_passed, transition.instance_version)
+            for transition in session.scalars(stmt)
+        ]
+
+
+def test_only_changes_of_state_are_recorded(engine: 'sqlalchemy.Engine') -> 'None':
+    '''The first poll records the initial state, then only polls changing it record a transition.'''
+    with Session(engine) as session:
+        session.add_all([
+            _poll_entry(0),
+            _poll_entry(1),
+            _poll_entry(2, readiness=False, version=''),
+            _poll_entry(3, readiness=False, version=''),
+            _poll_entry(4),
+            _poll_entry(5, version='16.7.0-ee'),
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        assert record_transitions(connection) == 4
+
+    assert _transitions(engine) == [
+        (0, True, True, '16.6.1-ee'),
+        # polls without a version keep the version last reported
+        (2, True, False, '16.6.1-ee'),
+        (4, True, True, '16.6.1-ee'),
+        (5, True, True, '16.7.0-ee'),
+    ]
+
+
+def test_transitions_resume_from_watermark(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Polls are compared with the state of their instance as of the previous step.'''
+    with Session(engine) as session:
+        session.add_all([_poll_entry(0), _poll_entry(1), _poll_entry(2, health=False), _poll_entry(3, health=False)])
+        session.commit()
+    with engine.begin() as connection:
+        assert transition_backlog(connection) == 4
+        assert record_transitions(connection, limit=2) == 1
+        assert record_transitions(connection, limit=1) == 1
+        assert record_transitions(connection) == 0
+        assert transition_backlog(connection) == 0
+    assert _transitions(engine) == [(0, True, True, '16.6.1-ee'), (2, False, True, '16.6.1-ee')]
+
+
+def test_transitions_are_recorded_on_write(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Transitions are recorded within the transaction writing the polls.'''
+    with PollWriter(engine, batch_size=2, processors=(record_transitions_on_write,)) as writer:
+        for poll_entry in (_poll_entry(0), _poll_entry(1), _poll_entry(2, health=False)):
+            writer.submit(poll_entry)
+    assert [minute for minute, *_ in _transitions(engine)] == [0, 2]
+
+
+def test_incidents_are_derived_from_transitions(engine: 'sqlalchemy.Engine') -> 'None':
+    '''Outages last until the instance recovers; version changes are listed as they happen.'''
+    with Session(engine) as session:
+        session.add_all([
+            _poll_entry(0),
+            _poll_entry(1, health=False),
+            _poll_entry(2, health=False, readiness=False),
+            _poll_entry(3, version='16.7.0-ee'),
+            _poll_entry(4, base_url='https://other.example.com', readiness=False),
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        record_transitions(connection)
+
+    with engine.connect() as connection:
+        assert find_incidents(connection) == [
+            Incident('https://example.com', 'outage', datetime(2024, 1, 1, 0, 1), datetime(2024, 1, 1, 0, 3), 'health and readiness check failed'),
+            Incident('https://example.com', 'version_change', datetime(2024, 1, 1, 0, 3), datetime(2024, 1, 1, 0, 3), '16.6.1-ee -> 16.7.0-ee'),
+            Incident('https://other.example.com', 'outage', datetime(2024, 1, 1, 0, 4), None, 'readiness check failed'),
+        ]
+        # outages spanning the start of the period are included, as are ongoing outages
+        since = find_incidents(connection, since=datetime(2024, 1, 1, 0, 2), until=datetime(2024, 1, 1, 0, 3))
+        assert [(incident.base_url, incident.kind, incident.ongoing) for incident in since] == [
+            ('https://example.com', 'outage', True),
+        ]
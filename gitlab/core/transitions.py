@@ -0,0 +1,235 @@
+import sqlalchemy
+
+from .models import PollEntry, StateTransition
+from .watermarks import CATCH_UP_LIMIT, advance_watermark, backlog, pending_range
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+    from sqlalchemy.orm import Session
+
+
+# state of an instance, as (health check passed, readiness check passed, instance version)
+State = Tuple[bool, bool, str]
+WATERMARK = 'state_transition'
+
+
+@dataclass(frozen=True)
+class Incident:
+    '''Represents an incident of an instance: either an outage, or a change of version.
+
+    An outage lasts from the first poll failing either check until the next
+    poll passing both, and is ongoing (without an end) until then. Its detail
+    names the checks that failed over its course. A version change is
+    instantaneous, and its detail names the versions changed from and to.
+    '''
+    base_url: 'str'
+    kind: 'str'
+    started_at: 'datetime'
+    ended_at: 'datetime | None'
+    detail: 'str'
+
+    @property
+    def ongoing(self) -> 'bool':
+        '''Returns whether the incident has yet to end.'''
+        return self.ended_at is None
+
+
+def transition_backlog(connection: 'Connection') -> 'int':
+    '''Returns the span of poll entry ids yet to be compared for state transitions.'''
+    return backlog(connection, WATERMARK)
+
+
+def record_transitions(connection: 'Connection', *, limit: 'int | None' = None) -> 'int':
+    '''Compares the poll entries beyond the transition watermark with the states of their instances.
+
+    Each poll that changes the health, readiness or version of its instance
+    records a transition. At most `limit` entries are compared, and the
+    transitions and the watermark are updated in the transaction of
+    `connection`, as with `fold_rollups`. Returns the number of transitions
+    recorded.
+
+    Polls are compared in the order they were made. Should any be older than
+    the latest transition of their instance (i.e. imported from another
+    node), the transitions of the instance from then on are recorded afresh.
+    '''
+    watermark, high = pending_range(connection, WATERMARK, limit=limit)
+    if high <= watermark:
+        return 0
+
+    columns = (
+        PollEntry.id,
+        PollEntry.base_url,
+        PollEntry.created_at,
+        PollEntry.health_check_passed,
+        PollEntry.readiness_check_passed,
+        PollEntry.instance_version,
+    )
+    polls = connection.execute(
+        sqlalchemy.select(*columns).where(PollEntry.id > watermark, PollEntry.id <= high).order_by(PollEntry.id)
+    ).all()
+    for base_url, since in _backdated(connection, polls).items():
+        # imported polls may have been made before transitions already recorded; those are replayed in order
+        connection.execute(
+            sqlalchemy.delete(StateTransition)
+            .where(StateTransition.base_url == base_url, StateTransition.occurred_at >= since)
+        )
+        polls = [poll for poll in polls if poll.base_url != base_url]
+        polls.extend(connection.execute(
+            sqlalchemy.select(*columns)
+            .where(PollEntry.base_url == base_url, PollEntry.created_at >= since, PollEntry.id <= high)
+        ))
+    polls.sort(key=lambda poll: (poll.created_at, poll.id))
+    states = _latest_states(connection, {poll.base_url for poll in polls})
+    transitions = []
+    for poll in polls:
+        previous = states.get(poll.base_url)
+        # polls without a version (i.e. failed metadata fetches) say nothing of the version
+        version = poll.instance_version or (previous[2] if previous else '')
+        state = (bool(poll.health_check_passed), bool(poll.readiness_check_passed), version)
+        if state == previous:
+            continue
+        states[poll.base_url] = state
+        transitions.append({
+            'base_url': poll.base_url,
+            'poll_entry_id': poll.id,
+            'occurred_at': poll.created_at,
+            'health_check_passed': state[0],
+            'readiness_check_passed': state[1],
+            'instance_version': state[2],
+        })
+    if transitions:
+        connection.execute(sqlalchemy.insert(StateTransition), transitions)
+
+    advance_watermark(connection, WATERMARK, high)
+    return len(transitions)
+
+
+def record_transitions_on_write(session: 'Session', batch: 'List[PollEntry]') -> 'None':
+    '''Records the transitions of a freshly written batch; intended as a `PollWriter` processor.
+
+    Any backlog (e.g. polls written before transitions were recorded) is
+    caught up on a little at a time, as with `fold_rollups_on_write`.
+    '''
+    record_transitions(session.connection(), limit=len(batch) + CATCH_UP_LIMIT)
+
+
+def find_incidents(
+    connection: 'Connection',
+    *,
+    base_url: 'str | None' = None,
+    since: 'datetime | None' = None,
+    until: 'datetime | None' = None,
+) -> 'List[Incident]':
+    '''Finds the incidents of every instance within the filters, by URL and then start.
+
+    Incidents are read from the state transitions alone, so a timeline only
+    reads a row per change of state, however many polls were made. Outages
+    are included if any part of them falls within the period, and are ongoing
+    if they had yet to end by the end of the period.
+    '''
+    stmt = sqlalchemy.select(StateTransition).order_by(
+        StateTransition.base_url,
+        StateTransition.occurred_at,
+        StateTransition.id,
+    )
+    if base_url is not None:
+        stmt = stmt.where(StateTransition.base_url == base_url)
+    if until is not None:
+        stmt = stmt.where(StateTransition.occurred_at < until)
+    # earlier transitions are read too, as they hold the state the period starts in
+    rows = connection.execute(stmt).all()
+
+    incidents = []
+    for instance_url, transitions in _by_instance(rows).items():
+        incidents.extend(
+            incident
+            for incident in _incidents(instance_url, transitions)
+            if since is None or incident.ongoing or incident.ended_at >= since
+        )
+    return incidents
+
+
+def _by_instance(rows: 'Iterable[sqlalchemy.Row]') -> 'Dict[str, List[sqlalchemy.Row]]':
+    '''Groups transitions by the URL of their instance.'''
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.base_url, []).append(row)
+    return grouped
+
+
+def _incidents(base_url: 'str', transitions: 'List[sqlalchemy.Row]') -> 'List[Incident]':
+    '''Derives the incidents of an instance from its transitions, oldest first.'''
+    incidents = []
+    outage_start, failed_checks, version = None, set(), ''
+    for transition in transitions:
+        available = transition.health_check_passed and transition.readiness_check_passed
+        if not available:
+            outage_start = outage_start or transition.occurred_at
+            if not transition.health_check_passed:
+                failed_checks.add('health')
+            if not transition.readiness_check_passed:
+                failed_checks.add('readiness')
+        elif outage_start is not None:
+            incidents.append(Incident(base_url, 'outage', outage_start, transition.occurred_at, _describe(failed_checks)))
+            outage_start, failed_checks = None, set()
+        if version and transition.instance_version != version:
+            incidents.append(Incident(
+                base_url,
+                'version_change',
+                transition.occurred_at,
+                transition.occurred_at,
+                f'{version} -> {transition.instance_version}',
+            ))
+        version = transition.instance_version
+    if outage_start is not None:
+        incidents.append(Incident(base_url, 'outage', outage_start, None, _describe(failed_checks)))
+    return sorted(incidents, key=lambda incident: incident.started_at)
+
+
+def _describe(failed_checks: 'Iterable[str]') -> 'str':
+    '''Describes the checks failed during an outage.'''
+    return ' and '.join(sorted(failed_checks)) + ' check failed'
+
+
+def _backdated(connection: 'Connection', polls: 'Iterable[sqlalchemy.Row]') -> 'Dict[str, datetime]':
+    '''Returns the earliest of the polls of each instance made before its latest transition, by URL.'''
+    earliest = {}
+    for poll in polls:
+        if poll.base_url not in earliest or poll.created_at < earliest[poll.base_url]:
+            earliest[poll.base_url] = poll.created_at
+    stmt = (
+        sqlalchemy.select(StateTransition.base_url, sqlalchemy.func.max(StateTransition.occurred_at))
+        .where(StateTransition.base_url.in_(list(earliest)))
+        .group_by(StateTransition.base_url)
+    )
+    return {
+        base_url: earliest[base_url]
+        for base_url, latest in connection.execute(stmt)
+        if earliest[base_url] < latest
+    }
+
+
+def _latest_states(connection: 'Connection', base_urls: 'Iterable[str]') -> 'Dict[str, State]':
+    '''Returns the state of each instance after its latest transition, if any.
+
+    Transitions of an instance are recorded in the order they occurred, so its
+    latest is the one with the highest id.
+    '''
+    latest = (
+        sqlalchemy.select(sqlalchemy.func.max(StateTransition.id))
+        .where(StateTransition.base_url.in_(list(base_urls)))
+        .group_by(StateTransition.base_url)
+    )
+    stmt = sqlalchemy.select(
+        StateTransition.base_url,
+        StateTransition.health_check_passed,
+        StateTransition.readiness_check_passed,
+        StateTransition.instance_version,
+    ).where(StateTransition.id.in_(latest))
+    return {
+        row.base_url: (bool(row.health_check_passed), bool(row.readiness_check_passed), row.instance_version)
+        for row in connection.execute(stmt)
+    }
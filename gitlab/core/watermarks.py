@@ -0,0 +1,50 @@
+import sqlalchemy
+
+from .models import PollEntry, Watermark
+from sqlalchemy.dialects.sqlite import insert
+from typing import Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+
+
+# the most poll entries beyond its watermark a `PollWriter` processor catches up on with each batch
+CATCH_UP_LIMIT = 50000
+
+
+def max_poll_entry_id(connection: 'Connection') -> 'int':
+    '''Returns the id of the latest poll entry, or 0 if there is none.'''
+    return connection.scalar(sqlalchemy.select(sqlalchemy.func.max(PollEntry.id))) or 0
+
+
+def read_watermark(connection: 'Connection', name: 'str') -> 'int':
+    '''Returns the id of the last poll entry processed by the named process, or 0 if it has processed none.'''
+    stmt = sqlalchemy.select(Watermark.poll_entry_id).where(Watermark.name == name)
+    return connection.scalar(stmt) or 0
+
+
+def backlog(connection: 'Connection', name: 'str') -> 'int':
+    '''Returns the span of poll entry ids yet to be processed by the named process.'''
+    return max(0, max_poll_entry_id(connection) - read_watermark(connection, name))
+
+
+def pending_range(connection: 'Connection', name: 'str', *, limit: 'int | None' = None) -> 'Tuple[int, int]':
+    '''Returns the ids (`low`, `high`] of the poll entries the named process is yet to process.
+
+    The range spans at most `limit` ids, and is empty (`high <= low`) if there
+    is nothing left to process.
+    '''
+    low = read_watermark(connection, name)
+    high = max_poll_entry_id(connection)
+    if limit is not None:
+        high = min(high, low + limit)
+    return low, high
+
+
+def advance_watermark(connection: 'Connection', name: 'str', poll_entry_id: 'int') -> 'None':
+    '''Records the named process as having processed the poll entries up to `poll_entry_id`.'''
+    connection.execute(
+        insert(Watermark)
+        .values(name=name, poll_entry_id=poll_entry_id)
+        .on_conflict_do_update(index_elements=[Watermark.name], set_={'poll_entry_id': poll_entry_id})
+    )
@@ -1,6 +1,7 @@
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
+from sqlalchemy import event
 from sqlalchemy import pool
 
 from alembic import context
@@ -71,6 +72,12 @@ def run_migrations_online() -> None:
         poolclass=pool.NullPool,
     )
 
+    if connectable.dialect.name == 'sqlite':
+        @event.listens_for(connectable, 'connect')
+        def enable_incremental_vacuum(dbapi_connection, _connection_record) -> None:
+            # only takes effect on a new database, before its first table is created
+            dbapi_connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
     with connectable.connect() as connection:
         context.configure(
             connection=connection, target_metadata=target_metadata
@@ -0,0 +1,101 @@
+"""content-addressed response bodies
+
+Revision ID: 6a446b043138
+Revises: c82898e5c3d8
+Create Date: 2026-10-16 22:34:43.266095
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import hashlib
+import sqlalchemy as sa
+import zlib
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a446b043138'
+down_revision: Union[str, None] = 'c82898e5c3d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+RESPONSE_COLUMNS = ('health_check_response', 'readiness_check_response', 'metadata_response')
+
+
+def upgrade() -> None:
+    op.create_table('response_body',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('digest', sa.LargeBinary(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('content', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('digest')
+    )
+    with op.batch_alter_table('poll_entry') as batch_op:
+        for column in RESPONSE_COLUMNS:
+            batch_op.add_column(sa.Column(f'{column}_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(f'fk_poll_entry_{column}_id', 'response_body', [f'{column}_id'], ['id'])
+
+    # move the existing bodies across, storing each distinct body once
+    connection = op.get_bind()
+    body_ids = {}
+    rows = connection.execute(sa.text(
+        'SELECT id, health_check_response, readiness_check_response, metadata_response FROM poll_entry '
+        "WHERE health_check_response != '' OR readiness_check_response != '' OR metadata_response != ''"
+    )).all()
+    for row in rows:
+        references = {}
+        for column, text in zip(RESPONSE_COLUMNS, row[1:]):
+            if not text:
+                continue
+            encoded = text.encode('utf-8')
+            digest = hashlib.sha256(encoded).digest()
+            if digest not in body_ids:
+                body_ids[digest] = connection.execute(
+                    sa.text('INSERT INTO response_body (digest, size, content) VALUES (:digest, :size, :content) RETURNING id'),
+                    {'digest': digest, 'size': len(encoded), 'content': zlib.compress(encoded)},
+                ).scalar_one()
+            references[f'{column}_id'] = body_ids[digest]
+        assignments = ', '.join(f'{column} = :{column}' for column in references)
+        connection.execute(sa.text(f'UPDATE poll_entry SET {assignments} WHERE id = :id'), {**references, 'id': row.id})
+
+    with op.batch_alter_table('poll_entry') as batch_op:
+        for column in RESPONSE_COLUMNS:
+            batch_op.drop_column(column)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('poll_entry') as batch_op:
+        for column in RESPONSE_COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.String(), nullable=False, server_default=''))
+
+    connection = op.get_bind()
+    bodies = {
+        body_id: zlib.decompress(content).decode('utf-8')
+        for body_id, content in connection.execute(sa.text('SELECT id, content FROM response_body'))
+    }
+    rows = connection.execute(sa.text(
+        'SELECT id, health_check_response_id, readiness_check_response_id, metadata_response_id FROM poll_entry '
+        'WHERE health_check_response_id IS NOT NULL OR readiness_check_response_id IS NOT NULL '
+        'OR metadata_response_id IS NOT NULL'
+    )).all()
+    for row in rows:
+        connection.execute(
+            sa.text(
+                'UPDATE poll_entry SET health_check_response = :health_check_response, '
+                'readiness_check_response = :readiness_check_response, metadata_response = :metadata_response '
+                'WHERE id = :id'
+            ),
+            {
+                column: bodies.get(body_id, '')
+                for column, body_id in zip(RESPONSE_COLUMNS, row[1:])
+            } | {'id': row.id},
+        )
+
+    with op.batch_alter_table('poll_entry') as batch_op:
+        for column in RESPONSE_COLUMNS:
+            batch_op.alter_column(column, server_default=None)
+            batch_op.drop_constraint(f'fk_poll_entry_{column}_id', type_='foreignkey')
+            batch_op.drop_column(f'{column}_id')
+    op.drop_table('response_body')
@@ -0,0 +1,30 @@
+"""poll entry autoincrement
+
+Revision ID: 99ade767f372
+Revises: 7d5e84e0d54e
+Create Date: 2026-10-17 00:24:45.258418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '99ade767f372'
+down_revision: Union[str, None] = '7d5e84e0d54e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite cannot add AUTOINCREMENT to an existing table, so it is rebuilt; the sequence starts from the
+    # highest id copied over, so that the ids of pruned polls are never allocated again
+    with op.batch_alter_table('poll_entry', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('poll_entry', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+        pass
@@ -0,0 +1,58 @@
+"""rollup availability and latencies
+
+Revision ID: d470d6e27c26
+Revises: 99ade767f372
+Create Date: 2026-10-17 00:34:51.266551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd470d6e27c26'
+down_revision: Union[str, None] = '99ade767f372'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CHECKS = ('health_check', 'readiness_check', 'metadata')
+COUNTS = ('available_count', 'skipped_count', *(f'{check}_duration_count' for check in CHECKS))
+SUMS = tuple(f'{check}_duration_ms_sum' for check in CHECKS)
+
+
+def upgrade() -> None:
+    for column in COUNTS:
+        op.add_column('poll_rollup', sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+    for column in SUMS:
+        op.add_column('poll_rollup', sa.Column(column, sa.Float(), nullable=False, server_default='0'))
+
+    # count the existing buckets from the polls folded into them; where some have since been pruned, their
+    # availability is unknown, and taken as the least their health and readiness counts allow
+    available = '''CASE WHEN count(*) = poll_rollup.poll_count THEN coalesce(sum(health_check_passed AND readiness_check_passed), 0)
+        ELSE max(0, poll_rollup.health_check_passed_count + poll_rollup.readiness_check_passed_count - poll_rollup.poll_count,
+                 coalesce(sum(health_check_passed AND readiness_check_passed), 0)) END'''
+    measures = ', '.join(f'total({check}_duration_ms), count({check}_duration_ms)' for check in CHECKS)
+    op.execute(f'''
+        UPDATE poll_rollup
+        SET (available_count, skipped_count, {', '.join(f'{check}_duration_ms_sum, {check}_duration_count' for check in CHECKS)}) = (
+            SELECT {available}, coalesce(sum(skipped), 0), {measures}
+            FROM poll_entry
+            WHERE poll_entry.base_url = poll_rollup.base_url
+                AND poll_entry.created_at >= poll_rollup.bucket
+                AND poll_entry.created_at < datetime(poll_rollup.bucket, CASE poll_rollup.granularity WHEN 'hour' THEN '+1 hour' ELSE '+1 day' END)
+                AND poll_entry.id <= coalesce((SELECT poll_entry_id FROM watermark WHERE name = 'poll_rollup'), 0)
+        )
+    ''')
+
+    with op.batch_alter_table('poll_rollup') as batch_op:
+        for column in (*COUNTS, *SUMS):
+            batch_op.alter_column(column, server_default=None)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('poll_rollup') as batch_op:
+        for column in (*COUNTS, *SUMS):
+            batch_op.drop_column(column)
@@ -0,0 +1,41 @@
+"""index redesign
+
+Revision ID: fcf954018052
+Revises: 1422d66372ae
+Create Date: 2026-10-16 22:43:00.799177
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fcf954018052'
+down_revision: Union[str, None] = '1422d66372ae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FAILURES = sa.text('NOT (health_check_passed = 1 AND readiness_check_passed = 1)')
+
+
+def upgrade() -> None:
+    # the low-selectivity and unqueried single-column indexes only slow down inserts; the index
+    # on created_at remains for exports spanning every instance
+    op.drop_index('ix_poll_entry_base_url', table_name='poll_entry')
+    op.drop_index('ix_poll_entry_health_check_passed', table_name='poll_entry')
+    op.drop_index('ix_poll_entry_instance_version', table_name='poll_entry')
+    op.drop_index('ix_poll_entry_readiness_check_passed', table_name='poll_entry')
+    op.create_index('ix_poll_entry_base_url_created_at', 'poll_entry', ['base_url', 'created_at'], unique=False)
+    op.create_index('ix_poll_entry_failures', 'poll_entry', ['base_url', 'created_at'], unique=False, sqlite_where=FAILURES)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_poll_entry_failures', table_name='poll_entry', sqlite_where=FAILURES)
+    op.drop_index('ix_poll_entry_base_url_created_at', table_name='poll_entry')
+    op.create_index('ix_poll_entry_readiness_check_passed', 'poll_entry', ['readiness_check_passed'], unique=False)
+    op.create_index('ix_poll_entry_instance_version', 'poll_entry', ['instance_version'], unique=False)
+    op.create_index('ix_poll_entry_health_check_passed', 'poll_entry', ['health_check_passed'], unique=False)
+    op.create_index('ix_poll_entry_base_url', 'poll_entry', ['base_url'], unique=False)